@@ -0,0 +1,270 @@
+# audio_capture.py
+import collections
+import math
+import queue
+import threading
+import time
+import wave
+from array import array
+
+# 16 kHz mono 16-bit is what both Google STT and offline recognizers expect.
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+FRAME_MS = 30
+
+# --- Audio Sources ---
+# A source yields raw 16-bit mono PCM frames of FRAME_MS each and returns when it runs dry.
+
+
+class MicrophoneSource:
+    """Keeps one microphone stream open for the lifetime of the assistant."""
+
+    def __init__(self, sample_rate=SAMPLE_RATE, device_index=None):
+        self.sample_rate = sample_rate
+        self.device_index = device_index
+
+    def frames(self, frame_samples):
+        import speech_recognition as sr
+        with sr.Microphone(device_index=self.device_index, sample_rate=self.sample_rate,
+                           chunk_size=frame_samples) as source:
+            while True:
+                yield source.stream.read(frame_samples)
+
+
+class WavFileSource:
+    """Replays a 16-bit mono WAV file, optionally in real time, so capture can be tested without a mic."""
+
+    def __init__(self, path, realtime=False):
+        self.path = path
+        self.realtime = realtime
+        with wave.open(path, 'rb') as wav:
+            if wav.getsampwidth() != SAMPLE_WIDTH or wav.getnchannels() != 1:
+                raise ValueError(f"{path} must be 16-bit mono PCM.")
+            self.sample_rate = wav.getframerate()
+
+    def frames(self, frame_samples):
+        with wave.open(self.path, 'rb') as wav:
+            while True:
+                frame = wav.readframes(frame_samples)
+                if len(frame) < frame_samples * SAMPLE_WIDTH:
+                    break
+                if self.realtime:
+                    time.sleep(frame_samples / self.sample_rate)
+                yield frame
+
+
+class ArraySource:
+    """Feeds a sequence of int16 samples (list, array or numpy array) through the capture pipeline."""
+
+    def __init__(self, samples, sample_rate=SAMPLE_RATE, realtime=False):
+        self.samples = array('h', (int(s) for s in samples))
+        self.sample_rate = sample_rate
+        self.realtime = realtime
+
+    def frames(self, frame_samples):
+        for start in range(0, len(self.samples) - frame_samples + 1, frame_samples):
+            if self.realtime:
+                time.sleep(frame_samples / self.sample_rate)
+            yield self.samples[start:start + frame_samples].tobytes()
+
+
+# --- Captured Utterances ---
+
+
+class Utterance:
+    """One segmented stretch of speech, including the pre-roll captured before speech was detected."""
+
+    def __init__(self, pcm, sample_rate, started_at, ended_at):
+        self.pcm = pcm
+        self.sample_rate = sample_rate
+        self.started_at = started_at
+        self.ended_at = ended_at
+        # Filled in by a streaming recognizer while the audio was still arriving (see recognizers.py).
+        self.transcript = None
+        self.recognition_error = None
+
+    @property
+    def duration(self):
+        return len(self.pcm) / (self.sample_rate * SAMPLE_WIDTH)
+
+    def to_audio_data(self):
+        """Wraps the PCM in a speech_recognition.AudioData for the recognizer."""
+        import speech_recognition as sr
+        return sr.AudioData(self.pcm, self.sample_rate, SAMPLE_WIDTH)
+
+    def save_wav(self, path):
+        with wave.open(path, 'wb') as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(SAMPLE_WIDTH)
+            wav.setframerate(self.sample_rate)
+            wav.writeframes(self.pcm)
+
+
+def frame_rms(frame):
+    """Root-mean-square energy of a 16-bit PCM frame."""
+    samples = array('h', frame)
+    if not samples:
+        return 0.0
+    return math.sqrt(sum(s * s for s in samples) / len(samples))
+
+
+# --- Capture Thread ---
+
+
+class AudioCapture:
+    """
+    Reads from an audio source on a long-lived thread, tracks the background noise
+    floor continuously and segments speech with a simple energy VAD.
+
+    Finished utterances (with `pre_roll_ms` of audio from before the speech started,
+    so the first syllable is not clipped) are queued for get_utterance().
+    `on_speech_start` is called from the capture thread as soon as speech begins
+    (useful for barge-in), `on_frame` receives every frame of an utterance in
+    progress and `on_speech_end` gets the finished Utterance just before it is
+    queued (both useful for streaming recognizers).
+
+    `is_playing()`, if given, says whether the assistant's own speech is coming out of
+    the speakers. While it is (and for `playback_tail_ms` after), the threshold is
+    multiplied by `playback_ratio`, so the microphone does not pick up the assistant
+    but a user talking over it still does.
+    A segment that runs to `max_utterance_s` without a pause may be background noise
+    that got louder (a fan turning on): the noise floor is re-estimated from its
+    quietest frames, and if even those were above the threshold it is dropped.
+    """
+
+    def __init__(self, source, frame_ms=FRAME_MS, pre_roll_ms=300, end_silence_ms=700,
+                 min_speech_ms=150, max_utterance_s=8, speech_ratio=3.0, min_threshold=300.0,
+                 on_speech_start=None, on_frame=None, on_speech_end=None,
+                 is_playing=None, playback_ratio=4.0, playback_tail_ms=300):
+        self.source = source
+        self.sample_rate = source.sample_rate
+        self.frame_samples = int(self.sample_rate * frame_ms / 1000)
+        self.frame_ms = frame_ms
+        self.speech_ratio = speech_ratio
+        self.min_threshold = min_threshold
+        self.start_frames = max(1, min_speech_ms // frame_ms)
+        self.end_frames = max(1, end_silence_ms // frame_ms)
+        self.max_frames = int(max_utterance_s * 1000 / frame_ms)
+        self.on_speech_start = on_speech_start
+        self.on_frame = on_frame
+        self.on_speech_end = on_speech_end
+        self.is_playing = is_playing
+        self.playback_ratio = playback_ratio
+        self.playback_tail = playback_tail_ms / 1000
+        self._playback_until = 0.0
+        self.noise_floor = None
+        self.noise_segments = 0             # segments dropped as steady noise
+        self._ring = collections.deque(maxlen=max(1, pre_roll_ms // frame_ms))
+        self._utterances = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = None
+        self.finished = threading.Event()   # set once the source runs dry
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="audio-capture", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=1.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def get_utterance(self, timeout=None):
+        """Returns the next Utterance, or None if nothing was said within `timeout` seconds."""
+        try:
+            return self._utterances.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def playback_active(self):
+        """True while the assistant is speaking, and for a short tail after (room echo)."""
+        if self.is_playing is None:
+            return False
+        now = time.monotonic()
+        if self.is_playing():
+            self._playback_until = now + self.playback_tail
+            return True
+        return now < self._playback_until
+
+    def threshold(self, playing=False):
+        floor = self.noise_floor if self.noise_floor is not None else self.min_threshold
+        threshold = max(self.min_threshold, floor * self.speech_ratio)
+        return threshold * self.playback_ratio if playing else threshold
+
+    def _update_noise_floor(self, energy):
+        # Fast attack when the room gets quieter, slow adaptation when it gets louder.
+        if self.noise_floor is None:
+            self.noise_floor = energy
+        elif energy < self.noise_floor:
+            self.noise_floor = 0.7 * self.noise_floor + 0.3 * energy
+        else:
+            self.noise_floor = 0.98 * self.noise_floor + 0.02 * energy
+
+    def _reestimate_noise_floor(self, energies):
+        """
+        For a segment cut at max_utterance_s: raises the floor to its quietest tenth of
+        frames. Returns True if even those were above the threshold (steady noise, not speech).
+        """
+        quiet = sorted(energies)[len(energies) // 10]
+        steady = quiet > self.threshold()
+        self.noise_floor = max(self.noise_floor or 0.0, quiet)
+        return steady
+
+    def _emit(self, frames, started_at):
+        utterance = Utterance(b"".join(frames), self.sample_rate, started_at, time.monotonic())
+        if self.on_speech_end:
+            self.on_speech_end(utterance)
+        self._utterances.put(utterance)
+
+    def _run(self):
+        speech = None       # frames of the utterance in progress, None while idle
+        energies = []       # their energies
+        started_at = None
+        loud_run = 0        # consecutive loud frames while idle
+        quiet_run = 0       # consecutive quiet frames while speaking
+        try:
+            for frame in self.source.frames(self.frame_samples):
+                if self._stop.is_set():
+                    break
+                energy = frame_rms(frame)
+                playing = self.playback_active()
+                is_loud = energy > self.threshold(playing)
+
+                if speech is None:
+                    self._ring.append(frame)
+                    loud_run = loud_run + 1 if is_loud else 0
+                    if not is_loud and not playing:
+                        self._update_noise_floor(energy)
+                    if loud_run >= self.start_frames:
+                        speech = list(self._ring)
+                        energies = []
+                        self._ring.clear()
+                        started_at = time.monotonic()
+                        quiet_run = 0
+                        if self.on_speech_start:
+                            self.on_speech_start()
+                        if self.on_frame:
+                            for buffered in speech:
+                                self.on_frame(buffered)
+                    continue
+
+                speech.append(frame)
+                energies.append(energy)
+                if self.on_frame:
+                    self.on_frame(frame)
+                quiet_run = 0 if is_loud else quiet_run + 1
+                if quiet_run >= self.end_frames or len(speech) >= self.max_frames:
+                    if quiet_run < self.end_frames and self._reestimate_noise_floor(energies):
+                        self.noise_segments += 1
+                        print(f"🔇 Ignoring {len(speech) * self.frame_ms / 1000:.0f}s of steady background noise.")
+                    else:
+                        self._emit(speech, started_at)
+                    speech = None
+                    loud_run = 0
+        except Exception as e:
+            print(f"❌ Audio capture stopped: {e}")
+        finally:
+            if speech:
+                self._emit(speech, started_at)
+            self.finished.set()
@@ -0,0 +1,64 @@
+"""
+Latency of calculator.evaluate() on ordinary and adversarial expressions.
+
+Every adversarial case must be rejected well inside calculator.TIME_LIMIT; eval() is
+only timed on the ordinary ones (running it on the adversarial ones would hang).
+
+    python benchmarks/bench_calculator.py [--number 2000]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from calculator import evaluate, CalculationError, MODES, TIME_LIMIT  # noqa: E402
+
+ORDINARY = ["12 * 7", "(5 + 3) * 2 - 4 / 8", "57 * 3.14159", "2 ** 10 + 1", "100 / 7"]
+ADVERSARIAL = [
+    "9**9**9**9",
+    "2 ** 1000000",
+    "10 ** 99 * 10 ** 99",
+    "(" * 120 + "1" + ")" * 120,
+    "1" * 240,
+    "+-" * 120 + "1",
+    "sqrt(" * 40 + "2" + ")" * 40,
+    "0.5 ** -100000",
+]
+
+
+def time_call(func, expression, number):
+    def call():
+        try:
+            func(expression)
+        except (CalculationError, ArithmeticError):
+            pass
+    return timeit.timeit(call, number=number) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'expression':<28} {'eval':>9} " + " ".join(f"{mode:>9}" for mode in MODES))
+    for expression in ORDINARY:
+        row = [time_call(eval, expression, args.number)]
+        row += [time_call(lambda e, m=mode: evaluate(e, m), expression, args.number) for mode in MODES]
+        print(f"{expression[:28]:<28} " + " ".join(f"{us:>7.1f}us" for us in row))
+
+    print(f"\nadversarial (limit {TIME_LIMIT * 1000:.0f} ms)")
+    for expression in ADVERSARIAL:
+        worst = max(time_call(lambda e, m=mode: evaluate(e, m), expression, max(1, args.number // 20))
+                    for mode in MODES)
+        try:
+            evaluate(expression)
+            outcome = "accepted"
+        except CalculationError as e:
+            outcome = f"rejected: {e}"
+        print(f"{expression[:28]:<28} {worst:>9.1f}us  {outcome}")
+
+
+if __name__ == "__main__":
+    main()
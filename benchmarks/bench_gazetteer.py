@@ -0,0 +1,74 @@
+"""
+Load time and per-lookup latency of the offline place -> timezone gazetteer, plus a check
+that names shared by several places resolve by the state or country given after the comma
+(exits with status 1 if one does not).
+
+    python benchmarks/bench_gazetteer.py [--number 5000]
+"""
+import argparse
+import os
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from gazetteer import Gazetteer, resolve_timezone  # noqa: E402
+
+QUERIES = [
+    "Pune, Maharashtra",
+    "I'm in San Francisco",
+    "visiting new york for work",
+    "san fran",
+    "kolkatta",
+    "somewhere over the rainbow",
+]
+
+# (query, expected zone): the region after the comma picks between places sharing a name.
+AMBIGUOUS = [
+    ("I am in Paris, Texas", "America/Chicago"),
+    ("Paris, France", "Europe/Paris"),
+    ("Paris", "Europe/Paris"),
+    ("Portland, Maine", "America/New_York"),
+    ("Portland, Oregon", "America/Los_Angeles"),
+    ("Portland", "America/Los_Angeles"),
+    ("London, Ontario", "America/Toronto"),
+    ("London, UK", "Europe/London"),
+    ("Vancouver, Washington", "America/Los_Angeles"),
+    ("Vancouver, BC", "America/Vancouver"),
+    ("Atlanta, Georgia", "America/New_York"),
+    ("El Paso, Texas", "America/Denver"),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--number", type=int, default=5000)
+    args = parser.parse_args()
+
+    gazetteer = Gazetteer()
+    started = time.perf_counter()
+    entries = len(gazetteer)
+    print(f"loaded {entries} places in {(time.perf_counter() - started) * 1000:.2f} ms\n")
+
+    print(f"{'query':<30} {'match':<36} {'lookup':>9} {'cached':>9}")
+    for query in QUERIES:
+        match = gazetteer.lookup(query)
+        uncached = timeit.timeit(lambda: gazetteer.lookup(query), number=args.number) / args.number * 1e6
+        resolve_timezone(query)
+        cached = timeit.timeit(lambda: resolve_timezone(query), number=args.number) / args.number * 1e6
+        described = f"{match.timezone} ({match.kind})" if match else "-"
+        print(f"{query:<30} {described:<36} {uncached:>7.1f}us {cached:>7.2f}us")
+
+    print("\nshared names:")
+    wrong = 0
+    for query, expected in AMBIGUOUS:
+        match = gazetteer.lookup(query)
+        zone = match.timezone if match else None
+        wrong += zone != expected
+        print(f"  {'ok' if zone == expected else 'WRONG':<5} {query:<26} {zone}" + ("" if zone == expected else f" (expected {expected})"))
+    sys.exit(1 if wrong else 0)
+
+
+if __name__ == "__main__":
+    main()
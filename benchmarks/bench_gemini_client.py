@@ -0,0 +1,83 @@
+"""
+Success rate and latency of GeminiClient against the fault-injecting fake model.
+
+Runs the same request mix through several client configurations (a bare single try,
+retries with backoff, retries plus hedging) and reports answered / failed / answered
+locally (circuit open) and the latency distribution of each.
+
+    python benchmarks/bench_gemini_client.py [--requests 200] [--unavailable 0.1]
+        [--rate-limit 0.05] [--slow 0.1] [--hang 0.03] [--latency 0.2] [--deadline 2]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from fakes import (  # noqa: E402
+    FakeGeminiModel, FaultInjectingModel, FAULT_HANG, FAULT_RATE_LIMIT, FAULT_SLOW, FAULT_UNAVAILABLE
+)
+from gemini_client import GeminiClient, GeminiError, CircuitOpen, CircuitBreaker  # noqa: E402
+
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, max(0, int(q * len(ordered) + 0.5) - 1))] if ordered else 0.0
+
+
+def run(label, model, requests, client_options):
+    client = GeminiClient(lambda: model, **client_options)
+    latencies, answered, failed, local = [], 0, 0, 0
+    chat = None
+    for i in range(requests):
+        started = time.perf_counter()
+        try:
+            reply = client.generate(f"request {i}", chat=chat)
+            chat = reply.chat if i % 5 else model.start_chat()  # a few turns per chat session
+            answered += 1
+        except CircuitOpen:
+            local += 1
+        except GeminiError:
+            failed += 1
+        latencies.append(time.perf_counter() - started)
+    client.close()
+    latencies.sort()
+    print(f"{label:<22} {answered:>8} {failed:>7} {local:>7} "
+          f"{statistics.median(latencies) * 1000:>8.0f} {percentile(latencies, 0.95) * 1000:>8.0f} "
+          f"{percentile(latencies, 0.99) * 1000:>8.0f} {client.breaker.trips:>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--unavailable", type=float, default=0.1)
+    parser.add_argument("--rate-limit", type=float, default=0.05)
+    parser.add_argument("--slow", type=float, default=0.1, help="share of requests that take --slow-seconds longer")
+    parser.add_argument("--slow-seconds", type=float, default=1.0)
+    parser.add_argument("--hang", type=float, default=0.03, help="share of requests that never answer in time")
+    parser.add_argument("--latency", type=float, default=0.2, help="normal time to answer")
+    parser.add_argument("--deadline", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rates = {FAULT_UNAVAILABLE: args.unavailable, FAULT_RATE_LIMIT: args.rate_limit,
+             FAULT_SLOW: args.slow, FAULT_HANG: args.hang}
+    configurations = [
+        ("single try", dict(max_attempts=1)),
+        ("retries", dict(max_attempts=3, backoff_base=0.1)),
+        ("retries + hedging", dict(max_attempts=3, backoff_base=0.1, hedge_after=args.latency * 2)),
+    ]
+    print(f"{args.requests} requests; faults: " + ", ".join(f"{k} {v:.0%}" for k, v in rates.items()))
+    print(f"{'client':<22} {'answered':>8} {'failed':>7} {'local':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'trips':>6}")
+    for label, options in configurations:
+        model = FaultInjectingModel(FakeGeminiModel(first_token_latency=args.latency, chunk_latency=0.0),
+                                    rates=rates, slow_seconds=args.slow_seconds,
+                                    hang_seconds=args.deadline * 3, seed=args.seed)
+        options = dict(options, deadline=args.deadline, total_deadline=args.deadline * 3,
+                       breaker=CircuitBreaker(failure_threshold=4, reset_timeout=2.0))
+        run(label, model, args.requests, options)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Per-turn cost of persisting conversation memory: the old synchronous
+json.dump(indent=4) rewrite versus MemoryStore (write-behind snapshot, and journal mode).
+
+"caller" is the time the main loop is blocked per save; "writes" is how many times
+the disk was actually touched.
+
+    python benchmarks/bench_memory_store.py [--turns 500]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from memory_store import MemoryStore, initial_memory  # noqa: E402
+
+
+def simulated_turns(turns):
+    memory = initial_memory()
+    memory["last_retrieved_ip_location"] = "Pune, Maharashtra, IN"
+    for turn in range(turns):
+        if turn % 3 == 0:
+            memory["accumulated_user_input"].append(f"write an email about item {turn}")
+            memory["last_gemini_question"] = "Who should it go to?"
+            memory["needs_clarification"] = True
+        else:
+            memory["accumulated_user_input"] = []
+            memory["last_gemini_question"] = None
+            memory["needs_clarification"] = False
+        yield memory
+
+
+def legacy(path, turns):
+    start = time.perf_counter()
+    for memory in simulated_turns(turns):
+        with open(path, 'w') as f:
+            json.dump(memory, f, indent=4)
+    return (time.perf_counter() - start) / turns, turns
+
+
+def store(path, turns, **kwargs):
+    memory_store = MemoryStore(path, **kwargs)
+    memory_store.load()
+    caller = 0.0
+    for memory in simulated_turns(turns):
+        start = time.perf_counter()
+        memory_store.save(memory)
+        caller += time.perf_counter() - start
+        time.sleep(0.0005) # the rest of the turn
+    memory_store.close()
+    return caller / turns, memory_store.stats["writes"] + memory_store.stats["journal_appends"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--turns", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        rows = [
+            ("legacy save_memory", legacy(os.path.join(directory, "legacy.json"), args.turns)),
+            ("MemoryStore", store(os.path.join(directory, "snap.json"), args.turns, flush_delay=0.01)),
+            ("MemoryStore + journal", store(os.path.join(directory, "journal.json"), args.turns,
+                                            journal=True, flush_delay=0.01)),
+        ]
+    print(f"{args.turns} turns")
+    print(f"{'backend':<24} {'caller':>10} {'writes':>7}")
+    for name, (per_turn, writes) in rows:
+        print(f"{name:<24} {per_turn * 1e6:>8.1f}us {writes:>7}")
+
+
+if __name__ == "__main__":
+    main()
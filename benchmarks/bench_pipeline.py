@@ -0,0 +1,102 @@
+"""
+End-to-end turn latency and throughput of the asyncio pipeline versus the
+sequential loop, using stub stages with configurable latencies (no microphone,
+network or audio needed).
+
+    python benchmarks/bench_pipeline.py [--turns 20] [--arrival 0.3] [--asr 0.3] [--llm 0.6] [--output 0.4]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pipeline import Pipeline, TurnRecord, END_OF_INPUT, summarize  # noqa: E402
+
+
+class StubUtterance:
+    def __init__(self, text, ended_at):
+        self.text = text
+        self.ended_at = ended_at   # when the (simulated) user stopped talking
+
+
+class StubStages:
+    """
+    Capture delivers an utterance every `arrival` seconds (or immediately, if the caller
+    is already late); the other stages just sleep.
+    """
+
+    def __init__(self, turns, arrival, asr, llm, output):
+        self.turns, self.arrival, self.asr, self.llm, self.output = turns, arrival, asr, llm, output
+        self._delivered = 0
+        self._next_at = None
+
+    def capture(self):
+        if self._delivered >= self.turns:
+            return END_OF_INPUT
+        now = time.monotonic()
+        if self._next_at is None:
+            self._next_at = now
+        if self._next_at > now:
+            time.sleep(self._next_at - now)
+        ended_at = self._next_at
+        self._next_at += self.arrival
+        self._delivered += 1
+        return StubUtterance(f"utterance {self._delivered}", ended_at)
+
+    def recognize(self, utterance):
+        time.sleep(self.asr)
+        return utterance.text
+
+    def process(self, text, emit):
+        time.sleep(self.llm)
+        emit("speak", f"answer to {text}")
+        return True
+
+    def perform(self, kind, text, **options):
+        time.sleep(self.output)
+
+
+def run_sequential(stages):
+    records = []
+    start = time.monotonic()
+    while True:
+        utterance = stages.capture()
+        if utterance is END_OF_INPUT:
+            break
+        turn = TurnRecord(utterance.ended_at)
+        turn.text = stages.recognize(utterance)
+        turn.recognized_at = time.monotonic()
+        stages.process(turn.text, lambda kind, text: stages.perform(kind, text))
+        turn.processed_at = turn.finished_at = time.monotonic()
+        records.append(turn)
+    return records, time.monotonic() - start
+
+
+def run_pipelined(stages):
+    pipeline = Pipeline(stages.capture, stages.recognize, stages.process, stages.perform)
+    start = time.monotonic()
+    records = asyncio.run(pipeline.run())
+    return records, time.monotonic() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--arrival", type=float, default=0.3, help="seconds between utterances")
+    parser.add_argument("--asr", type=float, default=0.3)
+    parser.add_argument("--llm", type=float, default=0.6)
+    parser.add_argument("--output", type=float, default=0.4)
+    args = parser.parse_args()
+
+    def stages():
+        return StubStages(args.turns, args.arrival, args.asr, args.llm, args.output)
+
+    print("sequential:", summarize(*run_sequential(stages())))
+    print("pipelined: ", summarize(*run_pipelined(stages())))
+
+
+if __name__ == "__main__":
+    main()
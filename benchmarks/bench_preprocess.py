@@ -0,0 +1,83 @@
+"""
+Micro-benchmark for utils.preprocess_spoken_text.
+
+Compares the original multi-pass implementation (kept here only for comparison)
+against the compiled single-pass normalizer, per call and in batch mode.
+
+    python benchmarks/bench_preprocess.py [--number 20000]
+"""
+import argparse
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from utils import preprocess_spoken_text, preprocess_batch  # noqa: E402
+
+SAMPLES = [
+    "what is two hundred fifty three plus seven divided by three",
+    "write an email to john at the rate example dot com saying thanks new line regards",
+    "open parenthesis five plus three close parenthesis star twelve",
+    "remind me to hand in the standard report and call one two three four",
+    "what's the time in tokyo",
+]
+
+
+def legacy_preprocess_spoken_text(text):
+    """The pre-compilation implementation: ~50 str.replace passes then ~30 re.sub calls."""
+    text = text.lower()
+    replacements = {
+        "at the rate": "@", "hash tag": "#", "hash": "#", "dollar sign": "$", "percent sign": "%",
+        "ampersand": "&", "asterisk": "*", "star": "*", "plus": "+", "minus": "-", "hyphen": "-",
+        "dash": "-", "slash": "/", "divided by": "/", "backslash": "\\", "equals": "=", "colon": ":",
+        "semicolon": ";", "quote": "'", "double quote": '"', "single quote": "'", "open parenthesis": "(",
+        "close parenthesis": ")", "left parenthesis": "(", "right parenthesis": ")",
+        "square bracket open": "[", "square bracket close": "]", "curly bracket open": "{",
+        "curly bracket close": "}", "less than": "<", "greater than": ">", "comma": ",", "dot": ".",
+        "period": ".", "question mark": "?", "exclamation mark": "!", "underscore": "_", "tilde": "~",
+        "caret": "^", "pipe": "|", "and": "&", "number sign": "#", "exclamation point": "!",
+        "full stop": ".", "new line": "\n", "new paragraph": "\n\n", "tab": "\t",
+    }
+    num_words = {
+        "zero": "0", "one": "1", "two": "2", "three": "3", "four": "4", "five": "5", "six": "6",
+        "seven": "7", "eight": "8", "nine": "9", "ten": "10", "eleven": "11", "twelve": "12",
+        "thirteen": "13", "fourteen": "14", "fifteen": "15", "sixteen": "16", "seventeen": "17",
+        "eighteen": "18", "nineteen": "19", "twenty": "20", "thirty": "30", "forty": "40",
+        "fifty": "50", "sixty": "60", "seventy": "70", "eighty": "80", "ninety": "90", "hundred": "00",
+    }
+    sorted_replacements = sorted(replacements.items(), key=lambda item: len(item[0]), reverse=True)
+    for phrase, symbol in sorted_replacements:
+        text = text.replace(phrase, symbol)
+    for word, digit in num_words.items():
+        text = re.sub(r'\b' + re.escape(word) + r'\b', digit, text)
+    return text
+
+
+def per_call_us(func, number):
+    total = 0.0
+    for sample in SAMPLES:
+        total += timeit.timeit(lambda: func(sample), number=number)
+    return total / (number * len(SAMPLES)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--number", type=int, default=20000, help="calls per sample")
+    args = parser.parse_args()
+
+    legacy = per_call_us(legacy_preprocess_spoken_text, args.number)
+    current = per_call_us(preprocess_spoken_text, args.number)
+    batch = timeit.timeit(lambda: preprocess_batch(SAMPLES), number=args.number) / (args.number * len(SAMPLES)) * 1e6
+
+    print(f"legacy multi-pass   : {legacy:8.2f} us/call")
+    print(f"compiled single-pass: {current:8.2f} us/call  ({legacy / current:.1f}x faster)")
+    print(f"preprocess_batch    : {batch:8.2f} us/text")
+    print()
+    for sample in SAMPLES:
+        print(f"{sample!r}\n  legacy : {legacy_preprocess_spoken_text(sample)!r}\n  current: {preprocess_spoken_text(sample)!r}")
+
+
+if __name__ == "__main__":
+    main()
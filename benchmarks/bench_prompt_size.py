@@ -0,0 +1,61 @@
+"""
+Bytes/tokens per Gemini turn: the old flat prompt (prompts.build_flat_prompt: instructions
++ stitched history every turn) versus system instruction + chat session. "message" is the
+text built per turn; "sent" is what the request carries, since the SDK resends the system
+instruction and the chat history with every message. The history keeps only the user's
+words of earlier turns (prompts.words_only_history), not their time/location context.
+
+    python benchmarks/bench_prompt_size.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from prompts import (  # noqa: E402
+    SYSTEM_INSTRUCTION, build_turn_context, build_command_message, build_clarification_message,
+    build_flat_prompt, estimate_tokens, request_text, words_only_history, PromptMeter,
+)
+from streaming import CLARIFICATION_PREFIX  # noqa: E402
+
+# A command that needs two clarifications, then two one-shot commands.
+SESSION = [
+    ("write an email to my boss", "Who is your boss and what should the email say?"),
+    ("his name is raj, i am sick today", "Should I sign it with your name?"),
+    ("yes, sign it as sam", None),
+    ("what is the capital of france", None),
+    ("write my email signature", None),
+]
+
+
+def main():
+    current_time, ip_location = "Monday, June 23, 2025 at 10:15:00 AM IST", "Pune, Maharashtra, IN"
+    context = build_turn_context(current_time, ip_location)
+    meter = PromptMeter()
+    accumulated, last_question = [], None
+    chat_history = [] # the chat session's history, as the SDK keeps it
+    print(f"system instruction: {len(SYSTEM_INSTRUCTION)} bytes, built once and set on the model\n")
+    print(f"{'turn':<36} {'flat':>6} {'message':>8} {'sent':>6}")
+    for command, question in SESSION:
+        flat = build_flat_prompt(current_time, ip_location, None, command, accumulated, last_question)
+        if accumulated:
+            delta = build_clarification_message(context, command)
+        else:
+            delta = build_command_message(context, command)
+        meter.record(delta, history=chat_history, baseline=flat)
+        sent = request_text(delta, chat_history)
+        print(f"{command[:36]:<36} {len(flat):>6} {len(delta):>8} {len(sent):>6}  "
+              f"(~{estimate_tokens(flat)} -> ~{estimate_tokens(sent)} tokens)")
+        if question:
+            accumulated.append(command)
+            last_question = question
+            chat_history = words_only_history(chat_history + [{"role": "user", "parts": [delta]}], command)
+            chat_history.append({"role": "model", "parts": [f"{CLARIFICATION_PREFIX}{question}"]})
+        else:
+            accumulated, last_question, chat_history = [], None, []
+    print()
+    print(meter.summary())
+
+
+if __name__ == "__main__":
+    main()
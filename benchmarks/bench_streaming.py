@@ -0,0 +1,69 @@
+"""
+Time-to-first-audio benchmark for streamed vs. blocking Gemini replies.
+
+Uses fakes.FakeGeminiModel (no API key needed) and a fake TTS that "speaks" at a
+fixed words-per-second rate, then reports when audio would start and when the
+whole answer would have been spoken.
+
+    python benchmarks/bench_streaming.py [--first-token 0.4] [--chunk 0.05]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from fakes import FakeGeminiModel  # noqa: E402
+from streaming import StreamedResponse, SPEAK_PREFIX  # noqa: E402
+
+REPLY = (
+    "SPEAK_RESPONSE:The capital of France is Paris. It has been the capital for most of the last "
+    "thousand years. Paris sits on the Seine and is home to about two million people. "
+    "The wider metropolitan area is closer to twelve million."
+)
+
+
+def fake_speak(sentence, words_per_second):
+    time.sleep(len(sentence.split()) / words_per_second)
+
+
+def run_blocking(model, words_per_second):
+    start = time.perf_counter()
+    reply = model.generate_content("prompt").text
+    first_audio = time.perf_counter() - start
+    fake_speak(reply[len(SPEAK_PREFIX):], words_per_second)
+    return first_audio, time.perf_counter() - start
+
+
+def run_streaming(model, words_per_second):
+    start = time.perf_counter()
+    streamed = StreamedResponse(lambda: model.generate_content("prompt", stream=True))
+    first_audio = None
+    if streamed.detect_prefix() == SPEAK_PREFIX:
+        for sentence in streamed.sentences():
+            if first_audio is None:
+                first_audio = time.perf_counter() - start
+            fake_speak(sentence, words_per_second)
+    streamed.full_text()
+    return first_audio, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--first-token", type=float, default=0.4, help="seconds before the first chunk")
+    parser.add_argument("--chunk", type=float, default=0.05, help="seconds per 12-character chunk")
+    parser.add_argument("--words-per-second", type=float, default=3.0, help="fake TTS speaking rate")
+    args = parser.parse_args()
+
+    model = FakeGeminiModel([REPLY], first_token_latency=args.first_token, chunk_latency=args.chunk)
+    blocking = run_blocking(model, args.words_per_second)
+    streaming = run_streaming(model, args.words_per_second)
+
+    print(f"{'mode':<10} {'first audio':>12} {'turn done':>10}")
+    print(f"{'blocking':<10} {blocking[0]:>11.3f}s {blocking[1]:>9.3f}s")
+    print(f"{'streaming':<10} {streaming[0]:>11.3f}s {streaming[1]:>9.3f}s")
+
+
+if __name__ == "__main__":
+    main()
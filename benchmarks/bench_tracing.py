@@ -0,0 +1,67 @@
+"""
+Overhead of tracing.Tracer: cost per span and per traced turn, enabled and disabled.
+
+A turn in main() opens about ten spans and writes one JSONL record; the overhead column
+compares that against a fast (local-answer) turn of --turn-ms milliseconds.
+
+    python benchmarks/bench_tracing.py [--number 20000] [--turn-ms 50]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from tracing import Tracer  # noqa: E402
+
+SPANS_PER_TURN = 10
+
+
+def span_cost(tracer, number):
+    def one_span():
+        with tracer.span("asr"):
+            pass
+    return timeit.timeit(one_span, number=number) / number
+
+
+def turn_cost(tracer, number):
+    stages = ["listen", "asr", "preprocess", "cache_lookup", "gemini", "gemini_prefix",
+              "calculation", "focus_wait", "type", "audio_start"][:SPANS_PER_TURN]
+
+    def one_turn():
+        with tracer.turn():
+            for stage in stages:
+                with tracer.span(stage) as span:
+                    span.set(chars=12)
+            tracer.annotate(route="gemini")
+    return timeit.timeit(one_turn, number=number) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--number", type=int, default=20000)
+    parser.add_argument("--turn-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tracers = {
+            "disabled": Tracer(enabled=False),
+            "enabled": Tracer(),
+            "enabled + JSONL": Tracer(trace_path=os.path.join(tmp, "traces.jsonl")),
+        }
+        print(f"{'tracer':<16} {'per span':>10} {'per turn':>10} {'overhead':>10}")
+        for label, tracer in tracers.items():
+            per_span = span_cost(tracer, args.number)
+            per_turn = turn_cost(tracer, max(1, args.number // SPANS_PER_TURN))
+            overhead = per_turn / (args.turn_ms / 1000) * 100
+            print(f"{label:<16} {per_span * 1e6:>8.2f}us {per_turn * 1e6:>8.1f}us {overhead:>9.3f}%")
+            tracer.close()
+
+        print("\nrolling quantiles after the run:")
+        print(tracers["enabled"].summary())
+
+
+if __name__ == "__main__":
+    main()
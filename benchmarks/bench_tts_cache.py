@@ -0,0 +1,115 @@
+"""
+Time to first audio with and without the speech cache (tts_cache.TTSCache).
+
+Speaks a mix of fixed phrases (like main.FIXED_PHRASES), answers that recur and one-off answers
+through SpeechQueue, once without a cache and once with an empty one (so the run includes
+rendering on first use), and reports time-to-audio for live synthesis vs cached playback.
+
+By default the engine and player are the fakes from fakes.py, with --synth-latency seconds
+before a live utterance starts; pass --engine pyttsx3 to measure the real engine (the cache
+then plays through tts_cache.WavPlayer, which needs pyaudio and a sound device).
+
+    python benchmarks/bench_tts_cache.py [--utterances 120] [--synth-latency 0.15]
+        [--render-after 3] [--max-kb 2048] [--engine fake|pyttsx3]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from fakes import FakePlayer, FakeTTSEngine  # noqa: E402
+from speech_output import SpeechQueue  # noqa: E402
+from tts_cache import TTSCache, WavPlayer  # noqa: E402
+
+FIXED_PHRASES = [
+    "Hello, I am your Gemini voice assistant. How can I help you today?",
+    "Okay, I will type that for you. Please switch to the desired application now.",
+    "Goodbye! Have a great day.",
+    "Error: Gemini took too long to answer. Please try again.",
+]
+RECURRING = ["It's sunny and 24 degrees.", "Today is Friday.", "The answer is 42.",
+             "Pride and Prejudice was written by Jane Austen.", "Your next meeting is at three."]
+
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, max(0, int(q * len(ordered) + 0.5) - 1))] if ordered else 0.0
+
+
+def phrase_mix(count, seed):
+    rng = random.Random(seed)
+    phrases = []
+    for i in range(count):
+        roll = rng.random()
+        if roll < 0.4:
+            phrases.append(rng.choice(FIXED_PHRASES))
+        elif roll < 0.7:
+            phrases.append(rng.choice(RECURRING))
+        else:
+            phrases.append(f"Here is a one-off answer number {i} that nobody will hear twice.")
+    return phrases
+
+
+def run(label, phrases, args, cache_dir=None):
+    if args.engine == "pyttsx3":
+        import pyttsx3
+        engine_factory, player_factory = pyttsx3.init, WavPlayer
+    else:
+        engine_factory = lambda: FakeTTSEngine(seconds_per_word=args.word_seconds,
+                                               startup_latency=args.synth_latency,
+                                               render_seconds_per_word=args.word_seconds / 10)
+        player_factory = lambda: FakePlayer(start_latency=args.play_latency)
+    cache = None
+    if cache_dir:
+        cache = TTSCache(cache_dir, max_bytes=args.max_kb * 1024, render_after=args.render_after,
+                         pinned=FIXED_PHRASES)
+    samples = {True: [], False: []}
+    speech = SpeechQueue(engine_factory, cache=cache, player_factory=player_factory,
+                         on_audio=lambda seconds, cached: samples[cached].append(seconds))
+    speech.RENDER_IDLE = args.gap / 2
+    speech.ready.wait(timeout=30)
+    for text in phrases:
+        speech.say(text)
+        speech.wait_until_idle()
+        time.sleep(args.gap) # the user's turn; rendering happens here
+    speech.shutdown(timeout=5)
+
+    everything = sorted(samples[True] + samples[False])
+    line = (f"{label:<14} {statistics.mean(everything) * 1000:>9.1f} {percentile(everything, 0.95) * 1000:>8.1f}")
+    for cached in (False, True):
+        values = sorted(samples[cached])
+        line += (f" {len(values):>6} {statistics.median(values) * 1000:>8.1f}" if values else f" {0:>6} {'-':>8}")
+    print(line)
+    if cache is not None:
+        cache.save()
+        print(f"  cache: {cache.summary()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--utterances", type=int, default=120)
+    parser.add_argument("--synth-latency", type=float, default=0.15, help="fake engine: seconds before live audio starts")
+    parser.add_argument("--play-latency", type=float, default=0.005, help="fake player: seconds before playback starts")
+    parser.add_argument("--word-seconds", type=float, default=0.01, help="fake engine: seconds per spoken word")
+    parser.add_argument("--gap", type=float, default=0.1, help="pause between utterances")
+    parser.add_argument("--render-after", type=int, default=3)
+    parser.add_argument("--max-kb", type=int, default=2048, help="cache size bound")
+    parser.add_argument("--engine", choices=["fake", "pyttsx3"], default="fake")
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    phrases = phrase_mix(args.utterances, args.seed)
+    print(f"{args.utterances} utterances ({args.engine} engine); time to first audio in ms")
+    print(f"{'run':<14} {'mean':>9} {'p95':>8} {'live':>6} {'p50':>8} {'cached':>6} {'p50':>8}")
+    run("no cache", phrases, args)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        run("cold cache", phrases, args, cache_dir)
+        run("warm cache", phrases, args, cache_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Typed characters per second for each typing backend.
+
+Real backends type into whatever window has focus, so open an empty editor and click
+into it during the countdown. The default, "auto", measures the backend the assistant
+would pick (TYPING_BACKEND, else xdotool on X11, clipboard paste, then pyautogui); name
+others to compare them. "recording" sends no keystrokes, so it only shows the overhead of
+the harness and is reported apart from the chars/s table.
+
+    python benchmarks/bench_typing.py [--backends auto|clipboard,xdotool,pyautogui,recording] [--chars 5000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from typing_backends import BACKENDS, create_typing_backend, RecordingBackend, TypingError, TypingStats  # noqa: E402
+
+SAMPLE = ("Dear team, thank you for the extra effort this quarter. The release went out on time, "
+          "the support queue is down by a third, and the feedback has been great.\n")
+
+
+def sample_text(chars):
+    return (SAMPLE * (chars // len(SAMPLE) + 1))[:chars]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--backends", default="auto", help="comma-separated; 'auto' is what the assistant would use")
+    parser.add_argument("--chars", type=int, default=5000)
+    parser.add_argument("--countdown", type=float, default=3.0, help="seconds to focus an editor before typing")
+    args = parser.parse_args()
+
+    text = sample_text(args.chars)
+    stats = TypingStats()
+    for name in args.backends.split(","):
+        name = name.strip()
+        try:
+            backend = create_typing_backend(name) if name == "auto" else BACKENDS[name]()
+        except KeyError:
+            print(f"{name}: unknown backend (choose from auto, {', '.join(BACKENDS)})")
+            continue
+        except TypingError as e:
+            print(f"{name}: unavailable ({e})")
+            continue
+        name = backend.name
+        if not isinstance(backend, RecordingBackend):
+            print(f"{name}: typing {len(text)} characters in {args.countdown:.0f}s - focus an empty editor")
+            time.sleep(args.countdown)
+        started = time.perf_counter()
+        try:
+            backend.type_text(text)
+        except TypingError as e:
+            print(f"{name}: failed ({e})")
+            continue
+        stats.record(name, len(text), time.perf_counter() - started)
+
+    typed = [name for name in stats.by_backend if name != RecordingBackend.name]
+    if not typed:
+        print("\nNo real backend was measured; install xdotool, pyperclip or pyautogui, or name one with --backends.")
+    else:
+        print(f"\n{'backend':<12} {'chars/s':>10} {'5,000 chars':>12}")
+        for name in typed:
+            rate = stats.chars_per_second(name)
+            print(f"{name:<12} {rate:>10.0f} {5000 / rate if rate else 0:>11.2f}s")
+        print(f"{'(old loop)':<12} {'<100':>10} {'>50':>11}s   pyautogui.write(interval=0.01) + 2 s sleep")
+    if RecordingBackend.name in stats.by_backend:
+        characters, seconds, _ = stats.by_backend[RecordingBackend.name]
+        print(f"recording (no keystrokes, harness overhead only): {seconds * 1e6:.1f} us for {characters} chars")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Latency / word-error-rate comparison of speech recognizer backends on WAV fixtures.
+
+Point it at a directory of 16-bit mono WAV files, each with a same-named .txt file
+holding the reference transcript:
+
+    python benchmarks/compare_recognizers.py fixtures/ --backends google vosk
+
+Without a directory it uses benchmarks/sessions/fixtures. The fixture there is synthesized
+voiced sound, not recorded speech: it checks that WAV loading and every backend run end to
+end (backends that are not installed or configured are skipped), but its word error rate
+says nothing about accuracy. Record your own fixtures for that.
+"""
+import argparse
+import glob
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from recognizers import create_backend, load_wav_utterance, RecognitionError  # noqa: E402
+
+DEFAULT_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sessions", "fixtures")
+
+
+def word_error_rate(reference, hypothesis):
+    """Word-level Levenshtein distance divided by the reference length."""
+    ref = reference.lower().split()
+    hyp = hypothesis.lower().split()
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hyp, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1] / max(1, len(ref))
+
+
+def load_fixtures(directory):
+    fixtures = []
+    for wav_path in sorted(glob.glob(os.path.join(directory, "*.wav"))):
+        txt_path = os.path.splitext(wav_path)[0] + ".txt"
+        if os.path.exists(txt_path):
+            with open(txt_path) as f:
+                fixtures.append((wav_path, load_wav_utterance(wav_path), f.read().strip()))
+    return fixtures
+
+
+def evaluate(backend, fixtures):
+    latencies, errors, failures = [], [], 0
+    for path, utterance, reference in fixtures:
+        start = time.perf_counter()
+        try:
+            hypothesis = backend.recognize(utterance)
+        except RecognitionError as e:
+            hypothesis = ""
+            failures += 1
+            print(f"  {os.path.basename(path)}: {e}")
+        latencies.append(time.perf_counter() - start)
+        errors.append(word_error_rate(reference, hypothesis))
+    return latencies, errors, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("fixtures", nargs="?", default=DEFAULT_FIXTURES, help="directory of .wav + .txt pairs")
+    parser.add_argument("--backends", nargs="+", default=["google", "vosk"])
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.fixtures)
+    if not fixtures:
+        sys.exit(f"No .wav/.txt fixture pairs found in {args.fixtures}")
+    audio_seconds = sum(utterance.duration for _, utterance, _ in fixtures)
+
+    print(f"{len(fixtures)} fixtures, {audio_seconds:.1f}s of audio\n")
+    print(f"{'backend':<8} {'mean':>8} {'p95':>8} {'RTF':>6} {'WER':>6} {'failed':>6}")
+    for name in args.backends:
+        try:
+            backend = create_backend(name)
+        except RecognitionError as e:
+            print(f"{name:<8} unavailable: {e}")
+            continue
+        latencies, errors, failures = evaluate(backend, fixtures)
+        p95 = sorted(latencies)[max(0, int(len(latencies) * 0.95) - 1)]
+        print(f"{name:<8} {statistics.mean(latencies) * 1000:>6.0f}ms {p95 * 1000:>6.0f}ms "
+              f"{sum(latencies) / audio_seconds:>6.2f} {statistics.mean(errors):>6.1%} {failures:>6}")
+
+
+if __name__ == "__main__":
+    main()
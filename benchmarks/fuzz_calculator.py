@@ -0,0 +1,101 @@
+"""
+Random-expression fuzzer for calculator.evaluate().
+
+Checks that every input either evaluates or raises CalculationError (never anything
+else), that no call takes longer than calculator.TIME_LIMIT plus a small margin, and
+that float mode agrees with eval() on small inputs eval() can handle safely.
+
+Half the inputs are token soup (mostly rejected by the parser); the other half come
+from a small grammar of well-formed expressions, so most of them reach the evaluator.
+
+    python benchmarks/fuzz_calculator.py [--iterations 20000] [--seed 1]
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from calculator import evaluate, CalculationError, MODES, MODE_FLOAT, TIME_LIMIT  # noqa: E402
+
+TOKENS = ["1", "2", "9", "0", "0.5", "10", "99", "1e3", "+", "-", "*", "/", "//", "%", "**", "^",
+          "(", ")", " ", "sqrt(", "round(", ",", "pi", "abs(", "x", "__", "[", "'", "%of", "1,000"]
+MARGIN = 0.02
+NUMBERS = ["0", "1", "2", "3", "7", "10", "0.1", "0.5", "1.5", "99", "1000", "1e3", "1e-5", "1,000", "3.14159", "20%"]
+EXPONENTS = ["2", "3", "0.5", "-1", "-2", "10", "50", "99", "101", "400", "999", "1001", "(1/3)"]
+GRAMMAR_FUNCTIONS = [("sqrt", 1), ("abs", 1), ("round", 1), ("round", 2), ("floor", 1), ("ceil", 1),
+                     ("min", 2), ("max", 3)]
+
+
+def random_expression(rng):
+    return "".join(rng.choice(TOKENS) for _ in range(rng.randint(1, 40)))
+
+
+def grammar_expression(rng, depth=0):
+    """A well-formed expression: numbers, constants, operators, powers and function calls."""
+    roll = rng.random()
+    if depth >= 4 or roll < 0.3:
+        return rng.choice(NUMBERS + ["pi", "e"])
+    if roll < 0.55:
+        op = rng.choice(["+", "-", "*", "/", "//", "%", " ^ ", " × ", " ÷ "])
+        return f"{grammar_expression(rng, depth + 1)} {op} {grammar_expression(rng, depth + 1)}"
+    if roll < 0.7:
+        return f"({grammar_expression(rng, depth + 1)})**{rng.choice(EXPONENTS)}"
+    if roll < 0.8:
+        return f"-({grammar_expression(rng, depth + 1)})"
+    if roll < 0.9:
+        name, arity = rng.choice(GRAMMAR_FUNCTIONS)
+        return f"{name}({', '.join(grammar_expression(rng, depth + 1) for _ in range(arity))})"
+    return f"({grammar_expression(rng, depth + 1)})"
+
+
+def safe_for_eval(expression):
+    return all(ch in "0123456789.+-*/() " for ch in expression) and "**" not in expression
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    failures, slowest, accepted, compared = 0, 0.0, 0, 0
+    for i in range(args.iterations):
+        expression = grammar_expression(rng) if i % 2 else random_expression(rng)
+        for mode in MODES:
+            start = time.perf_counter()
+            try:
+                result = evaluate(expression, mode)
+                accepted += 1
+            except CalculationError:
+                result = None
+            except Exception as e:
+                failures += 1
+                print(f"FAIL {mode}: {expression!r} raised {type(e).__name__}: {e}")
+                continue
+            elapsed = time.perf_counter() - start
+            slowest = max(slowest, elapsed)
+            if elapsed > TIME_LIMIT + MARGIN:
+                failures += 1
+                print(f"SLOW {mode}: {expression!r} took {elapsed * 1000:.1f} ms")
+            if mode == MODE_FLOAT and result is not None and safe_for_eval(expression):
+                try:
+                    expected = eval(expression)
+                except Exception:
+                    continue
+                compared += 1
+                if not math.isclose(float(result), float(expected), rel_tol=1e-9, abs_tol=1e-12):
+                    failures += 1
+                    print(f"MISMATCH: {expression!r} gave {result}, eval gave {expected}")
+
+    print(f"{args.iterations} expressions x {len(MODES)} modes: {accepted} evaluated, "
+          f"{compared} cross-checked against eval, slowest {slowest * 1000:.2f} ms, {failures} failures")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Load test for server.py: many concurrent sessions against one in-process server.
+
+The server runs the real turn logic with the fake Gemini model from fakes.py; simulated
+users run in separate client processes, so the server's CPU time can be measured on its
+own. Every user replays a scripted session (default: benchmarks/sessions/sample_session.jsonl)
+from its own location, which exercises per-session memory: a clarification or location
+question in one session must not leak into another. Reports throughput, turn latency,
+server CPU per turn and the sessions one core can carry at a given pace of speaking.
+
+    python benchmarks/load_test_server.py [--users 200] [--client-processes 4] [--repeat 2]
+        [--gemini-latency 0.3] [--pool 64] [--rate-limit 0] [--think 0] [--pace 10]
+"""
+import argparse
+import contextlib
+import http.client
+import io
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import threading
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+DEFAULT_SESSION = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sessions", "sample_session.jsonl")
+
+
+def load_turns(path):
+    with open(path, encoding="utf-8") as f:
+        turns = [json.loads(line) for line in f if line.strip()]
+    return [turn for turn in turns if turn.get("say")]
+
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, max(0, int(q * len(ordered) + 0.5) - 1))] if ordered else 0.0
+
+
+# --- Client Side (runs in child processes) ---
+
+
+def request(connection, method, path, document=None):
+    body = json.dumps(document).encode("utf-8") if document is not None else None
+    connection.request(method, path, body=body, headers={"Content-Type": "application/json"})
+    response = connection.getresponse()
+    data = response.read()
+    return response.status, json.loads(data) if data else None
+
+
+def simulate_user(port, user, turns, repeat, think, results, lock):
+    """One user: opens a session, says every turn `repeat` times, closes the session."""
+    latencies, failures, errors = [], 0, []
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+    try:
+        status, created = request(connection, "POST", "/sessions", {"location": f"Load Test City {user}", "timezone": "UTC"})
+        if status != 201:
+            raise RuntimeError(f"could not open a session: {status} {created}")
+        session = created["session"]
+        for _ in range(repeat):
+            for turn in turns:
+                started = time.perf_counter()
+                status, reply = request(connection, "POST", f"/sessions/{session}/text", {"text": turn["say"]})
+                latencies.append(time.perf_counter() - started)
+                if status != 200:
+                    errors.append(f"{status} {reply}")
+                elif turn.get("expect") and not any(turn["expect"] in action["text"] for action in reply["actions"]):
+                    failures += 1
+                if think:
+                    time.sleep(think)
+        request(connection, "DELETE", f"/sessions/{session}")
+    except (OSError, http.client.HTTPException, RuntimeError) as e:
+        errors.append(str(e))
+    finally:
+        connection.close()
+    with lock:
+        results["latencies"].extend(latencies)
+        results["failures"] += failures
+        results["errors"].extend(errors)
+
+
+def run_clients(port, first_user, users, turns, repeat, think):
+    """Runs `users` simulated users on threads; returns their latencies, failures and errors."""
+    results = {"latencies": [], "failures": 0, "errors": []}
+    lock = threading.Lock()
+    threads = [threading.Thread(target=simulate_user, args=(port, first_user + i, turns, repeat, think, results, lock))
+               for i in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+# --- Server Side ---
+
+
+def start_server(args, turns):
+    os.environ.setdefault("GEMINI_API_KEY", "offline-load-test")
+    os.environ["TRACING"] = "1"
+    os.environ["TRACE_FILE"] = ""
+    os.environ.pop("METRICS_PORT", None)
+    os.environ["GEMINI_MAX_CONCURRENCY"] = str(args.pool)
+    if args.rate_limit:
+        os.environ["GEMINI_RATE_LIMIT"] = str(args.rate_limit)
+    import main as assistant
+    import server
+    from fakes import FakeGeminiModel
+    from sessions import SessionManager
+
+    # Scripted replies, found by the (preprocessed) command in the prompt. A command scripted
+    # with different replies (the same question asked again later) gets its first one, so
+    # the later turns' expectations cannot be checked.
+    replies = {}
+    for turn in turns:
+        if turn.get("gemini"):
+            command = assistant.preprocess_spoken_text(turn["say"])
+            replies.setdefault(command, turn["gemini"])
+            if replies[command] != turn["gemini"]:
+                turn["expect"] = None
+    commands = sorted(replies, key=len, reverse=True)
+
+    def reply_for(prompt):
+        return next((replies[command] for command in commands if command in prompt),
+                    "SPEAK_RESPONSE:(no scripted reply)")
+
+    server.prepare_assistant()
+    assistant._model = FakeGeminiModel(responses=reply_for, first_token_latency=args.gemini_latency, chunk_latency=0.0)
+    sessions = SessionManager(idle_timeout=args.idle_timeout, max_sessions=args.users + 10).start_sweeper(1.0)
+    return assistant, server.AssistantServer(sessions, port=0).start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("session", nargs="?", default=DEFAULT_SESSION, help="scripted turns every user says")
+    parser.add_argument("--users", type=int, default=200, help="concurrent sessions")
+    parser.add_argument("--client-processes", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=2, help="times each user says the whole script")
+    parser.add_argument("--think", type=float, default=0.0, help="seconds each user waits between turns")
+    parser.add_argument("--gemini-latency", type=float, default=0.3, help="fake Gemini response time")
+    parser.add_argument("--pool", type=int, default=64, help="GEMINI_MAX_CONCURRENCY for the shared client")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="GEMINI_RATE_LIMIT (requests/s, 0 = none)")
+    parser.add_argument("--idle-timeout", type=float, default=300.0)
+    parser.add_argument("--pace", type=float, default=10.0,
+                        help="seconds between a real user's commands, for the sessions-per-core estimate")
+    args = parser.parse_args()
+
+    turns = load_turns(args.session)
+    with contextlib.redirect_stdout(io.StringIO()):
+        assistant, http_server = start_server(args, turns)
+    port = http_server.httpd.server_address[1]
+
+    context = multiprocessing.get_context("spawn")
+    processes = max(1, min(args.client_processes, args.users))
+    shares = [args.users // processes + (1 if i < args.users % processes else 0) for i in range(processes)]
+    starts = [sum(shares[:i]) for i in range(processes)]
+
+    cpu_started, started = time.process_time(), time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        with context.Pool(processes) as pool:
+            outcomes = pool.starmap(run_clients, [(port, starts[i], shares[i], turns, args.repeat, args.think)
+                                                  for i in range(processes)])
+    elapsed, cpu = time.perf_counter() - started, time.process_time() - cpu_started
+    time.sleep(0.1)
+    health = http_server.health()
+    http_server.close()
+    assistant.gemini_client.close()
+
+    latencies = sorted(l for outcome in outcomes for l in outcome["latencies"])
+    failures = sum(outcome["failures"] for outcome in outcomes)
+    errors = [e for outcome in outcomes for e in outcome["errors"]]
+    count = len(latencies)
+    cpu_per_turn = cpu / count if count else 0.0
+    print(f"{args.users} sessions x {len(turns) * args.repeat} turns = {count} turns in {elapsed:.2f}s "
+          f"({count / elapsed:.0f} turns/s); fake Gemini {args.gemini_latency * 1000:.0f} ms, pool {args.pool}"
+          + (f", rate limit {args.rate_limit:g}/s" if args.rate_limit else ""))
+    if latencies:
+        print(f"turn latency: p50 {statistics.median(latencies) * 1000:.0f} ms, "
+              f"p95 {percentile(latencies, 0.95) * 1000:.0f} ms, p99 {percentile(latencies, 0.99) * 1000:.0f} ms")
+    print(f"wrong answers: {failures}, errors: {len(errors)}" + (f" (first: {errors[0]})" if errors else ""))
+    print(f"server CPU: {cpu:.2f}s on {os.cpu_count()} core(s), {cpu_per_turn * 1000:.2f} ms per turn")
+    if cpu_per_turn:
+        print(f"sessions per core at one command every {args.pace:g}s: ~{args.pace / cpu_per_turn:.0f} (CPU-bound estimate)")
+    gemini = health["gemini"]
+    print(f"Gemini client: {gemini['requests']} requests, {gemini['throttled']} throttled, "
+          f"{gemini['timeouts']} timeouts; response cache: {health['response_cache']}")
+    print(f"sessions: {health['session_stats']}, still open: {health['sessions']}")
+    sys.exit(1 if failures or errors else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""
+Replays scripted sessions through the real turn logic in main.py, offline.
+
+Each line of a session file (JSONL) is one turn:
+
+    {"say": "what is twelve times seven", "expect": "84"}
+    {"say": "who wrote hamlet", "gemini": "SPEAK_RESPONSE:Shakespeare.", "expect": "Shakespeare",
+     "wav": "fixtures/hamlet.wav", "asr_latency": 0.5, "gemini_latency": 1.2}
+
+- say: what the (fake) recognizer hears; empty means "could not understand".
+- gemini: the scripted model reply, prefix included, if the turn reaches Gemini.
+- expect: text that must appear in what the turn spoke or typed (null: nothing checked).
+- expect_timezone: the turn must answer with the local time in this zone (e.g. after the user
+  said where they are).
+- wav: optional 16-bit mono WAV (relative to the session file) used as the utterance audio.
+  It is fed frame by frame through recognizers.LiveTranscriber, as the microphone would be.
+- asr_latency / gemini_latency: per-turn overrides of the command-line latencies.
+
+Recognition, Gemini and text-to-speech are replaced by the stand-ins in fakes.py and
+typing by typing_backends.RecordingBackend;
+preprocessing, the local fast path, the response cache, prompts, the calculator and
+memory are the real code. Stage latencies come from main.tracer. Save a run with
+--save-baseline and check later runs with --baseline to catch regressions.
+
+    python benchmarks/replay.py [sessions/*.jsonl] [--repeat 3] [--asr-latency 0.3]
+        [--gemini-latency 0.6] [--chunk-latency 0.05] [--tts-word 0.02] [--type-char 0.005]
+        [--faults unavailable=0.2,hang=0.05 --gemini-timeout 2]
+        [--baseline baseline.json --tolerance 0.25] [--save-baseline baseline.json]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from audio_capture import Utterance, FRAME_MS, SAMPLE_RATE, SAMPLE_WIDTH  # noqa: E402
+from fakes import FakeGeminiModel, FakeRecognizer, FakeTTSEngine, FaultInjectingModel  # noqa: E402
+from recognizers import load_wav_utterance, LiveTranscriber  # noqa: E402
+from typing_backends import RecordingBackend  # noqa: E402
+
+DEFAULT_SESSION = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sessions", "sample_session.jsonl")
+UNSCRIPTED_REPLY = "SPEAK_RESPONSE:(this turn has no scripted Gemini reply)"
+BASELINE_SLACK = 0.001  # seconds; stages faster than this are noise, not regressions
+
+
+def load_session(path):
+    """Reads a session file into a list of turn dicts."""
+    turns = []
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                turns.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                raise SystemExit(f"{path}:{number}: {e}")
+    return turns
+
+
+def parse_faults(spec):
+    """'unavailable=0.2,hang=0.05' -> {'unavailable': 0.2, 'hang': 0.05}"""
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        fault, _, rate = item.partition("=")
+        rates[fault.strip()] = float(rate)
+    return rates
+
+
+def make_utterance(turn, base_dir, speech_seconds):
+    """The turn's WAV fixture, or silence of a plausible length ending now."""
+    if turn.get("wav"):
+        utterance = load_wav_utterance(os.path.join(base_dir, turn["wav"]))
+    else:
+        utterance = Utterance(b"\0" * (int(SAMPLE_RATE * speech_seconds) * SAMPLE_WIDTH), SAMPLE_RATE, 0.0, 0.0)
+    utterance.ended_at = time.monotonic()
+    return utterance
+
+
+def transcribe_live(recognizer, utterance):
+    """Streams the utterance's audio through a LiveTranscriber, leaving the transcript on it."""
+    transcriber = LiveTranscriber(recognizer, utterance.sample_rate)
+    frame_bytes = int(utterance.sample_rate * FRAME_MS / 1000) * SAMPLE_WIDTH
+    transcriber.on_speech_start()
+    for offset in range(0, len(utterance.pcm), frame_bytes):
+        transcriber.on_frame(utterance.pcm[offset:offset + frame_bytes])
+    transcriber.on_speech_end(utterance)
+
+
+class Replay:
+    """Swaps main.py's external services for fakes and runs scripted turns like main() does."""
+
+    def __init__(self, main_module, args, workdir):
+        self.main = main_module
+        self.args = args
+        self.current = {}
+        self.outputs = []
+        self.failures = []
+        self.turns = 0
+
+        self.recognizer = FakeRecognizer(latency=args.asr_latency)
+        self.model = FakeGeminiModel(responses=lambda prompt: self.current.get("gemini") or UNSCRIPTED_REPLY,
+                                     first_token_latency=args.gemini_latency,
+                                     chunk_latency=args.chunk_latency)
+        # Reports a window switch on its second poll, so write_response() waits about as long
+        # as a user who switches right away.
+        self.typer = RecordingBackend(seconds_per_char=args.type_char, windows=["assistant", "target"])
+
+        main = self.main
+        main.speech_queue.shutdown(drain=False, timeout=1)
+        main.speech_queue = main.SpeechQueue(lambda: FakeTTSEngine(seconds_per_word=args.tts_word),
+                                             on_spoken=main._record_speech_timing)
+        main._model = self.model
+        if args.faults:
+            main._model = FaultInjectingModel(self.model, rates=parse_faults(args.faults),
+                                              hang_seconds=args.gemini_timeout * 3, seed=0)
+        main.gemini_client.deadline = args.gemini_timeout
+        main._recognizer_backend = self.recognizer
+        main._typing_backend = self.typer
+        main.response_cache = main.ResponseCache()
+        main.memory_store = main.MemoryStore(os.path.join(workdir, "memory.json"))
+        main.local_session = main.Session("replay", store=main.memory_store)
+        main.local_session.load()
+        main.local_session.set_location("Replay City, Replay Region, RC", args.timezone)
+        if args.no_stream:
+            main.STREAM_RESPONSES = False
+
+    def emit(self, kind, text, priority=None):
+        self.outputs.append(text)
+        if kind == self.main.ACTION_WRITE:
+            self.typer.windows = ["assistant", "target"]
+            self.main.write_response(text)
+        else:
+            self.main.speak_response(text, priority=self.main.PRIORITY_NORMAL if priority is None else priority)
+
+    def run_turn(self, turn, base_dir):
+        """Runs one scripted turn; returns False if it asked the assistant to exit."""
+        main = self.main
+        self.current = turn
+        self.outputs = []
+        self.recognizer.latency = turn.get("asr_latency", self.args.asr_latency)
+        self.model.first_token_latency = turn.get("gemini_latency", self.args.gemini_latency)
+
+        utterance = make_utterance(turn, base_dir, self.args.speech_seconds)
+        local_times = self.local_times(turn.get("expect_timezone"))
+        keep_going = True
+        with main.tracer.turn(replay=self.turns + 1):
+            if turn.get("wav"):
+                self.recognizer.expect_audio(utterance.pcm, turn.get("say", ""))
+                transcribe_live(self.recognizer, utterance)
+            else:
+                self.recognizer.expect(utterance, turn.get("say", ""))
+            user_input = main.recognize_utterance(utterance)
+            if user_input:
+                main.speech_queue.barge_in()
+                keep_going = main.handle_user_input(user_input, emit=self.emit)
+        self.turns += 1
+
+        expected = turn.get("expect")
+        if expected is not None and not any(expected in output for output in self.outputs):
+            self.failures.append((turn.get("say"), expected, self.outputs))
+        if local_times:
+            local_times |= self.local_times(turn["expect_timezone"]) # the minute may have turned
+            if not any(time_answer in output for time_answer in local_times for output in self.outputs):
+                self.failures.append((turn.get("say"), f"the time in {turn['expect_timezone']}", self.outputs))
+        if not self.args.overlap_speech:
+            main.speech_queue.wait_until_idle()
+        return keep_going
+
+    def local_times(self, timezone):
+        """The assistant's spoken answer for the current time in `timezone` (empty without one)."""
+        if not timezone:
+            return set()
+        return {self.main.describe_local_time(timezone, self.main.INTENT_TIME)}
+
+    def close(self):
+        self.main.speech_queue.shutdown(drain=False, timeout=1)
+        self.main.memory_store.close()
+
+
+def stage_table(tracer):
+    """{stage: {"p50": s, "p95": s, "p99": s, "count": n}} from the tracer's rolling windows."""
+    return {name: {"p50": q[0.5], "p95": q[0.95], "p99": q[0.99], "count": count}
+            for name, (count, _, q) in tracer.snapshot().items()}
+
+
+def find_regressions(current, baseline, tolerance):
+    regressions = []
+    for stage, old in baseline.items():
+        new = current.get(stage)
+        if new and new["p95"] > old["p95"] * (1 + tolerance) + BASELINE_SLACK:
+            regressions.append(f"{stage}: p95 {old['p95'] * 1000:.1f} ms -> {new['p95'] * 1000:.1f} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("sessions", nargs="*", default=[DEFAULT_SESSION])
+    parser.add_argument("--repeat", type=int, default=1, help="replay every session this many times")
+    parser.add_argument("--asr-latency", type=float, default=0.3)
+    parser.add_argument("--gemini-latency", type=float, default=0.6, help="seconds to Gemini's first chunk")
+    parser.add_argument("--chunk-latency", type=float, default=0.05, help="seconds per further streamed chunk")
+    parser.add_argument("--tts-word", type=float, default=0.02, help="seconds the fake TTS takes per word")
+    parser.add_argument("--type-char", type=float, default=0.005, help="seconds the fake typer takes per character")
+    parser.add_argument("--speech-seconds", type=float, default=1.5, help="length of the synthetic utterance audio")
+    parser.add_argument("--timezone", default="UTC", help="IP-based timezone to pretend we are in")
+    parser.add_argument("--no-stream", action="store_true", help="wait for whole Gemini replies")
+    parser.add_argument("--faults", default="", help="inject Gemini faults, e.g. unavailable=0.2,rate_limit=0.1,hang=0.05")
+    parser.add_argument("--gemini-timeout", type=float, default=5.0, help="per-request Gemini deadline")
+    parser.add_argument("--overlap-speech", action="store_true",
+                        help="start the next turn without waiting for speech to finish (barge-in)")
+    parser.add_argument("--trace-file", default="", help="also write main.py's per-turn JSONL trace records here")
+    parser.add_argument("--baseline", help="stage latencies saved by --save-baseline to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p95 slowdown vs the baseline")
+    parser.add_argument("--save-baseline", help="write this run's stage latencies here")
+    parser.add_argument("--verbose", action="store_true", help="show main.py's console output")
+    args = parser.parse_args()
+
+    # main.py reads these at import time.
+    os.environ.setdefault("GEMINI_API_KEY", "offline-replay")
+    os.environ["TRACING"] = "1"
+    os.environ["TRACE_FILE"] = args.trace_file
+    os.environ.pop("METRICS_PORT", None)
+    import main as assistant
+
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with tempfile.TemporaryDirectory() as workdir:
+        replay = Replay(assistant, args, workdir)
+        started = time.perf_counter()
+        try:
+            with output:
+                for _ in range(args.repeat):
+                    for path in args.sessions:
+                        base_dir = os.path.dirname(os.path.abspath(path))
+                        for turn in load_session(path):
+                            if not replay.run_turn(turn, base_dir):
+                                break
+        finally:
+            replay.close()
+        elapsed = time.perf_counter() - started
+
+    print(f"Replayed {replay.turns} turns from {len(args.sessions)} session file(s) in {elapsed:.2f}s "
+          f"({replay.turns / elapsed:.2f} turns/s)")
+    print(f"Local fast path: {assistant.intent_stats.summary()}")
+    print(f"Response cache: {assistant.response_cache.summary()}")
+    print(f"Typing: {assistant.typing_stats.summary()}")
+    print(f"Gemini client: {assistant.gemini_client.stats}, breaker trips: {assistant.gemini_client.breaker.trips}")
+    print("Stage latency (p50 / p95 / p99):")
+    print(assistant.tracer.summary())
+
+    status = 0
+    if replay.failures:
+        status = 1
+        print(f"\n{len(replay.failures)} turn(s) did not produce the expected output:")
+        for said, expected, outputs in replay.failures:
+            print(f"  {said!r}: expected {expected!r}, got {outputs!r}")
+
+    stages = stage_table(assistant.tracer)
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(stages, f, indent=2)
+        print(f"\nSaved baseline to {args.save_baseline}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = find_regressions(stages, json.load(f), args.tolerance)
+        if regressions:
+            status = 1
+            print(f"\nRegressions beyond {args.tolerance:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+        else:
+            print(f"\nNo stage regressed beyond {args.tolerance:.0%} of the baseline.")
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+# calculator.py
+import ast
+import decimal
+import math
+import operator
+import re
+import time
+from fractions import Fraction
+
+# --- Bounded Arithmetic Evaluator ---
+# Replaces eval() for Gemini-extracted and locally extracted expressions. Only numbers,
+# arithmetic operators and a handful of math functions are accepted, and every step is
+# bounded so adversarial input ("9**9**9**9") fails fast instead of freezing the assistant.
+
+MODE_FLOAT = "float"        # plain Python floats/ints
+MODE_DECIMAL = "decimal"    # exact decimal arithmetic, "0.1 + 0.2" gives "0.3"
+MODE_FRACTION = "fraction"  # exact rationals, "1 / 3" gives "1/3"
+MODES = (MODE_FLOAT, MODE_DECIMAL, MODE_FRACTION)
+
+MAX_EXPRESSION_LENGTH = 250   # characters
+MAX_NODES = 150               # AST nodes
+MAX_EXPONENT = 1000           # largest |exponent| for **
+MAX_DIGITS = 100              # operands and results must stay below 10 ** MAX_DIGITS
+                              # (in fraction mode, numerators and denominators too)
+MAX_ROUND_DIGITS = 20
+TIME_LIMIT = 0.05             # seconds of wall-clock time per evaluation
+
+_MAGNITUDE_LIMIT = 10 ** MAX_DIGITS
+
+
+class CalculationError(ValueError):
+    """The expression is not a valid calculation. The message is safe to speak to the user."""
+
+
+class UnsupportedExpression(CalculationError):
+    """The expression uses something other than numbers, operators and the allowed functions."""
+
+
+class CalculationLimitError(CalculationError):
+    """The calculation would exceed a size or time limit."""
+
+
+# --- Spoken-Math Normalization ---
+
+_NORMALIZE_STEPS = [
+    (re.compile(r"×"), "*"),
+    (re.compile(r"÷"), "/"),
+    (re.compile(r"\^"), "**"),
+    (re.compile(r"(?<=\d),(?=\d{3}(?!\d))"), ""),             # 1,000 -> 1000
+    (re.compile(r"%\s*of\b"), "% *"),                          # 20% of 50 -> 20% * 50
+    (re.compile(r"(\d+(?:\.\d+)?)\s*%(?=\s*(?:$|[)+\-*/]))"), r"(\1/100)"),  # postfix percent
+]
+
+
+def normalize_expression(expression):
+    """Rewrites spoken-math notation (^, ×, thousands commas, percentages) into Python syntax."""
+    for pattern, replacement in _NORMALIZE_STEPS:
+        expression = pattern.sub(replacement, expression)
+    return expression.strip()
+
+
+# --- Evaluation ---
+
+_BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+}
+_UNARY_OPERATORS = {ast.UAdd: operator.pos, ast.USub: operator.neg}
+
+
+def _sqrt(x):
+    if x < 0:
+        raise CalculationError("cannot take the square root of a negative number")
+    if isinstance(x, decimal.Decimal):
+        return x.sqrt()
+    return math.sqrt(x)
+
+
+def _round(x, digits=0):
+    digits = int(digits)
+    if abs(digits) > MAX_ROUND_DIGITS:
+        raise CalculationLimitError(f"can only round to at most {MAX_ROUND_DIGITS} digits")
+    return round(x, digits) if digits else round(x)
+
+
+FUNCTIONS = {
+    "sqrt": (_sqrt, 1, 1),
+    "abs": (abs, 1, 1),
+    "round": (_round, 1, 2),
+    "floor": (math.floor, 1, 1),
+    "ceil": (math.ceil, 1, 1),
+    "min": (min, 1, 10),
+    "max": (max, 1, 10),
+}
+CONSTANTS = {"pi": math.pi, "e": math.e}
+
+
+def _log10_abs(x):
+    """log10(|x|) for a non-zero number; Fractions are not converted to float, which can underflow to 0."""
+    if isinstance(x, Fraction):
+        return math.log10(abs(x.numerator)) - math.log10(x.denominator)
+    return math.log10(abs(x))
+
+
+def _fraction_digits(x):
+    """Digits of the larger of a Fraction's numerator and denominator."""
+    return max(math.log10(abs(x.numerator)) if x.numerator else 0.0, math.log10(x.denominator))
+
+
+class _Evaluator:
+    def __init__(self, mode, deadline):
+        self.mode = mode
+        self.deadline = deadline
+        self.nodes = 0
+
+    def number(self, value):
+        """Converts a literal into the number type of the current mode."""
+        if isinstance(value, float) and not math.isfinite(value) or abs(value) >= _MAGNITUDE_LIMIT:
+            raise CalculationLimitError(f"numbers are limited to {MAX_DIGITS} digits")
+        if self.mode == MODE_DECIMAL:
+            return decimal.Decimal(repr(value))
+        if self.mode == MODE_FRACTION:
+            return Fraction(repr(value))
+        return value
+
+    def check(self, value):
+        if isinstance(value, float) and math.isnan(value):
+            raise CalculationError("the result is not a number")
+        if abs(value) >= _MAGNITUDE_LIMIT:
+            raise CalculationLimitError(f"numbers are limited to {MAX_DIGITS} digits")
+        if isinstance(value, Fraction) and max(abs(value.numerator), value.denominator) >= _MAGNITUDE_LIMIT:
+            raise CalculationLimitError(f"fractions are limited to {MAX_DIGITS} digits")
+        return value
+
+    def power(self, base, exponent):
+        integral = exponent == int(exponent)
+        if abs(exponent) > MAX_EXPONENT:
+            raise CalculationLimitError(f"exponents are limited to {MAX_EXPONENT}")
+        if not integral and base < 0:
+            raise CalculationError("cannot raise a negative number to a fractional power")
+        if base != 0 and float(exponent) * _log10_abs(base) >= MAX_DIGITS: # digits of the result
+            raise CalculationLimitError(f"numbers are limited to {MAX_DIGITS} digits")
+        if isinstance(base, Fraction) and abs(float(exponent)) * _fraction_digits(base) >= MAX_DIGITS:
+            raise CalculationLimitError(f"fractions are limited to {MAX_DIGITS} digits")
+        if base == 0 and exponent < 0:
+            raise ZeroDivisionError("zero cannot be raised to a negative power")
+        if integral:
+            return base ** int(exponent)
+        if self.mode == MODE_FRACTION:
+            # A root is only kept as a fraction when it is a simple one (4 ** 0.5 = 2);
+            # irrational results stay floats and are spoken as decimals.
+            result = float(base) ** float(exponent)
+            simple = Fraction(result).limit_denominator(1000)
+            return simple if float(simple) == result else result
+        return base ** exponent
+
+    def visit(self, node):
+        self.nodes += 1
+        if self.nodes > MAX_NODES:
+            raise CalculationLimitError("the expression is too long")
+        if time.perf_counter() > self.deadline:
+            raise CalculationLimitError("the calculation took too long")
+
+        if isinstance(node, ast.Expression):
+            return self.visit(node.body)
+        if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+            return self.number(node.value)
+        if isinstance(node, ast.BinOp):
+            left, right = self.visit(node.left), self.visit(node.right)
+            if isinstance(node.op, ast.Pow):
+                return self.check(self.power(left, right))
+            op = _BINARY_OPERATORS.get(type(node.op))
+            if op is None:
+                raise UnsupportedExpression("unsupported operator")
+            return self.check(op(left, right))
+        if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPERATORS:
+            return _UNARY_OPERATORS[type(node.op)](self.visit(node.operand))
+        if isinstance(node, ast.Name) and node.id in CONSTANTS:
+            return self.number(CONSTANTS[node.id])
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS:
+            func, min_args, max_args = FUNCTIONS[node.func.id]
+            if node.keywords or not (min_args <= len(node.args) <= max_args):
+                raise CalculationError(f"wrong number of arguments for {node.func.id}")
+            return self.check(func(*[self.visit(arg) for arg in node.args]))
+        raise UnsupportedExpression("unsupported characters or symbols")
+
+
+def evaluate(expression, mode=MODE_DECIMAL, time_limit=TIME_LIMIT):
+    """
+    Evaluates an arithmetic expression within the module limits.
+    Returns a number (float/int, Decimal or Fraction depending on `mode`)
+    or raises CalculationError.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown calculation mode: {mode}")
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        raise CalculationLimitError(f"expressions are limited to {MAX_EXPRESSION_LENGTH} characters")
+    expression = normalize_expression(expression)
+    if not expression:
+        raise CalculationError("the expression is empty")
+    try:
+        tree = ast.parse(expression, mode="eval")
+    except (SyntaxError, ValueError):
+        raise CalculationError("the expression is not valid")
+
+    evaluator = _Evaluator(mode, time.perf_counter() + time_limit)
+    context = decimal.Context(prec=MAX_DIGITS + 10, Emax=MAX_DIGITS * 2, Emin=-MAX_DIGITS * 2,
+                              traps=[decimal.InvalidOperation, decimal.DivisionByZero, decimal.Overflow])
+    try:
+        with decimal.localcontext(context):
+            return evaluator.visit(tree)
+    except CalculationError:
+        raise
+    except ZeroDivisionError:
+        raise CalculationError("division by zero")
+    except (decimal.InvalidOperation, decimal.Overflow, OverflowError, TypeError, ValueError):
+        raise CalculationError("the expression could not be computed")
+    except RecursionError:
+        raise CalculationLimitError("the expression is nested too deeply")
+
+
+def format_result(value, max_decimals=10):
+    """Formats a result for speaking: no trailing zeros, no scientific notation, at most `max_decimals` decimals."""
+    if isinstance(value, Fraction):
+        return str(value.numerator) if value.denominator == 1 else f"{value.numerator}/{value.denominator}"
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, float):
+        if value.is_integer() and abs(value) < 1e16:
+            return str(int(value))
+        return repr(round(value, max_decimals))
+    value = value.quantize(decimal.Decimal(1).scaleb(-max_decimals), context=decimal.Context(prec=MAX_DIGITS * 3)) \
+        if value.as_tuple().exponent < -max_decimals else value
+    text = format(value.normalize(decimal.Context(prec=MAX_DIGITS * 3)), "f")
+    return "0" if text in ("-0", "0") else text
@@ -0,0 +1,290 @@
+# fakes.py
+"""
+Offline stand-ins for the external services the assistant talks to, so latency
+can be measured without an API key, a microphone or a speaker.
+"""
+import itertools
+import random
+import threading
+import time
+import wave
+
+from recognizers import RecognizerBackend, SpeechNotUnderstood
+
+
+class FakeChunk:
+    """Mimics a streamed chunk / response object from google.generativeai (only `.text`)."""
+
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeGeminiModel:
+    """
+    Drop-in replacement for `genai.GenerativeModel` with a scripted reply and
+    configurable latency: `first_token_latency` seconds before the first chunk, then
+    `chunk_latency` seconds per `chunk_chars` characters.
+
+    `responses` is either a list of reply strings (used in rotation) or a callable
+    taking the prompt and returning the reply.
+    """
+
+    def __init__(self, responses=None, first_token_latency=0.4, chunk_latency=0.05, chunk_chars=12,
+                 system_instruction=None):
+        if responses is None:
+            responses = ["SPEAK_RESPONSE:This is a fake Gemini reply. It is only used offline."]
+        if callable(responses):
+            self._reply_for = responses
+        else:
+            rotation = itertools.cycle(responses)
+            self._reply_for = lambda prompt: next(rotation)
+        self.first_token_latency = first_token_latency
+        self.chunk_latency = chunk_latency
+        self.chunk_chars = chunk_chars
+        self.system_instruction = system_instruction
+        self.prompts = []
+
+    def _chunks(self, text):
+        return [text[i:i + self.chunk_chars] for i in range(0, len(text), self.chunk_chars)] or [""]
+
+    def _stream(self, chunks):
+        time.sleep(self.first_token_latency)
+        for i, chunk in enumerate(chunks):
+            if i:
+                time.sleep(self.chunk_latency)
+            yield FakeChunk(chunk)
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        self.prompts.append(prompt)
+        chunks = self._chunks(self._reply_for(prompt))
+        if stream:
+            return self._stream(chunks)
+        time.sleep(self.first_token_latency + self.chunk_latency * (len(chunks) - 1))
+        return FakeChunk("".join(chunks))
+
+    def start_chat(self, history=None):
+        return FakeChatSession(self, history)
+
+
+class FakeTTSEngine:
+    """
+    Stand-in for a pyttsx3 engine: "speaks" by sleeping `seconds_per_word` per word
+    (after `startup_latency`, the synthesizer's time to first audio) and fires the same
+    'started-word' callbacks, so stop() cuts playback short. save_to_file() writes a
+    silent WAV of the same length, taking `render_seconds_per_word` per word.
+    """
+
+    def __init__(self, seconds_per_word=0.05, startup_latency=0.0, render_seconds_per_word=0.005,
+                 voice="fake-voice"):
+        self.seconds_per_word = seconds_per_word
+        self.startup_latency = startup_latency
+        self.render_seconds_per_word = render_seconds_per_word
+        self.properties = {"voice": voice}
+        self.spoken = []
+        self.rendered = []
+        self._callbacks = {}
+        self._pending = []
+        self._to_file = []
+        self._stopped = False
+
+    def setProperty(self, name, value):
+        self.properties[name] = value
+
+    def getProperty(self, name):
+        return self.properties.get(name)
+
+    def save_to_file(self, text, path):
+        self._to_file.append((text, path))
+
+    def connect(self, topic, callback):
+        self._callbacks.setdefault(topic, []).append(callback)
+
+    def say(self, text):
+        self._pending.append(text)
+
+    def stop(self):
+        self._stopped = True
+
+    def _render(self, text, path, sample_rate=16000):
+        words = len(text.split())
+        time.sleep(words * self.render_seconds_per_word)
+        with wave.open(path, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(sample_rate)
+            wav.writeframes(b"\0\0" * int(words * self.seconds_per_word * sample_rate))
+        self.rendered.append(text)
+
+    def runAndWait(self):
+        self._stopped = False
+        while self._to_file:
+            self._render(*self._to_file.pop(0))
+        if self._pending and self.startup_latency:
+            time.sleep(self.startup_latency)
+        while self._pending and not self._stopped:
+            text = self._pending.pop(0)
+            location = 0
+            for word in text.split():
+                for callback in self._callbacks.get('started-word', []):
+                    callback(None, location, len(word))
+                if self._stopped:
+                    break
+                time.sleep(self.seconds_per_word)
+                location += len(word) + 1
+            self.spoken.append(text)
+        self._pending.clear()
+
+
+class FakePlayer:
+    """Stand-in for tts_cache.WavPlayer: "plays" a WAV by sleeping for its length, after `start_latency`."""
+
+    def __init__(self, start_latency=0.005):
+        self.start_latency = start_latency
+        self.played = []
+
+    def play(self, path, on_start=None, should_stop=None):
+        with wave.open(path, "rb") as wav:
+            duration = wav.getnframes() / wav.getframerate()
+        time.sleep(self.start_latency)
+        if on_start:
+            on_start()
+        self.played.append(path)
+        ends_at = time.monotonic() + duration
+        while time.monotonic() < ends_at:
+            if should_stop and should_stop():
+                return False
+            time.sleep(min(0.02, max(0.0, ends_at - time.monotonic())))
+        return True
+
+
+class FakeChatSession:
+    """Mimics `ChatSession`: keeps a history and forwards each message to the fake model."""
+
+    def __init__(self, model, history=None):
+        self.model = model
+        self.history = list(history or [])
+
+    def send_message(self, content, stream=False, **kwargs):
+        self.history.append({"role": "user", "parts": [content]})
+        reply = self.model.generate_content(content, stream=stream, **kwargs)
+        if not stream:
+            self.history.append({"role": "model", "parts": [reply.text]})
+        return reply
+
+
+class FakeRecognizer(RecognizerBackend):
+    """
+    Recognizer backend that returns a scripted transcript after `latency` seconds.
+    Register the text for each utterance with expect(), or for its audio with expect_audio()
+    when the backend will see a copy (streams rebuild the utterance from the fed frames);
+    an empty or missing transcript behaves like speech that could not be understood.
+    """
+
+    name = "fake"
+
+    def __init__(self, latency=0.3):
+        self.latency = latency
+        self._transcripts = {}
+        self._audio_transcripts = {}
+
+    def expect(self, utterance, text):
+        self._transcripts[id(utterance)] = text
+
+    def expect_audio(self, pcm, text):
+        self._audio_transcripts[pcm] = text
+
+    def recognize(self, utterance):
+        time.sleep(self.latency)
+        text = self._transcripts.pop(id(utterance), None)
+        if text is None:
+            text = self._audio_transcripts.pop(utterance.pcm, None)
+        if not text:
+            raise SpeechNotUnderstood("scripted turn has no transcript")
+        return text
+
+
+# --- Fault Injection ---
+# Named like their google.api_core counterparts, so gemini_client.classify_error()
+# treats them exactly like the real thing.
+
+
+class ResourceExhausted(Exception):
+    """Injected stand-in for google.api_core.exceptions.ResourceExhausted (HTTP 429)."""
+
+
+class ServiceUnavailable(Exception):
+    """Injected stand-in for google.api_core.exceptions.ServiceUnavailable (HTTP 503)."""
+
+
+class InvalidArgument(Exception):
+    """Injected stand-in for google.api_core.exceptions.InvalidArgument (HTTP 400)."""
+
+
+FAULT_OK = "ok"
+FAULT_SLOW = "slow"
+FAULT_HANG = "hang"
+FAULT_RATE_LIMIT = "rate_limit"
+FAULT_UNAVAILABLE = "unavailable"
+FAULT_BAD_REQUEST = "bad_request"
+
+_INJECTED_ERRORS = {
+    FAULT_RATE_LIMIT: lambda: ResourceExhausted("429 Quota exceeded (injected)"),
+    FAULT_UNAVAILABLE: lambda: ServiceUnavailable("503 The service is currently unavailable (injected)"),
+    FAULT_BAD_REQUEST: lambda: InvalidArgument("400 Request contains an invalid argument (injected)"),
+}
+
+
+class FaultInjectingModel:
+    """
+    Wraps a model (by default a FakeGeminiModel) and injects failures into its calls.
+
+    Each call takes the next outcome from `script` (a list of FAULT_* values) and, once the
+    script is used up, draws one at random from `rates` ({FAULT_*: probability}); anything
+    else is FAULT_OK. FAULT_SLOW adds `slow_seconds`, FAULT_HANG blocks for `hang_seconds`
+    (longer than any sane deadline) and the error faults raise before any text is produced.
+    """
+
+    def __init__(self, model=None, script=None, rates=None, slow_seconds=2.0, hang_seconds=30.0, seed=None):
+        self.model = model or FakeGeminiModel(first_token_latency=0.05, chunk_latency=0.0)
+        self.script = list(script or [])
+        self.rates = dict(rates or {})
+        self.slow_seconds = slow_seconds
+        self.hang_seconds = hang_seconds
+        self.outcomes = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _next_outcome(self):
+        with self._lock:
+            if self.script:
+                outcome = self.script.pop(0)
+            else:
+                outcome = FAULT_OK
+                draw = self._random.random()
+                for fault, rate in self.rates.items():
+                    if draw < rate:
+                        outcome = fault
+                        break
+                    draw -= rate
+            self.outcomes.append(outcome)
+            return outcome
+
+    def _inject(self):
+        outcome = self._next_outcome()
+        if outcome in _INJECTED_ERRORS:
+            raise _INJECTED_ERRORS[outcome]()
+        if outcome == FAULT_SLOW:
+            time.sleep(self.slow_seconds)
+        elif outcome == FAULT_HANG:
+            time.sleep(self.hang_seconds)
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        self._inject()
+        return self.model.generate_content(prompt, stream=stream, **kwargs)
+
+    def start_chat(self, history=None):
+        return FakeChatSession(self, history)
+
+    @property
+    def prompts(self):
+        return self.model.prompts
@@ -0,0 +1,208 @@
+# gazetteer.py
+import bisect
+import difflib
+import os
+import re
+import threading
+import unicodedata
+from array import array
+from functools import lru_cache
+
+import pytz
+
+# --- Offline Place -> Timezone Index ---
+# gazetteer.tsv maps normalized place names (IANA zone cities, countries, major cities,
+# US/Canadian/Australian/Indian states) to IANA timezones, one "name<TAB>zone" per line,
+# sorted by name. A name shared by several places ("portland", "paris") has one line per
+# place, the best-known first. It is loaded on the first lookup into a sorted list of names
+# plus an array of indices into the (small) list of zone names, so lookups are a bisect away.
+
+GAZETTEER_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gazetteer.tsv")
+
+MATCH_EXACT = "exact"
+MATCH_PREFIX = "prefix"
+MATCH_FUZZY = "fuzzy"
+
+MIN_PREFIX_LENGTH = 3
+FUZZY_CUTOFF = 0.82
+MAX_NGRAM_WORDS = 4
+
+# Words people wrap around a place name ("I'm in Pune", "near Boston please").
+_STOPWORDS = {
+    "i", "im", "am", "in", "at", "the", "my", "is", "from", "near", "live", "living", "based",
+    "currently", "right", "now", "city", "of", "it", "its", "we", "are", "were", "located",
+    "please", "actually", "area", "around", "here", "location", "town", "me", "a",
+}
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+@lru_cache(maxsize=1)
+def _countries_by_zone():
+    countries = {}
+    for country, zones in pytz.country_timezones.items():
+        for zone in zones:
+            countries.setdefault(zone, set()).add(country)
+    return countries
+
+
+def zone_countries(zone):
+    """ISO country codes that use an IANA zone (empty for zones like UTC)."""
+    return _countries_by_zone().get(zone, set())
+
+
+def normalize_place(text):
+    """Lower-cases, strips accents and punctuation: 'São Paulo, BR' -> 'sao paulo br'."""
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+    return _NON_ALNUM.sub(" ", text.lower()).strip()
+
+
+class PlaceMatch:
+    """A resolved place: the gazetteer `name`, its IANA `timezone` and how it matched (MATCH_*)."""
+
+    def __init__(self, name, timezone, kind):
+        self.name = name
+        self.timezone = timezone
+        self.kind = kind
+
+    def __repr__(self):
+        return f"PlaceMatch({self.name!r}, {self.timezone!r}, {self.kind!r})"
+
+
+class Gazetteer:
+    """Exact, prefix and fuzzy place-name lookup over the bundled index. Thread-safe, loads lazily."""
+
+    def __init__(self, path=GAZETTEER_FILE):
+        self.path = path
+        self._names = None       # sorted normalized names
+        self._zone_ids = None    # array('H') of indices into self._zones, parallel to _names
+        self._zones = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._names is not None:
+                return
+            names, zone_ids, zones, zone_index = [], array("H"), [], {}
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    name, _, zone = line.rstrip("\n").partition("\t")
+                    if not zone:
+                        continue
+                    if zone not in zone_index:
+                        zone_index[zone] = len(zones)
+                        zones.append(zone)
+                    names.append(name)
+                    zone_ids.append(zone_index[zone])
+            if names != sorted(names):
+                order = sorted(range(len(names)), key=names.__getitem__)
+                names = [names[i] for i in order]
+                zone_ids = array("H", (zone_ids[i] for i in order))
+            self._zones, self._zone_ids = zones, zone_ids
+            self._names = names # published last: other threads check it without the lock
+
+    def __len__(self):
+        if self._names is None:
+            self._load()
+        return len(self._names)
+
+    def _at(self, i, kind):
+        return PlaceMatch(self._names[i], self._zones[self._zone_ids[i]], kind)
+
+    def candidates(self, name):
+        """Every place with this already-normalized name, the best-known first."""
+        if self._names is None:
+            self._load()
+        lo = bisect.bisect_left(self._names, name)
+        hi = bisect.bisect_right(self._names, name, lo)
+        return [self._at(i, MATCH_EXACT) for i in range(lo, hi)]
+
+    def exact(self, name, region=()):
+        """
+        Looks up an already-normalized name. When several places share it, the one in
+        `region` (candidates for the state or country the user named) wins: same zone
+        first, then same country. Otherwise the best-known place is returned.
+        """
+        places = self.candidates(name)
+        if not places:
+            return None
+        if len(places) > 1 and region:
+            zones = {place.timezone for place in region}
+            for place in places:
+                if place.timezone in zones:
+                    return place
+            countries = set().union(*(zone_countries(zone) for zone in zones))
+            for place in places:
+                if zone_countries(place.timezone) & countries:
+                    return place
+        return places[0]
+
+    def prefix(self, prefix):
+        """First (alphabetically) place starting with `prefix`, e.g. 'san fran' -> 'san francisco'."""
+        if self._names is None:
+            self._load()
+        if len(prefix) < MIN_PREFIX_LENGTH:
+            return None
+        i = bisect.bisect_left(self._names, prefix)
+        if i < len(self._names) and self._names[i].startswith(prefix):
+            return self._at(i, MATCH_PREFIX)
+        return None
+
+    def fuzzy(self, name, cutoff=FUZZY_CUTOFF):
+        """Closest spelling among names sharing the first letter ('kolkatta' -> 'kolkata')."""
+        if self._names is None:
+            self._load()
+        if len(name) < MIN_PREFIX_LENGTH:
+            return None
+        lo = bisect.bisect_left(self._names, name[0])
+        hi = bisect.bisect_left(self._names, chr(ord(name[0]) + 1))
+        close = difflib.get_close_matches(name, self._names[lo:hi], n=1, cutoff=cutoff)
+        if not close:
+            return None
+        return self._at(bisect.bisect_left(self._names, close[0]), MATCH_FUZZY)
+
+    def lookup(self, text):
+        """
+        Resolves free text such as "I'm in San Francisco" or "Pune, Maharashtra" to a PlaceMatch,
+        trying exact names (whole text, comma parts, then word runs) before prefix and fuzzy
+        matches. The last comma part ("Portland, Maine") picks between places sharing a name.
+        Returns None when nothing plausible is found.
+        """
+        parts = [" ".join(w for w in normalize_place(part).split() if w not in _STOPWORDS)
+                 for part in text.split(",")]
+        parts = [part for part in parts if part]
+        words = [w for w in normalize_place(text).split() if w not in _STOPWORDS]
+        if not words:
+            return None
+        region = self.candidates(parts[-1]) if len(parts) > 1 else []
+        candidates = [" ".join(words)]
+        for part in parts:
+            if part not in candidates:
+                candidates.append(part)
+
+        for candidate in candidates:
+            match = self.exact(candidate, region)
+            if match:
+                return match
+        # Word runs, longest first, left to right: "visiting new york for work" -> "new york".
+        for size in range(min(MAX_NGRAM_WORDS, len(words)), 0, -1):
+            for start in range(len(words) - size + 1):
+                match = self.exact(" ".join(words[start:start + size]), region)
+                if match:
+                    return match
+        for candidate in candidates:
+            match = self.prefix(candidate) or self.fuzzy(candidate)
+            if match:
+                return match
+        return None
+
+
+_default_gazetteer = Gazetteer()
+
+
+@lru_cache(maxsize=256)
+def resolve_timezone(location_text):
+    """IANA timezone for a spoken/typed location using the bundled index, or None if unknown."""
+    if not location_text:
+        return None
+    match = _default_gazetteer.lookup(location_text)
+    return match.timezone if match else None
@@ -0,0 +1,432 @@
+# gemini_client.py
+import concurrent.futures
+import random
+import threading
+import time
+
+# --- Typed Errors ---
+# The Gemini SDK raises google.api_core exceptions (and a few of its own); classify_error()
+# maps them - by class name, so google.api_core is never imported here - onto these.
+
+
+class GeminiError(Exception):
+    """Base class for a Gemini request that did not produce an answer."""
+
+    retryable = False
+
+
+class GeminiTimeout(GeminiError):
+    """No answer within the deadline."""
+
+    retryable = True
+
+
+class GeminiRateLimited(GeminiError):
+    """Quota or rate limit hit (ResourceExhausted / HTTP 429)."""
+
+    retryable = True
+
+
+class GeminiUnavailable(GeminiError):
+    """The service or the network is down (5xx, connection errors)."""
+
+    retryable = True
+
+
+class GeminiBlocked(GeminiError):
+    """The prompt or the reply was blocked by the content policy."""
+
+
+class GeminiBadRequest(GeminiError):
+    """The request was rejected as invalid (bad argument, auth, permissions)."""
+
+
+class CircuitOpen(GeminiError):
+    """Gemini failed repeatedly, so requests are not being sent for a while."""
+
+
+_ERRORS_BY_NAME = {
+    "ResourceExhausted": GeminiRateLimited,
+    "TooManyRequests": GeminiRateLimited,
+    "ServiceUnavailable": GeminiUnavailable,
+    "InternalServerError": GeminiUnavailable,
+    "BadGateway": GeminiUnavailable,
+    "GatewayTimeout": GeminiTimeout,
+    "DeadlineExceeded": GeminiTimeout,
+    "RetryError": GeminiUnavailable,
+    "ServerError": GeminiUnavailable,
+    "BlockedPromptException": GeminiBlocked,
+    "StopCandidateException": GeminiBlocked,
+    "InvalidArgument": GeminiBadRequest,
+    "BadRequest": GeminiBadRequest,
+    "PermissionDenied": GeminiBadRequest,
+    "Unauthenticated": GeminiBadRequest,
+    "Unauthorized": GeminiBadRequest,
+    "Forbidden": GeminiBadRequest,
+    "NotFound": GeminiBadRequest,
+    "ConnectionError": GeminiUnavailable,   # requests.exceptions.ConnectionError and the builtin
+    "Timeout": GeminiTimeout,               # requests.exceptions.Timeout
+    "TimeoutError": GeminiTimeout,
+}
+
+
+def classify_error(error):
+    """Returns the GeminiError for an exception raised by the SDK (or the error itself if it is one)."""
+    if isinstance(error, GeminiError):
+        return error
+    for cls in type(error).__mro__:
+        kind = _ERRORS_BY_NAME.get(cls.__name__)
+        if kind is not None:
+            break
+    else:
+        kind = GeminiUnavailable if isinstance(error, OSError) else GeminiError
+    wrapped = kind(f"{type(error).__name__}: {error}")
+    wrapped.__cause__ = error
+    return wrapped
+
+
+# --- Circuit Breaker ---
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half-open"
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures; while open, allow() says no.
+    After `reset_timeout` seconds one probe request is let through (half-open): success
+    closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=4, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self.trips = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return STATE_CLOSED
+        if self._clock() - self._opened_at >= self.reset_timeout:
+            return STATE_HALF_OPEN
+        return STATE_OPEN
+
+    def allow(self):
+        """True if a request may be sent now."""
+        with self._lock:
+            state = self._state()
+            if state == STATE_CLOSED:
+                return True
+            if state == STATE_HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._probing:
+                    self.trips += 1
+                self._opened_at = self._clock()
+                self._probing = False
+
+    def release_probe(self):
+        """Frees the half-open probe slot for a request that ended without an outcome."""
+        with self._lock:
+            self._probing = False
+
+
+# --- Rate Limiter ---
+
+
+class RateLimiter:
+    """
+    Token bucket shared by every request of a process: on average `rate` requests per
+    second, in bursts of up to `burst`. acquire() waits for a token; try_acquire() does not.
+    """
+
+    def __init__(self, rate, burst=None, clock=time.monotonic, sleep=time.sleep):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._updated = clock()
+        self.waits = 0
+
+    def _take(self):
+        """Takes a token if one is available; otherwise returns the seconds until there will be."""
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    def try_acquire(self):
+        with self._lock:
+            return self._take() == 0.0
+
+    def acquire(self, timeout=None):
+        """Waits up to `timeout` seconds (forever if None) for a token. Returns False on timeout."""
+        deadline = None if timeout is None else self._clock() + timeout
+        waited = False
+        while True:
+            with self._lock:
+                wait = self._take()
+            if wait == 0.0:
+                return True
+            if deadline is not None and self._clock() + wait > deadline:
+                return False
+            if not waited:
+                waited = True
+                with self._lock:
+                    self.waits += 1
+            self._sleep(wait)
+
+
+# --- Client ---
+
+
+class GeminiReply:
+    """A finished answer: its `text` and the chat session that produced it (see GeminiClient)."""
+
+    def __init__(self, text, chat):
+        self.text = text
+        self.chat = chat
+
+
+class GeminiClient:
+    """
+    Sends prompts to the model returned by `get_model()` with:
+
+    - a per-attempt `deadline` (also passed to the SDK as request_options timeout) and an
+      overall `total_deadline` across retries;
+    - up to `max_attempts` tries for retryable errors, with full-jitter exponential backoff;
+    - optional hedging: if an attempt has not answered after `hedge_after` seconds, a
+      duplicate is sent and whichever answers first wins;
+    - a CircuitBreaker: while it is open, requests fail fast with CircuitOpen;
+    - an optional shared RateLimiter: each attempt (and hedge) waits for a token, and a
+      request that cannot get one in time fails with GeminiRateLimited without counting
+      against the breaker.
+
+    Blocking requests run on a pool of `max_workers` threads, which bounds how many are in
+    flight at once when many sessions share one client (server.py).
+
+    Only the first attempt uses the caller's chat session. Retries and hedges go to a fresh
+    session started from the chat's history as it was before the request, because an
+    abandoned attempt may still complete later and append to the original session. The
+    reply says which session answered; keep using that one.
+    """
+
+    def __init__(self, get_model, deadline=20.0, total_deadline=45.0, max_attempts=3,
+                 backoff_base=0.5, backoff_max=8.0, hedge_after=None, breaker=None, max_workers=8,
+                 rate_limiter=None):
+        self.get_model = get_model
+        self.deadline = deadline
+        self.total_deadline = total_deadline
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_after = hedge_after
+        self.breaker = breaker or CircuitBreaker()
+        self.rate_limiter = rate_limiter
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers,
+                                                               thread_name_prefix="gemini")
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "attempts": 0, "retries": 0, "hedges": 0, "hedge_wins": 0,
+                      "timeouts": 0, "failures": 0, "rejected": 0, "throttled": 0}
+
+    # --- Helpers ---
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self.stats[key] += amount
+
+    def available(self):
+        """False while the circuit is open (Gemini is considered unhealthy)."""
+        return self.breaker.state != STATE_OPEN
+
+    def backoff(self, attempt):
+        """Full jitter: uniform in [0, min(backoff_max, backoff_base * 2**attempt)]."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _session_for(self, chat, history, attempt):
+        if chat is None:
+            return None
+        if attempt == 0:
+            return chat
+        return self.get_model().start_chat(history=list(history))
+
+    def _send(self, prompt, session, stream, timeout):
+        options = {"request_options": {"timeout": timeout}}
+        if session is not None:
+            return session.send_message(prompt, stream=stream, **options)
+        return self.get_model().generate_content(prompt, stream=stream, **options)
+
+    def _call(self, prompt, session, timeout):
+        response = self._send(prompt, session, False, timeout)
+        return response.text
+
+    def _admit(self):
+        self._count("requests")
+        if not self.breaker.allow():
+            self._count("rejected")
+            raise CircuitOpen("Gemini is temporarily disabled after repeated failures.")
+
+    def _throttle(self, timeout):
+        """Waits for the rate limiter; raises GeminiRateLimited if no slot frees up within `timeout`."""
+        if self.rate_limiter is not None and not self.rate_limiter.acquire(timeout=max(0.0, timeout)):
+            self._count("throttled")
+            raise GeminiRateLimited(f"No Gemini request slot free within {timeout:.1f}s (local rate limit).")
+
+    # --- Requests ---
+
+    def _attempt(self, prompt, chat, history, attempt, timeout):
+        """
+        One attempt, hedged if configured. Returns (text, session) or raises GeminiError.
+        The primary and the hedge share one deadline, `timeout` seconds from now.
+        """
+        deadline = time.monotonic() + timeout
+        session = self._session_for(chat, history, attempt)
+        primary = self._executor.submit(self._call, prompt, session, timeout)
+        futures = {primary: session}
+        self._count("attempts")
+        hedge_after = self.hedge_after
+        if hedge_after is not None and hedge_after < timeout:
+            done, _ = concurrent.futures.wait([primary], timeout=hedge_after)
+            if not done and (self.rate_limiter is None or self.rate_limiter.try_acquire()):
+                hedge_session = self._session_for(chat, history, attempt + 1)
+                hedge_timeout = max(0.0, deadline - time.monotonic())
+                futures[self._executor.submit(self._call, prompt, hedge_session, hedge_timeout)] = hedge_session
+                self._count("hedges")
+        pending = set(futures)
+        last_error = None
+        while pending:
+            remaining = deadline - time.monotonic()
+            done, pending = concurrent.futures.wait(pending, timeout=max(0.0, remaining),
+                                                    return_when=concurrent.futures.FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                try:
+                    text = future.result()
+                except Exception as e:
+                    last_error = classify_error(e)
+                    continue
+                if future is not primary:
+                    self._count("hedge_wins")
+                return text, futures[future]
+        if pending:
+            self._count("timeouts")
+            # The SDK call cannot be interrupted; its thread finishes in the background and is ignored.
+            raise GeminiTimeout(f"No answer from Gemini within {timeout:.1f}s.")
+        raise last_error
+
+    def generate(self, prompt, chat=None):
+        """Returns a GeminiReply, or raises a GeminiError after retries (CircuitOpen while unhealthy)."""
+        self._admit()
+        history = list(chat.history) if chat is not None else None
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            try:
+                self._throttle(self.total_deadline - (time.monotonic() - started))
+            except GeminiRateLimited:
+                self.breaker.release_probe() # nothing was sent, so there is no outcome to record
+                raise
+            remaining = self.total_deadline - (time.monotonic() - started)
+            try:
+                text, session = self._attempt(prompt, chat, history, attempt, min(self.deadline, remaining))
+            except GeminiError as error:
+                self.breaker.record_failure()
+                self._count("failures")
+                attempt += 1
+                pause = self.backoff(attempt - 1)
+                out_of_time = time.monotonic() - started + pause >= self.total_deadline
+                if not error.retryable or attempt >= self.max_attempts or out_of_time or not self.breaker.allow():
+                    raise
+                self._count("retries")
+                time.sleep(pause)
+                continue
+            self.breaker.record_success()
+            return GeminiReply(text, session)
+
+    def stream(self, prompt, chat=None):
+        """
+        A GeminiStream of chunks for StreamedResponse. Failures before the first chunk are
+        retried like generate(); once text has arrived, an error ends the stream. Streams
+        are not hedged. Idle deadlines between chunks are up to the consumer.
+        """
+        self._admit()
+        return GeminiStream(self, prompt, chat)
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class GeminiStream:
+    """Iterable of streamed chunks; `chat` is the session that produced them once iteration starts."""
+
+    def __init__(self, client, prompt, chat):
+        self._client = client
+        self._prompt = prompt
+        self._history = list(chat.history) if chat is not None else None
+        self._original_chat = chat
+        self.chat = chat
+
+    def __iter__(self):
+        client = self._client
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            session = client._session_for(self._original_chat, self._history, attempt)
+            self.chat = session
+            received = False
+            try:
+                client._throttle(client.total_deadline - (time.monotonic() - started))
+            except GeminiRateLimited:
+                client.breaker.release_probe()
+                raise
+            client._count("attempts")
+            try:
+                remaining = client.total_deadline - (time.monotonic() - started)
+                for chunk in client._send(self._prompt, session, True, min(client.deadline, remaining)):
+                    received = True
+                    yield chunk
+            except Exception as e:
+                error = classify_error(e)
+                client.breaker.record_failure()
+                client._count("failures")
+                attempt += 1
+                pause = client.backoff(attempt - 1)
+                out_of_time = time.monotonic() - started + pause >= client.total_deadline
+                if received or not error.retryable or attempt >= client.max_attempts or out_of_time \
+                        or not client.breaker.allow():
+                    raise error
+                client._count("retries")
+                time.sleep(pause)
+                continue
+            client.breaker.record_success()
+            return
@@ -0,0 +1,167 @@
+# intents.py
+import ast
+import re
+import threading
+
+from calculator import normalize_expression
+
+# --- Local Intent Fast Path ---
+# A small rule-based classifier for commands the assistant can answer on its own
+# (arithmetic, the local time/date, exit). Anything it is not sure about returns None
+# and goes to Gemini as before. Input is expected to be preprocess_spoken_text() output.
+
+INTENT_EXIT = "exit"
+INTENT_TIME = "time"
+INTENT_DATE = "date"
+INTENT_CALCULATE = "calculate"
+
+EXIT_PHRASES = {'exit', 'quit', 'stop', 'goodbye'}
+
+_FILLER = r"(?:(?:hey|ok|okay|so|um|uh),?\s+)?"
+_POLITE_END = r"(?:\s+(?:now|right now|please|today))*\s*[?.!]*"
+
+_TIME_PATTERN = re.compile(
+    r"^" + _FILLER + r"(?:"
+    r"what(?:'s| is) the (?:current |local )?time"
+    r"|what time is it"
+    r"|(?:can you )?tell me the (?:current )?time"
+    r"|(?:current|local) time"
+    r"|time"
+    r")" + _POLITE_END + r"$"
+)
+_DATE_PATTERN = re.compile(
+    r"^" + _FILLER + r"(?:"
+    r"what(?:'s| is) (?:the date|today's date|the date today)"
+    r"|what day is (?:it|today)"
+    r"|what(?:'s| is) today"
+    r"|(?:can you )?tell me (?:the|today's) date"
+    r"|(?:today's )?date"
+    r")" + _POLITE_END + r"$"
+)
+
+# Operator words preprocess_spoken_text() leaves alone because they are ambiguous in prose;
+# inside an otherwise purely numeric command they are safe to convert.
+_OPERATOR_WORDS = [
+    (re.compile(r"\bmultiplied by\b|\btimes\b|(?<=\d)\s*x\s*(?=\d)|\bx\b"), " * "),
+    (re.compile(r"\bover\b"), " / "),
+    (re.compile(r"\bdivide(?:d)?\b"), " / "),
+    (re.compile(r"\bmod(?:ulo)?\b"), " % "),
+    (re.compile(r"\bpercent(?: of)?\b|%\s*of\b"), "% * "),
+    (re.compile(r"\bto the power of\b|\braised to\b"), " ^ "),
+    (re.compile(r"\bsquared\b"), " ^ 2"),
+    (re.compile(r"\bcubed\b"), " ^ 3"),
+    (re.compile(r"\bsquare root of\s+(\d+(?:\.\d+)?)"), r" sqrt(\1) "),
+]
+_CALCULATION_LEAD = re.compile(
+    r"^" + _FILLER + r"(?:(?:what(?:'s| is)|how much is|calculate|compute|evaluate|solve)\s+)?(?:the\s+)?"
+    r"(?:(?:value|result|answer) of\s+)?"
+)
+_CALCULATION_END = re.compile(r"\s*(?:equals|=)?\s*[?.!]*\s*$")
+_EXPRESSION = re.compile(r"^(?:[\d.\s()+\-*/%^]|sqrt)+$")
+_HAS_OPERATION = re.compile(r"\d[\s)]*[+\-*/%^][\s(]*[\d.(s-]|sqrt\(|\d\s*%")
+
+
+class IntentMatch:
+    """A locally answerable command: `kind` is one of the INTENT_* constants."""
+
+    def __init__(self, kind, payload=None, confidence=1.0):
+        self.kind = kind
+        self.payload = payload   # e.g. the arithmetic expression for INTENT_CALCULATE
+        self.confidence = confidence
+
+    def __repr__(self):
+        return f"IntentMatch({self.kind!r}, {self.payload!r}, confidence={self.confidence})"
+
+
+def extract_expression(text):
+    """Returns the bare arithmetic expression if `text` is nothing but a calculation, else None."""
+    candidate = _CALCULATION_LEAD.sub("", text.strip(), count=1)
+    candidate = _CALCULATION_END.sub("", candidate)
+    for pattern, symbol in _OPERATOR_WORDS:
+        candidate = pattern.sub(symbol, candidate)
+    candidate = " ".join(candidate.split())
+    if not candidate or not _EXPRESSION.match(candidate) or not _HAS_OPERATION.search(candidate):
+        return None
+    candidate = re.sub(r"%\s*\*\s*$", "%", candidate) # "what is 20 percent" -> "20%"
+    if candidate.count("(") != candidate.count(")") or candidate[-1] not in "0123456789.)%":
+        return None # Half an expression ("5 * (2 +") - let Gemini ask what was meant
+    try:
+        ast.parse(normalize_expression(candidate), mode="eval")
+    except (SyntaxError, ValueError):
+        return None # Digits and operators that do not form one expression ("2 3 + 4", "5 . 5 * 2")
+    return candidate
+
+
+def classify_intent(text):
+    """
+    Classifies a preprocessed command. Returns an IntentMatch when the command can be
+    answered locally, otherwise None (ask Gemini).
+    """
+    normalized = " ".join(text.lower().split())
+    if normalized.rstrip(".!") in EXIT_PHRASES:
+        return IntentMatch(INTENT_EXIT)
+    if _TIME_PATTERN.match(normalized):
+        return IntentMatch(INTENT_TIME)
+    if _DATE_PATTERN.match(normalized):
+        return IntentMatch(INTENT_DATE)
+    expression = extract_expression(normalized)
+    if expression is not None:
+        return IntentMatch(INTENT_CALCULATE, expression)
+    return None
+
+
+_LOOSE_DATE = re.compile(r"\b(?:date|what day|which day|day is it|today)\b")
+_LOOSE_TIME = re.compile(r"\b(?:time|o'clock|clock)\b")
+_EMBEDDED_EXPRESSION = re.compile(r"(?:sqrt\(|[\d(])[\d\s.()+\-*/%^a-z]*[\d)]")
+
+
+def guess_local_intent(text):
+    """
+    A looser classify_intent() for when Gemini cannot be reached and a best guess beats no
+    answer: also finds time/date questions and calculations inside longer sentences.
+    """
+    match = classify_intent(text)
+    if match is not None:
+        return match
+    normalized = " ".join(text.lower().split())
+    for candidate in _EMBEDDED_EXPRESSION.findall(normalized):
+        expression = extract_expression(candidate)
+        if expression is not None:
+            return IntentMatch(INTENT_CALCULATE, expression, confidence=0.6)
+    if _LOOSE_DATE.search(normalized):
+        return IntentMatch(INTENT_DATE, confidence=0.5)
+    if _LOOSE_TIME.search(normalized):
+        return IntentMatch(INTENT_TIME, confidence=0.5)
+    return None
+
+
+class IntentStats:
+    """Counts how many commands were answered locally versus sent to Gemini. Thread-safe."""
+
+    def __init__(self):
+        self.local_hits = {}
+        self.llm_calls = 0
+        self._lock = threading.Lock()
+
+    def record(self, kind):
+        """Record one command: `kind` is the intent answered locally, or None if Gemini was called."""
+        with self._lock:
+            if kind is None:
+                self.llm_calls += 1
+            else:
+                self.local_hits[kind] = self.local_hits.get(kind, 0) + 1
+
+    @property
+    def total(self):
+        return self.llm_calls + sum(self.local_hits.values())
+
+    @property
+    def hit_rate(self):
+        return sum(self.local_hits.values()) / self.total if self.total else 0.0
+
+    def summary(self):
+        with self._lock:
+            hits = sorted(self.local_hits.items())
+        breakdown = ", ".join(f"{kind}: {count}" for kind, count in hits)
+        return (f"answered {sum(self.local_hits.values())} of {self.total} commands locally "
+                f"({self.hit_rate:.0%}){' - ' + breakdown if breakdown else ''}; {self.llm_calls} Gemini calls")
@@ -0,0 +1,114 @@
+# location.py
+import json
+import os
+import threading
+import time
+
+IPINFO_URL = 'https://ipinfo.io/json'
+DEFAULT_LOCATION = ("Unknown Location", "UTC")
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_http_session():
+    """One pooled requests.Session for the whole process (keeps connections alive between calls)."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            _session = requests.Session()
+        return _session
+
+
+def get_ip_based_location():
+    """Attempts to get approximate city/region/country based on IP address."""
+    import requests
+    try:
+        response = get_http_session().get(IPINFO_URL, timeout=5)
+        response.raise_for_status() # Raise an exception for HTTP errors (4xx or 5xx)
+        data = response.json()
+        city = data.get('city', 'Unknown City')
+        region = data.get('region', 'Unknown Region')
+        country = data.get('country', 'Unknown Country')
+        timezone = data.get('timezone', 'UTC') # Get timezone for time operations
+
+        location_str = f"{city}, {region}, {country}"
+        print(f"🌍 Retrieved IP-based location: {location_str} (Timezone: {timezone})")
+        return location_str, timezone
+    except requests.exceptions.ConnectionError:
+        print("⚠️ Network error: Could not connect to ipinfo.io. Please check your internet connection.")
+    except requests.exceptions.Timeout:
+        print("⚠️ Network error: Request to ipinfo.io timed out. Your internet might be slow or unstable.")
+    except requests.exceptions.RequestException as e:
+        print(f"⚠️ Network error: An unexpected error occurred while fetching location: {e}")
+    except json.JSONDecodeError:
+        print("⚠️ Data error: Could not decode location data from ipinfo.io. Response was not valid JSON.")
+    return DEFAULT_LOCATION # Default to UTC if location cannot be found
+
+
+class LocationService:
+    """
+    Provides the IP-based location without blocking startup.
+
+    The last successful lookup is kept in `cache_path` for `ttl` seconds, so warm starts
+    skip the network entirely. Otherwise the lookup runs on a background thread and
+    `on_update(location, timezone)` is called when it finishes; until then the cached
+    (possibly stale) or default location is used.
+    """
+
+    def __init__(self, cache_path, ttl=6 * 3600, on_update=None, lookup=get_ip_based_location):
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.on_update = on_update
+        self._lookup = lookup
+        self.location, self.timezone = DEFAULT_LOCATION
+        self.from_cache = False
+        self.ready = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Uses a fresh cached location if there is one, otherwise starts a background lookup."""
+        cached = self._read_cache()
+        if cached is not None:
+            self.location, self.timezone, fetched_at = cached
+            if time.time() - fetched_at < self.ttl:
+                self.from_cache = True
+                print(f"🌍 Using cached location: {self.location} (Timezone: {self.timezone})")
+                self.ready.set()
+                return self
+        self._thread = threading.Thread(target=self._refresh, name="location-lookup", daemon=True)
+        self._thread.start()
+        return self
+
+    def wait(self, timeout=None):
+        return self.ready.wait(timeout)
+
+    def _refresh(self):
+        location, timezone = self._lookup()
+        if (location, timezone) != DEFAULT_LOCATION:
+            self._write_cache(location, timezone)
+            self.location, self.timezone = location, timezone
+        # On failure keep the stale cached location, if any; it beats "Unknown Location".
+        self.ready.set()
+        if self.on_update:
+            self.on_update(self.location, self.timezone)
+
+    def _read_cache(self):
+        if not os.path.exists(self.cache_path):
+            return None
+        try:
+            with open(self.cache_path, 'r') as f:
+                data = json.load(f)
+            return data["location"], data["timezone"], float(data["fetched_at"])
+        except (OSError, json.JSONDecodeError, KeyError, TypeError, ValueError):
+            return None
+
+    def _write_cache(self, location, timezone):
+        tmp_path = f"{self.cache_path}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump({"location": location, "timezone": timezone, "fetched_at": time.time()}, f, indent=4)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"Warning: Could not cache location in {self.cache_path}: {e}")
@@ -1,17 +1,51 @@
 import os
 import time
-import speech_recognition as sr
-import pyttsx3
-import json
-import requests
+_startup_marks = [("interpreter ready", time.perf_counter())] # see print_startup_profile()
+import sys
+import argparse
+import asyncio
+import threading
+import importlib
 from datetime import datetime
+from functools import lru_cache
 import pytz
 from dotenv import load_dotenv
-import google.generativeai as genai
-import pyautogui
+# google.generativeai, pyautogui, pyttsx3, speech_recognition and requests are imported
+# on first use (see get_model(), write_response(), SpeechQueue, recognizers.py, location.py),
+# so the assistant can start listening without paying for them up front.
 
 # Import from your utils file 
 from utils import preprocess_spoken_text
+from streaming import (
+    StreamedResponse, CLARIFICATION_PREFIX, LOCATION_PREFIX, CALCULATE_PREFIX, SPEAK_PREFIX, WRITE_PREFIX
+)
+from speech_output import SpeechQueue, PRIORITY_NORMAL, PRIORITY_URGENT
+from tts_cache import TTSCache, WavPlayer
+from audio_capture import AudioCapture, MicrophoneSource, WavFileSource
+from recognizers import (
+    create_backend, transcribe, LiveTranscriber, SpeechNotUnderstood, RecognizerUnavailable
+)
+from intents import (
+    classify_intent, guess_local_intent, IntentStats, INTENT_EXIT, INTENT_TIME, INTENT_DATE, INTENT_CALCULATE
+)
+from response_cache import ResponseCache
+from calculator import evaluate, format_result, CalculationError, CalculationLimitError, UnsupportedExpression
+from memory_store import MemoryStore, initial_memory
+from pipeline import Pipeline, summarize
+from location import LocationService
+from gazetteer import resolve_timezone
+from tracing import Tracer
+from sessions import Session
+from gemini_client import (
+    GeminiClient, RateLimiter, GeminiError, GeminiTimeout, GeminiRateLimited, GeminiUnavailable, GeminiBlocked,
+    GeminiBadRequest, CircuitOpen, classify_error
+)
+from typing_backends import create_typing_backend, wait_for_focus_change, TypingError, TypingStats
+from prompts import (
+    SYSTEM_INSTRUCTION, build_turn_context, build_command_message, build_clarification_message,
+    seed_clarification_history, words_only_history, build_flat_prompt, PromptMeter
+)
+_startup_marks.append(("import assistant modules", time.perf_counter()))
 
 # Configuration and Setup 
 
@@ -22,52 +56,151 @@ gemini_api_key = os.getenv("GEMINI_API_KEY")
 if not gemini_api_key:
     raise ValueError("GEMINI_API_KEY not found. Please set it in .env")
 
-# Configure the Gemini model
-genai.configure(api_key=gemini_api_key)
-model = genai.GenerativeModel("") # Select Model
-
-# Initialize Text-to-Speech engine globally
-engine = pyttsx3.init()
-engine.setProperty('rate', 180) # Optional: Set a faster speaking rate
+# Per-stage latency tracing. TRACING=0 switches it off entirely; TRACE_FILE is the per-turn
+# JSONL log (empty for none) and METRICS_PORT, if set, serves Prometheus metrics on localhost.
+tracer = Tracer(enabled=os.getenv("TRACING", "1").lower() not in ("0", "false", "no"),
+                trace_path=os.getenv("TRACE_FILE", "turn_traces.jsonl") or None)
+METRICS_PORT = os.getenv("METRICS_PORT")
+
+# The Gemini model is created on first use by get_model() and shared by every session
+_model = None
+_model_lock = threading.Lock()
+
+# Every request goes through a client with a deadline, retries with jittered backoff and a
+# circuit breaker (gemini_client.py). GEMINI_HEDGE_AFTER (seconds) also sends a duplicate
+# request when the first one is slow. While the breaker is open, turns are answered locally.
+# GEMINI_MAX_CONCURRENCY bounds the requests in flight and GEMINI_RATE_LIMIT (requests per
+# second) spaces them out; both matter when server.py shares the client between sessions.
+gemini_client = GeminiClient(lambda: get_model(),
+                             deadline=float(os.getenv("GEMINI_TIMEOUT", "20")),
+                             max_attempts=int(os.getenv("GEMINI_MAX_ATTEMPTS", "3")),
+                             hedge_after=float(os.getenv("GEMINI_HEDGE_AFTER")) if os.getenv("GEMINI_HEDGE_AFTER") else None,
+                             max_workers=int(os.getenv("GEMINI_MAX_CONCURRENCY", "8")),
+                             rate_limiter=RateLimiter(float(os.getenv("GEMINI_RATE_LIMIT"))) if os.getenv("GEMINI_RATE_LIMIT") else None)
+
+prompt_meter = PromptMeter()
+
+# Number type used for calculations: decimal (default, 0.1 + 0.2 = 0.3), fraction (1/3) or float
+CALCULATION_MODE = os.getenv("CALCULATION_MODE", "decimal").lower()
+
+# Stream Gemini replies so spoken answers start after the first sentence instead of the whole reply.
+# Set GEMINI_STREAM=0 in .env to wait for the complete response instead.
+STREAM_RESPONSES = os.getenv("GEMINI_STREAM", "1").lower() not in ("0", "false", "no")
+
+# Phrases said word for word every time; they are pre-rendered into the speech cache below.
+GREETING = "Hello, I am your Gemini voice assistant. How can I help you today?"
+TYPING_NOTICE = "Okay, I will type that for you. Please switch to the desired application now."
+GOODBYE = "Goodbye! Have a great day."
+UNSUPPORTED_CALCULATION = "The calculation contains unsupported characters or symbols."
+DEGRADED_SUFFIX = "Meanwhile, I can still do calculations and tell you the time or date."
+GEMINI_ERROR_MESSAGES = { # checked in this order by describe_gemini_error()
+    CircuitOpen: "Error: Gemini keeps failing, so I'm answering on my own for a little while.",
+    GeminiTimeout: "Error: Gemini took too long to answer. Please try again.",
+    GeminiUnavailable: "Error: I cannot reach the Gemini service. Please check your internet connection or try again later.",
+    GeminiBlocked: "Error: Your request was blocked due to content policy. Please try rephrasing.",
+    GeminiRateLimited: "Error: You've sent too many requests to Gemini. Please wait a moment.",
+    GeminiBadRequest: "Error: The request sent to Gemini was invalid. This might be a prompt issue.",
+}
+GOODBYE_TIMEOUT = 10 # seconds end_session() waits for speech to finish
+FIXED_PHRASES = [GREETING, TYPING_NOTICE, GOODBYE, UNSUPPORTED_CALCULATION,
+                 *GEMINI_ERROR_MESSAGES.values(),
+                 *(f"{message} {DEGRADED_SUFFIX}" for message in GEMINI_ERROR_MESSAGES.values())]
+
+# Text-to-Speech runs on its own worker thread so the main loop can keep listening while it talks.
+# The pyttsx3 engine is created on that thread.
+def _create_tts_engine():
+    import pyttsx3
+    return pyttsx3.init()
+
+def _record_speech_timing(waited, spoke):
+    tracer.record("tts_queue_wait", waited)
+    tracer.record("tts_speak", spoke)
+
+def _record_first_audio(seconds, cached):
+    tracer.record("tts_first_audio_cached" if cached else "tts_first_audio_live", seconds)
+
+# Speech cache: phrases are rendered once to WAV files in TTS_CACHE_DIR (keyed by text, voice and
+# rate) and played from there instead of being synthesized again - FIXED_PHRASES right away,
+# anything else once it has been said TTS_CACHE_RENDER_AFTER times. TTS_CACHE_MB bounds the
+# directory (least recently played files go first). TTS_CACHE=0 turns it off.
+tts_cache = None
+if os.getenv("TTS_CACHE", "1").lower() not in ("0", "false", "no"):
+    tts_cache = TTSCache(os.getenv("TTS_CACHE_DIR", "tts_cache"),
+                         max_bytes=int(float(os.getenv("TTS_CACHE_MB", "50")) * 1024 * 1024),
+                         render_after=int(os.getenv("TTS_CACHE_RENDER_AFTER", "3")),
+                         pinned=FIXED_PHRASES)
+
+speech_queue = SpeechQueue(_create_tts_engine, rate=180, # Optional: Set a faster speaking rate
+                           on_spoken=_record_speech_timing,
+                           cache=tts_cache, player_factory=WavPlayer, on_audio=_record_first_audio)
+
+# Audio is captured continuously on a background thread (see get_audio_capture()).
+# Set AUDIO_INPUT_WAV to a 16-bit mono WAV file to replay it instead of using the microphone.
+AUDIO_INPUT_WAV = os.getenv("AUDIO_INPUT_WAV")
+_audio_capture = None
+
+# Speech-to-text backend: RECOGNIZER=google (default, online) or RECOGNIZER=vosk (offline, CPU,
+# with partial results while you talk; model directory in VOSK_MODEL_PATH).
+_recognizer_backend = None # created by get_recognizer_backend()
+
+# Typing: TYPING_BACKEND picks how text is typed (auto, clipboard, xdotool, ydotool, pyautogui).
+# Before typing we wait for the user to switch windows, for up to FOCUS_TIMEOUT seconds.
+_typing_backend = None # created by get_typing_backend()
+FOCUS_TIMEOUT = float(os.getenv("FOCUS_TIMEOUT", "8"))
+typing_stats = TypingStats()
+_latest_partial_input = None # (partial transcript, preprocessed text, local intent) of the utterance being spoken
+
+# How many commands the local fast path answered without calling Gemini
+intent_stats = IntentStats()
+
+# Repeated commands are answered from a cache instead of calling Gemini again.
+# RESPONSE_CACHE_FILE keeps the cache across restarts; RESPONSE_CACHE_SIZE bounds it (LRU).
+response_cache = ResponseCache(max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", "256")),
+                               path=os.getenv("RESPONSE_CACHE_FILE") or None)
 
 # Memory file path
 MEMORY_FILE = "conversation_memory.json"
 
-# Global variable to hold memory state, initialized once
-# This will be passed around or accessed by functions that need it.
-# It's better to pass it explicitly to functions that modify it.
-_current_memory_state = {}
+# Memory is written in the background, atomically. MEMORY_JOURNAL=1 appends small per-turn
+# deltas to conversation_memory.json.journal instead of rewriting the whole file each turn.
+memory_store = MemoryStore(MEMORY_FILE, journal=os.getenv("MEMORY_JOURNAL", "0") == "1")
+
+# The local user's conversation state: memory, the Gemini chat kept open while Gemini
+# waits for a clarification, and the IP-based timezone (set by start_session()).
+# handle_user_input() uses it unless it is given another session (see server.py).
+local_session = Session("local", store=memory_store)
+
+# The last IP-based location is cached here for LOCATION_CACHE_TTL seconds (default 6 hours),
+# so warm starts do not wait on ipinfo.io at all.
+LOCATION_CACHE_FILE = "location_cache.json"
+LOCATION_CACHE_TTL = float(os.getenv("LOCATION_CACHE_TTL", str(6 * 3600)))
+_startup_marks.append(("configuration and workers", time.perf_counter()))
 
 # --- Geolocation Functions ---
 
-def get_ip_based_location():
-    """Attempts to get approximate city/region/country based on IP address."""
-    try:
-        response = requests.get('https://ipinfo.io/json', timeout=5)
-        response.raise_for_status() # Raise an exception for HTTP errors (4xx or 5xx)
-        data = response.json()
-        city = data.get('city', 'Unknown City')
-        region = data.get('region', 'Unknown Region')
-        country = data.get('country', 'Unknown Country')
-        timezone = data.get('timezone', 'UTC') # Get timezone for time operations
-
-        location_str = f"{city}, {region}, {country}"
-        print(f"🌍 Retrieved IP-based location: {location_str} (Timezone: {timezone})")
-        return location_str, timezone
-    except requests.exceptions.ConnectionError:
-        print("⚠️ Network error: Could not connect to ipinfo.io. Please check your internet connection.")
-    except requests.exceptions.Timeout:
-        print("⚠️ Network error: Request to ipinfo.io timed out. Your internet might be slow or unstable.")
-    except requests.exceptions.RequestException as e:
-        print(f"⚠️ Network error: An unexpected error occurred while fetching location: {e}")
-    except json.JSONDecodeError:
-        print("⚠️ Data error: Could not decode location data from ipinfo.io. Response was not valid JSON.")
-    return "Unknown Location", "UTC" # Default to UTC if location cannot be found
+def handle_location_update(location, timezone):
+    """Called from the background lookup when the IP-based location arrives."""
+    local_session.set_location(location, timezone)
+
+@lru_cache(maxsize=64)
+def get_tzinfo(timezone_str):
+    """pytz.timezone() parses the zone file on every call; keep the objects we have built."""
+    return pytz.timezone(timezone_str)
+
+def timezone_for_turn(session=None):
+    """The user's stated location wins over the IP-based one when the gazetteer knows it."""
+    session = session or local_session
+    user_location = session.memory.get("user_defined_location")
+    if user_location:
+        timezone = resolve_timezone(user_location)
+        if timezone:
+            return timezone
+    return session.ip_timezone
 
 def get_current_time_in_timezone(timezone_str):
     """Returns the current formatted time for a given timezone string."""
     try:
-        tz = pytz.timezone(timezone_str)
+        tz = get_tzinfo(timezone_str)
         now = datetime.now(tz)
         return now.strftime('%A, %B %d, %Y at %I:%M:%S %p %Z')
     except pytz.exceptions.UnknownTimeZoneError:
@@ -75,24 +208,34 @@ def get_current_time_in_timezone(timezone_str):
     except Exception as e:
         return f"Error getting time for {timezone_str}: {e}"
 
+def describe_local_time(timezone_str, kind):
+    """Short spoken answer for a local time (INTENT_TIME) or date (INTENT_DATE) question."""
+    try:
+        now = datetime.now(get_tzinfo(timezone_str))
+    except pytz.exceptions.UnknownTimeZoneError:
+        return f"Unknown timezone: {timezone_str}. Cannot determine local time."
+    if kind == INTENT_DATE:
+        return f"Today is {now.strftime('%A, %B %d, %Y')}."
+    return f"It's {now.strftime('%I:%M %p').lstrip('0')}."
+
 # --- Calculation Function ---
 
+@tracer.traced("calculation")
 def perform_calculation(expression):
     """
     Safely evaluates a mathematical expression.
     Returns (result_string, is_success).
     """
-    allowed_chars = "0123456789.+-*/() "
-    # Basic check for non-allowed characters for simple prevention of arbitrary code.
-    # The preprocessing now handles many common spoken symbols into actual characters.
-    for char in expression:
-        if char not in allowed_chars:
-            return "The calculation contains unsupported characters or symbols.", False
-
+    # No eval(): calculator.evaluate() walks the AST, accepts only numbers, operators and a few
+    # math functions, and caps exponent size, operand magnitude, length and run time.
     try:
-        result = eval(expression)
-        return str(result), True
-    except (SyntaxError, TypeError, NameError, ZeroDivisionError) as e:
+        result = evaluate(expression, mode=CALCULATION_MODE)
+        return format_result(result), True
+    except UnsupportedExpression:
+        return UNSUPPORTED_CALCULATION, False
+    except CalculationLimitError as e:
+        return f"That calculation is too large for me: {e}.", False
+    except CalculationError as e:
         return f"I couldn't perform that calculation due to an error: {e}. Please ensure it's a valid mathematical expression.", False
     except Exception as e:
         return f"An unexpected error occurred during calculation: {e}", False
@@ -100,42 +243,18 @@ def perform_calculation(expression):
 # --- Memory Management Functions ---
 
 def load_memory():
-    """Loads the conversation memory from the JSON file."""
-    initial_memory_structure = {
-        "accumulated_user_input": [],
-        "last_gemini_question": None,
-        "needs_clarification": False,
-        "user_defined_location": None,
-        "last_retrieved_ip_location": None
-    }
-    if not os.path.exists(MEMORY_FILE):
-        with open(MEMORY_FILE, 'w') as f:
-            json.dump(initial_memory_structure, f, indent=4)
-        return initial_memory_structure
-
-    try:
-        with open(MEMORY_FILE, 'r') as f:
-            memory = json.load(f)
-            # Ensure the loaded memory has all expected keys, add if missing (for robust updates)
-            for key, default_val in initial_memory_structure.items():
-                if key not in memory:
-                    memory[key] = default_val
-            return memory
-    except json.JSONDecodeError:
-        print(f"Warning: Corrupted {MEMORY_FILE}. Resetting memory.")
-        # If corrupted, clear and return initial structure
-        clear_all_memory_and_reset_file() # This will also save the initial structure
-        return initial_memory_structure
+    """Loads the conversation memory from the JSON file (and journal, if enabled)."""
+    return memory_store.load()
 
 def save_memory(data):
-    """Saves the current conversation memory to the JSON file."""
-    with open(MEMORY_FILE, 'w') as f:
-        json.dump(data, f, indent=4)
+    """Saves the current conversation memory. The write happens on a background thread."""
+    memory_store.save(data)
 
 def reset_memory_for_new_turn(memory_data):
     """Resets conversational memory flags and accumulated input for a new turn."""
     memory_data["accumulated_user_input"] = []
     memory_data["last_gemini_question"] = None
+    memory_data["last_question_kind"] = None
     memory_data["needs_clarification"] = False
     # Do NOT reset user_defined_location or last_retrieved_ip_location here
     # as these persist across turns.
@@ -143,255 +262,591 @@ def reset_memory_for_new_turn(memory_data):
 
 def clear_all_memory_and_reset_file():
     """Clears all conversation memory and resets the file to initial state."""
-    initial_memory = {
-        "accumulated_user_input": [],
-        "last_gemini_question": None,
-        "needs_clarification": False,
-        "user_defined_location": None,
-        "last_retrieved_ip_location": None
-    }
-    save_memory(initial_memory)
+    cleared_memory = initial_memory()
+    save_memory(cleared_memory)
+    memory_store.flush()
     print("✨ All conversation memory cleared and file reset.")
-    return initial_memory
+    return cleared_memory
 
 # --- Voice and Speech Functions ---
 
-def get_speech_input():
-    """Captures speech input from the microphone and converts it to text."""
-    recognizer = sr.Recognizer()
-    with sr.Microphone() as source:
-        print("\n🎤 Listening... (Speak your question)")
-        recognizer.adjust_for_ambient_noise(source, duration=0.5)
-        try:
-            audio = recognizer.listen(source, timeout=5, phrase_time_limit=8)
-        except sr.WaitTimeoutError:
-            print("🕒 No speech detected within the timeout period.")
-            return None
+def get_recognizer_backend():
+    """Creates the speech-to-text backend (and imports its library) on first use."""
+    global _recognizer_backend
+    if _recognizer_backend is None:
+        _recognizer_backend = create_backend()
+    return _recognizer_backend
+
+def get_audio_capture():
+    """
+    Starts the always-on capture thread on first use and returns it.
+    The stream stays open between turns, the noise floor is tracked continuously,
+    and speech that starts before we ask for it is kept (with pre-roll) in its queue.
+    """
+    global _audio_capture
+    if _audio_capture is None:
+        with tracer.span("audio_start"):
+            source = WavFileSource(AUDIO_INPUT_WAV, realtime=True) if AUDIO_INPUT_WAV else MicrophoneSource()
+            callbacks = {}
+            speech_started = [speech_queue.barge_in]
+            recognizer_backend = get_recognizer_backend()
+            if recognizer_backend.supports_partials:
+                # Recognize while the user is still talking instead of after they finish.
+                transcriber = LiveTranscriber(recognizer_backend, source.sample_rate, on_partial=handle_partial_transcript)
+                speech_started.append(transcriber.on_speech_start)
+                callbacks = {"on_frame": transcriber.on_frame,
+                             "on_speech_end": transcriber.on_speech_end}
+
+            def on_speech_start():
+                # Barge-in: the user started talking, so stop whatever the assistant is saying now
+                # rather than after the utterance has ended and been recognized.
+                for callback in speech_started:
+                    callback()
+
+            # The microphone stays open while the assistant talks; capture ignores its voice.
+            _audio_capture = AudioCapture(source, max_utterance_s=8, is_playing=lambda: speech_queue.speaking.is_set(),
+                                          on_speech_start=on_speech_start, **callbacks).start()
+    return _audio_capture
+
+def handle_partial_transcript(partial_text):
+    """Called from the capture thread with each new partial hypothesis; preprocessing starts right away."""
+    global _latest_partial_input
+    processed = preprocess_spoken_text(partial_text)
+    _latest_partial_input = (partial_text, processed, classify_intent(processed))
+    print(f"💬 {partial_text}...")
+
+def next_utterance(timeout=5):
+    """Waits for the next utterance from the capture thread."""
+    print("\n🎤 Listening... (Speak your question)")
+    capture = get_audio_capture()
+    with tracer.span("listen") as span:
+        utterance = capture.get_utterance(timeout=timeout)
+        span.set(heard=utterance is not None)
+    if utterance is None:
+        print("🕒 No speech detected within the timeout period.")
+    return utterance
+
+def recognize_utterance(utterance):
+    """Converts a captured utterance to text, or returns None if it could not be understood."""
+    recognizer_backend = get_recognizer_backend()
     try:
-        text = recognizer.recognize_google(audio)
+        with tracer.span("asr", backend=recognizer_backend.name):
+            text = transcribe(recognizer_backend, utterance)
         print(f"🗣️ You said: {text}")
         return text
-    except sr.UnknownValueError:
+    except SpeechNotUnderstood:
         print("❌ Could not understand audio. Please try speaking more clearly.")
-    except sr.RequestError as e:
-        print(f"❌ Could not request results from Google Speech Recognition service; check your internet connection or API limits: {e}")
+    except RecognizerUnavailable as e:
+        print(f"❌ Could not request results from the {recognizer_backend.name} speech recognizer; check your internet connection, API limits or model setup: {e}")
     return None
 
-def speak_response(response):
-    """Speaks the given text response aloud."""
-    engine.say(response)
-    engine.runAndWait()
+def get_speech_input():
+    """Captures the next utterance and converts it to text."""
+    utterance = next_utterance()
+    if utterance is None:
+        return None
+    return recognize_utterance(utterance)
+
+def speak_response(response, wait=False, priority=PRIORITY_NORMAL, timeout=None):
+    """
+    Queues the given text response to be spoken aloud and returns immediately.
+    Pass wait=True to block until everything queued so far has been spoken (or for at
+    most `timeout` seconds). Returns False if that wait timed out.
+    """
+    speech_queue.say(response, priority)
+    if wait:
+        return speech_queue.wait_until_idle(timeout)
+    return True
+
+def get_typing_backend():
+    """Creates the typing backend on first use."""
+    global _typing_backend
+    if _typing_backend is None:
+        _typing_backend = create_typing_backend()
+    return _typing_backend
 
 def write_response(text):
     """
-    Types the given text using pyautogui.
-    Adds a small delay before typing to allow user to switch focus.
+    Types the given text with the configured typing backend.
+    Waits for the user to switch to the target window first (or FOCUS_TIMEOUT seconds).
     """
-    speak_response("Okay, I will type that for you. Please switch to the desired application now.")
-    time.sleep(2) # Give user 2 seconds to switch to notepad, word doc, etc.
+    speak_response(TYPING_NOTICE)
     try:
-        # Use pyautogui.write with a slight interval for better reliability
-        pyautogui.write(text, interval=0.01)
+        backend = get_typing_backend()
+        with tracer.span("focus_wait") as span:
+            # Without a way to see the switch, the fallback delay only starts once the user has
+            # heard the whole notice; otherwise keys could land in the assistant's own terminal.
+            switched = wait_for_focus_change(backend, timeout=FOCUS_TIMEOUT,
+                                             before_fallback=lambda: speech_queue.wait_until_idle(FOCUS_TIMEOUT))
+            span.set(switched=switched)
+        if switched is False:
+            print(f"⌛ No window switch within {FOCUS_TIMEOUT:.0f}s; typing into the active window.")
+        started = time.perf_counter()
+        with tracer.span("type", backend=backend.name, chars=len(text)):
+            backend.type_text(text)
+        typing_stats.record(backend.name, len(text), time.perf_counter() - started)
         print(f"✍️ Typed: {text[:50]}...") # Print first 50 chars for log
+    except TypingError as e:
+        speak_response(f"I couldn't type that: {e}", priority=PRIORITY_URGENT)
+        print(f"❌ Typing backend error: {e}")
     except Exception as e:
-        speak_response(f"I encountered an error trying to type: {e}")
+        speak_response(f"I encountered an error trying to type: {e}", priority=PRIORITY_URGENT)
         print(f"❌ Error typing: {e}")
 
 # --- Gemini Interaction Logic ---
 
-def ask_gemini(full_prompt):
+def get_model():
+    """Imports the Gemini SDK and creates the model on first use."""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                import google.generativeai as genai
+                # Configure the Gemini model
+                genai.configure(api_key=gemini_api_key)
+                # The fixed instructions are the model's system instruction, built once, so each
+                # message only holds the time/location context and the user's words. (The SDK
+                # still sends the instruction and chat history with every request, which is why
+                # the history keeps only the user's words.)
+                _model = genai.GenerativeModel("", system_instruction=SYSTEM_INSTRUCTION) # Select Model
+    return _model
+
+def describe_gemini_error(e):
+    """Turns an exception from the Gemini client into a user-facing error message."""
+    e = classify_error(e)
+    for error_type, message in GEMINI_ERROR_MESSAGES.items():
+        if isinstance(e, error_type):
+            return message
+    return f"Error communicating with Gemini: {e}"
+
+def ask_gemini(full_prompt, chat=None):
     """
-    Sends the prompt to Gemini and returns its response.
-    Includes error handling for network issues with Gemini API.
+    Sends the prompt to Gemini and returns (response_text, chat), where chat is the session
+    to keep using (a retry may have moved the conversation to a fresh one).
+    Raises GeminiError when no answer could be had, or CircuitOpen while Gemini is unhealthy.
     """
-    try:
-        response = model.generate_content(full_prompt)
-        return response.text
-    except Exception as e:
-        # More specific error handling for Gemini API
-        if "google.api_core.exceptions.InternalServerError" in str(e) or "google.api_core.exceptions.ServiceUnavailable" in str(e):
-            return "Error: The Gemini service is currently unavailable. Please try again later."
-        elif "google.api_core.exceptions.BlockedPromptException" in str(e):
-            return "Error: Your request was blocked due to content policy. Please try rephrasing."
-        elif "google.api_core.exceptions.ResourceExhausted" in str(e):
-            return "Error: You've sent too many requests to Gemini. Please wait a moment."
-        elif "requests.exceptions.ConnectionError" in str(e) or "urllib3.exceptions.NewConnectionError" in str(e):
-            return "Error: I cannot connect to the Gemini service. Please check your internet connection."
-        elif "google.api_core.exceptions.InvalidArgument" in str(e):
-            return "Error: The request sent to Gemini was invalid. This might be a prompt issue."
-        else:
-            return f"Error communicating with Gemini: {e}"
+    with tracer.span("gemini"):
+        reply = gemini_client.generate(full_prompt, chat=chat)
+    return reply.text, reply.chat
+
+def stream_gemini(full_prompt, chat=None):
+    """
+    Sends the prompt to Gemini in streaming mode.
+    Returns (StreamedResponse, GeminiStream): the prefix is known after the first chunk(s)
+    and sentences can be spoken while the rest of the reply is still being generated;
+    the GeminiStream's `chat` is the session to keep using afterwards.
+    Raises CircuitOpen right away while Gemini is unhealthy.
+    """
+    gemini_stream = gemini_client.stream(full_prompt, chat=chat)
+    streamed = StreamedResponse(lambda: gemini_stream, describe_error=describe_gemini_error,
+                                chunk_timeout=gemini_client.deadline)
+    return streamed, gemini_stream
+
+def answer_without_gemini(processed_user_input, timezone_str, error):
+    """Best local answer while Gemini cannot be reached: a looser calculation/time/date match, or an apology."""
+    intent = guess_local_intent(processed_user_input)
+    if intent is not None and intent.kind == INTENT_CALCULATE:
+        answer, is_success = perform_calculation(intent.payload)
+        if is_success:
+            return answer
+    elif intent is not None and intent.kind in (INTENT_TIME, INTENT_DATE):
+        return describe_local_time(timezone_str, intent.kind)
+    return f"{describe_gemini_error(error)} {DEGRADED_SUFFIX}"
 
 # --- Main Application Logic ---
 
-def main():
-    global _current_memory_state # Declare intent to use global variable
+# What a turn asks the output side to do. main() performs these right away; the asyncio
+# pipeline (pipeline.py) hands them to its own output stage.
+ACTION_SPEAK = "speak"
+ACTION_WRITE = "write"
+
+def perform_action(kind, text, priority=PRIORITY_NORMAL):
+    """Speaks or types text on behalf of a turn."""
+    if kind == ACTION_WRITE:
+        write_response(text)
+    else:
+        speak_response(text, priority=priority)
 
+def start_session():
+    """Greets the user, loads memory and location, and resumes an unfinished command."""
     print("🎙️ Gemini Voice Assistant with Calculations, Dynamic Location & Writing Capabilities (Speak 'exit' to quit)")
-    speak_response("Hello, I am your Gemini voice assistant. How can I help you today?")
+    speak_response(GREETING)
 
     # Load initial memory at startup - only once
-    _current_memory_state = load_memory()
-
-    # Get initial IP-based location and timezone - only once at startup
-    ip_location, ip_timezone = get_ip_based_location()
-    _current_memory_state["last_retrieved_ip_location"] = ip_location
-    save_memory(_current_memory_state) # Save after initial IP location update
+    memory = local_session.load()
 
-    if _current_memory_state["needs_clarification"] and _current_memory_state["last_gemini_question"]:
-        speak_response(f"Welcome back! Last time, I was trying to understand your request. {_current_memory_state['last_gemini_question']}")
-        print(f"Resuming incomplete command. Gemini asked: {_current_memory_state['last_gemini_question']}")
-
-    while True:
-        user_input = get_speech_input()
-        if user_input:
-            # --- Preprocess user input using the function from utils.py ---
+    if METRICS_PORT:
+        try:
+            tracer.start_http_server(int(METRICS_PORT))
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Could not serve metrics on port {METRICS_PORT}: {e}")
+
+    # IP-based location and timezone: from the cache on warm starts, otherwise looked up in
+    # the background (handle_location_update fills it in) while we already start listening.
+    location_service = LocationService(LOCATION_CACHE_FILE, ttl=LOCATION_CACHE_TTL,
+                                       on_update=handle_location_update).start()
+    local_session.set_location(location_service.location, location_service.timezone) # Save after initial IP location update
+
+    if memory["needs_clarification"] and memory["last_gemini_question"]:
+        speak_response(f"Welcome back! Last time, I was trying to understand your request. {memory['last_gemini_question']}")
+        print(f"Resuming incomplete command. Gemini asked: {memory['last_gemini_question']}")
+
+def end_session():
+    """Says goodbye, reports stats and clears memory. Called when the user asks to exit."""
+    if not speak_response(GOODBYE, wait=True, priority=PRIORITY_URGENT, timeout=GOODBYE_TIMEOUT):
+        print(f"⚠️ Speech did not finish within {GOODBYE_TIMEOUT:.0f}s; exiting anyway.")
+    print("👋 Exiting. Bye!")
+    tts_stats = speech_queue.stats()
+    print(f"🔈 Speech queue: {tts_stats['spoken']} spoken, {tts_stats['cancelled']} interrupted, "
+          f"avg {tts_stats['avg_wait'] * 1000:.0f} ms / max {tts_stats['max_wait'] * 1000:.0f} ms in queue")
+    print(f"⚡ Local fast path: {intent_stats.summary()}")
+    print(f"💾 Response cache: {response_cache.summary()}")
+    print(f"📦 Prompt size: {prompt_meter.summary()}")
+    print(f"✍️ Typing: {typing_stats.summary()}")
+    if tts_cache is not None:
+        tts_cache.save()
+        print(f"🔊 Speech cache: {tts_cache.summary()}")
+    client_stats = gemini_client.stats
+    print(f"🛡️ Gemini client: {client_stats['requests']} requests, {client_stats['retries']} retries, "
+          f"{client_stats['timeouts']} timeouts, {client_stats['hedge_wins']}/{client_stats['hedges']} hedges won, "
+          f"{client_stats['rejected']} answered locally while the circuit was open ({gemini_client.breaker.trips} trips)")
+    gemini_client.close()
+    print(f"⏱️ Stage latency (rolling):\n{tracer.summary()}")
+    tracer.close()
+    response_cache.save()
+    clear_all_memory_and_reset_file() # Clear memory on exit
+    memory_store.close()
+
+def handle_user_input(user_input, emit=perform_action, session=None):
+    """
+    Runs one turn for a recognized utterance: preprocess, answer locally or ask Gemini,
+    and update memory. Output goes through emit(kind, text) so callers decide how and
+    when it is spoken or typed. `session` holds the conversation state: the local user's
+    by default, one per client in server.py. Returns False when the user asked to exit.
+    """
+    session = session or local_session
+    memory = session.memory
+
+    # --- Preprocess user input using the function from utils.py ---
+    # A streaming recognizer usually finished this already on its last partial result.
+    if _latest_partial_input and _latest_partial_input[0] == user_input:
+        processed_user_input, local_intent = _latest_partial_input[1], _latest_partial_input[2]
+    else:
+        with tracer.span("preprocess"):
             processed_user_input = preprocess_spoken_text(user_input)
-            print(f"Preprocessed input: {processed_user_input}") # For debugging
-
-            if processed_user_input.lower() in ['exit', 'quit', 'stop', 'goodbye']:
-                speak_response("Goodbye! Have a great day.")
-                print("👋 Exiting. Bye!")
-                clear_all_memory_and_reset_file() # Clear memory on exit
-                break
-
-            # --- Prepare context for Gemini ---
-            # Use the most recent timezone information
-            current_timezone_for_prompt = ip_timezone # Default to IP-based
-            if _current_memory_state["user_defined_location"]:
-                # You might need logic here to derive a timezone from user_defined_location
-                # For simplicity, if a user-defined location is set, we might
-                # assume the IP-based timezone is still the best available,
-                # or require a more robust location-to-timezone mapping service.
-                # For now, we'll keep using ip_timezone for actual time calculation,
-                # but pass user_defined_location in prompt for context.
-                pass # No change to current_timezone_for_prompt yet
-
-            current_time = get_current_time_in_timezone(current_timezone_for_prompt)
-
-            prompt_parts = []
-            prompt_parts.append(f"Current time is {current_time}.")
-            prompt_parts.append(f"Current approximate location (from IP) is {_current_memory_state['last_retrieved_ip_location']}.")
-            if _current_memory_state["user_defined_location"]:
-                prompt_parts.append(f"User has explicitly set their location as: {_current_memory_state['user_defined_location']}. Use this if relevant.")
-
-            prompt_parts.append("Your goal is to understand and execute commands. You can perform mathematical calculations.")
-            prompt_parts.append("You DO NOT have access to real-time information such as current weather, live news updates, real-time stock prices, or specific events happening right now. If the user asks for such information, respond with 'I do not have access to real-time information for that.' or 'I can't provide live updates for that.'")
-
-            prompt_parts.append("You can either SPEAK a response or WRITE a response. You MUST use one of the following prefixes for your final output:")
-            prompt_parts.append("- If the user asks you to write something, generate the text and prepend it with 'WRITE_RESPONSE:' (e.g., 'WRITE_RESPONSE:This is the text I will type for you.'). After typing, the conversation turn ends.")
-            prompt_parts.append("- If the user asks you a question for which you have an answer, generate the answer and prepend it with 'SPEAK_RESPONSE:' (e.g., 'SPEAK_RESPONSE:The capital of France is Paris.').")
-            prompt_parts.append("- If the user asks for a calculation, extract ONLY the mathematical expression (e.g., '5 + 3', '10 * (2 + 3)', '8 / 4'). Do not include any text, just the expression. You MUST prepend this expression with 'CALCULATE:'. If the calculation expression is ambiguous or missing numbers/operators, use 'CLARIFICATION_NEEDED:' instead.")
-            prompt_parts.append("- If a command is incomplete or ambiguous (and not a calculation), you MUST respond by starting your reply with 'CLARIFICATION_NEEDED:' followed by the specific question you need answered to complete the command. Do not give a final answer if you need more information.")
-            prompt_parts.append("- If a question requires location information (e.g., current time, nearby places) AND the user's provided location or IP-based location is insufficient or missing for the query, you MUST ask the user for their specific location by starting your question with 'LOCATION_NEEDED:'. Once the user provides it, remember it for the current session.")
-            prompt_parts.append("Consider the following as a continuous conversation.")
-            prompt_parts.append("IMPORTANT: Always choose between SPEAK_RESPONSE, WRITE_RESPONSE, CALCULATE, CLARIFICATION_NEEDED, or LOCATION_NEEDED for your direct response based on user intent. Ensure any numerical expressions or text meant for writing uses standard symbols (e.g., *, @, +, /, #).")
-
-
-            # Build the internal chat history for Gemini
-            chat_history_for_gemini = []
-
-            if _current_memory_state["needs_clarification"] and _current_memory_state["accumulated_user_input"]:
-                for i, prev_input in enumerate(_current_memory_state["accumulated_user_input"]):
-                    chat_history_for_gemini.append(f"User (part {i+1}): {prev_input}")
-
-                if _current_memory_state["last_gemini_question"]:
-                    chat_history_for_gemini.append(f"Assistant: {_current_memory_state['last_gemini_question']}")
-
-                # Pass the processed_user_input to Gemini
-                chat_history_for_gemini.append(f"User (clarification): {processed_user_input}")
-
-                full_prompt = "\n".join(prompt_parts) + "\n\n" + "\n".join(chat_history_for_gemini)
+            local_intent = classify_intent(processed_user_input)
+    print(f"Preprocessed input: {processed_user_input}") # For debugging
+
+    if local_intent and local_intent.kind == INTENT_EXIT:
+        return False
+
+    # Use the most recent timezone information: the user's stated location (resolved offline
+    # through the bundled gazetteer) if we know it, otherwise the IP-based timezone.
+    current_timezone_for_prompt = timezone_for_turn(session)
+
+    # --- Local fast path: answer calculations and time/date questions without Gemini ---
+    # Skipped mid-clarification, where the input is an answer to Gemini's question.
+    if local_intent and not memory["needs_clarification"]:
+        if local_intent.kind == INTENT_CALCULATE:
+            local_answer, is_success = perform_calculation(local_intent.payload)
+            print(f"Local calculation: {local_intent.payload} = {local_answer}")
+        else:
+            local_answer, is_success = describe_local_time(current_timezone_for_prompt, local_intent.kind), True
+            print(f"Local {local_intent.kind} answer: {local_answer}")
+        if is_success:
+            tracer.annotate(route="local", intent=local_intent.kind)
+            emit(ACTION_SPEAK, local_answer)
+            intent_stats.record(local_intent.kind)
+            reset_memory_for_new_turn(memory)
+            session.save()
+            return True
+        # Not something the calculator can do (e.g. division by zero); Gemini may still make sense of it.
+        print("Local calculation failed; asking Gemini instead.")
+    intent_stats.record(None)
+
+    # --- Prepare context for Gemini ---
+    current_time = get_current_time_in_timezone(current_timezone_for_prompt)
+
+    turn_context = build_turn_context(current_time,
+                                      memory['last_retrieved_ip_location'],
+                                      memory["user_defined_location"])
+
+    if memory["needs_clarification"] and memory["accumulated_user_input"]:
+        earlier_turns = seed_clarification_history(memory["accumulated_user_input"],
+                                                   memory["last_gemini_question"],
+                                                   memory["last_question_kind"])
+        if session.gemini_chat is None:
+            # The chat that asked the question is gone (restart or cache hit); rebuild it from memory.
+            session.gemini_chat = get_model().start_chat(history=earlier_turns)
+        # Pass the processed_user_input to Gemini; the earlier parts are already in the chat
+        full_prompt = build_clarification_message(turn_context, processed_user_input)
+    else:
+        # Fresh session per command so a clarifying question can continue in it
+        session.gemini_chat = get_model().start_chat()
+        # Pass the processed_user_input to Gemini
+        full_prompt = build_command_message(turn_context, processed_user_input)
+
+    # Debugging: print the full prompt sent to Gemini (optional)
+    # print("\n--- PROMPT SENT TO GEMINI ---")
+    # print(full_prompt)
+    # print("-----------------------------\n")
+
+    # The cache key covers everything in the prompt that changes the answer except the clock.
+    clarification_context = None
+    if memory["needs_clarification"]:
+        clarification_context = [memory["accumulated_user_input"],
+                                 memory["last_gemini_question"]]
+    cache_key = response_cache.make_key(processed_user_input,
+                                        location=memory["last_retrieved_ip_location"],
+                                        user_location=memory["user_defined_location"],
+                                        clarification=clarification_context)
+
+    spoken_while_streaming = False
+    with tracer.span("cache_lookup"):
+        gemini_response = response_cache.get(cache_key)
+    if gemini_response is not None:
+        print("💾 Answered from the response cache.")
+        tracer.annotate(route="cache")
+        session.gemini_chat = None # The chat never saw this exchange
+    else:
+        tracer.annotate(route="gemini", streamed=STREAM_RESPONSES)
+        prompt_meter.record(full_prompt, history=getattr(session.gemini_chat, "history", ()),
+                            baseline=build_flat_prompt(current_time, memory["last_retrieved_ip_location"],
+                                                       memory["user_defined_location"], processed_user_input,
+                                                       memory["accumulated_user_input"] if clarification_context else (),
+                                                       memory["last_gemini_question"]))
+        try:
+            if STREAM_RESPONSES:
+                with tracer.span("gemini"):
+                    streamed, gemini_stream = stream_gemini(full_prompt, chat=session.gemini_chat)
+                    with tracer.span("gemini_prefix"):
+                        prefix = streamed.detect_prefix()
+                    if prefix == SPEAK_PREFIX:
+                        # Speak sentence one while Gemini is still generating the rest.
+                        for sentence in streamed.sentences():
+                            emit(ACTION_SPEAK, sentence)
+                        spoken_while_streaming = True
+                    gemini_response = streamed.full_text()
+                if streamed.error is not None:
+                    # Failed, or cut off part way: a partial reply (half an expression, half
+                    # the text to type) must not be acted on or cached.
+                    if streamed.interrupted:
+                        print(f"⚠️ Discarding the partial Gemini reply: {gemini_response[:50]}...")
+                    raise classify_error(streamed.error)
+                session.gemini_chat = gemini_stream.chat
             else:
-                # Pass the processed_user_input to Gemini
-                full_prompt = "\n".join(prompt_parts) + f"\n\nUser command: {processed_user_input}"
-
-            # Debugging: print the full prompt sent to Gemini (optional)
-            # print("\n--- PROMPT SENT TO GEMINI ---")
-            # print(full_prompt)
-            # print("-----------------------------\n")
-
-            gemini_response = ask_gemini(full_prompt)
-
-            # --- Process Gemini's Response ---
-            CLARIFICATION_PREFIX = "CLARIFICATION_NEEDED:"
-            LOCATION_PREFIX = "LOCATION_NEEDED:"
-            CALCULATE_PREFIX = "CALCULATE:"
-            SPEAK_PREFIX = "SPEAK_RESPONSE:"
-            WRITE_PREFIX = "WRITE_RESPONSE:"
-
-            memory_changed = False # Flag to track if memory needs saving
-
-            if gemini_response.startswith(CALCULATE_PREFIX):
-                expression = gemini_response[len(CALCULATE_PREFIX):].strip()
-                print(f"Gemini requested calculation: {expression}")
-
-                calculation_output, is_success = perform_calculation(expression)
-
-                speak_response(calculation_output)
-                print(f"Calculation result: {calculation_output}")
-
-                # Reset memory for a new turn after successful calculation
-                _current_memory_state = reset_memory_for_new_turn(_current_memory_state)
-                memory_changed = True
-
-            elif gemini_response.startswith(WRITE_PREFIX):
-                text_to_write = gemini_response[len(WRITE_PREFIX):].strip()
-                print(f"Gemini requested typing: {text_to_write[:50]}...")
-                write_response(text_to_write)
-                # Reset memory for a new turn after successful write
-                _current_memory_state = reset_memory_for_new_turn(_current_memory_state)
-                memory_changed = True
-
-            elif gemini_response.startswith(LOCATION_PREFIX):
-                location_question = gemini_response[len(LOCATION_PREFIX):].strip()
-                speak_response(location_question)
-                print(f"Gemini asked for location: {location_question}")
-
-                _current_memory_state["accumulated_user_input"].append(user_input) # Original user_input saved (for debugging/context)
-                _current_memory_state["last_gemini_question"] = location_question
-                _current_memory_state["needs_clarification"] = True
-                memory_changed = True # Memory state has changed
-
-            elif gemini_response.startswith(CLARIFICATION_PREFIX):
-                clarification_question = gemini_response[len(CLARIFICATION_PREFIX):].strip()
-                speak_response(clarification_question)
-                print(f"Gemini asked for clarification: {clarification_question}")
-
-                _current_memory_state["accumulated_user_input"].append(user_input) # Original user_input saved
-                _current_memory_state["last_gemini_question"] = clarification_question
-                _current_memory_state["needs_clarification"] = True
-                memory_changed = True # Memory state has changed
-
-            elif gemini_response.startswith(SPEAK_PREFIX):
-                final_spoken_response = gemini_response[len(SPEAK_PREFIX):].strip()
-                speak_response(final_spoken_response)
-                print(f"Gemini provided a spoken response.")
-
-                # If this SPEAK_RESPONSE was a follow-up to a LOCATION_NEEDED question
-                if _current_memory_state["needs_clarification"] and \
-                   _current_memory_state["last_gemini_question"] and \
-                   _current_memory_state["last_gemini_question"].startswith(LOCATION_PREFIX):
-                    _current_memory_state["user_defined_location"] = user_input # Store the user's provided location
-                    # No need to set memory_changed=True here, as the reset below will trigger a save anyway.
-
-                # Reset memory for a new turn after providing a final spoken response
-                _current_memory_state = reset_memory_for_new_turn(_current_memory_state)
-                memory_changed = True
-
+                gemini_response, session.gemini_chat = ask_gemini(full_prompt, chat=session.gemini_chat)
+        except GeminiError as e:
+            # Degraded mode: answer what we can locally and keep any pending clarification
+            # in memory, so the command can be retried once Gemini is back.
+            print(f"⚠️ Gemini unavailable ({type(e).__name__}): {e}")
+            tracer.annotate(route="degraded", error=type(e).__name__)
+            emit(ACTION_SPEAK, answer_without_gemini(processed_user_input, current_timezone_for_prompt, e))
+            session.gemini_chat = None # an abandoned request may still append to the old session
+            return True
+        # The whole chain decides whether the answer goes stale: "I'm in Pune" is timeless on
+        # its own, but not as the answer to "what's the weather like".
+        asked = " ".join(memory["accumulated_user_input"] + [processed_user_input])
+        response_cache.put(cache_key, gemini_response, command=asked)
+
+    # --- Process Gemini's Response ---
+    memory_changed = False # Flag to track if memory needs saving
+
+    if gemini_response.startswith(CALCULATE_PREFIX):
+        expression = gemini_response[len(CALCULATE_PREFIX):].strip()
+        print(f"Gemini requested calculation: {expression}")
+
+        calculation_output, is_success = perform_calculation(expression)
+
+        emit(ACTION_SPEAK, calculation_output)
+        print(f"Calculation result: {calculation_output}")
+
+        # Reset memory for a new turn after successful calculation
+        reset_memory_for_new_turn(memory)
+        memory_changed = True
+
+    elif gemini_response.startswith(WRITE_PREFIX):
+        text_to_write = gemini_response[len(WRITE_PREFIX):].strip()
+        print(f"Gemini requested typing: {text_to_write[:50]}...")
+        emit(ACTION_WRITE, text_to_write)
+        # Reset memory for a new turn after successful write
+        reset_memory_for_new_turn(memory)
+        memory_changed = True
+
+    elif gemini_response.startswith(LOCATION_PREFIX):
+        location_question = gemini_response[len(LOCATION_PREFIX):].strip()
+        emit(ACTION_SPEAK, location_question)
+        print(f"Gemini asked for location: {location_question}")
+
+        memory["accumulated_user_input"].append(user_input) # Original user_input saved (for debugging/context)
+        memory["last_gemini_question"] = location_question
+        memory["last_question_kind"] = LOCATION_PREFIX # the question itself is stored without its prefix
+        memory["needs_clarification"] = True
+        memory_changed = True # Memory state has changed
+
+    elif gemini_response.startswith(CLARIFICATION_PREFIX):
+        clarification_question = gemini_response[len(CLARIFICATION_PREFIX):].strip()
+        emit(ACTION_SPEAK, clarification_question)
+        print(f"Gemini asked for clarification: {clarification_question}")
+
+        memory["accumulated_user_input"].append(user_input) # Original user_input saved
+        memory["last_gemini_question"] = clarification_question
+        memory["last_question_kind"] = CLARIFICATION_PREFIX
+        memory["needs_clarification"] = True
+        memory_changed = True # Memory state has changed
+
+    elif gemini_response.startswith(SPEAK_PREFIX):
+        final_spoken_response = gemini_response[len(SPEAK_PREFIX):].strip()
+        if not spoken_while_streaming:
+            emit(ACTION_SPEAK, final_spoken_response)
+        print("Gemini provided a spoken response.")
+
+        # If this SPEAK_RESPONSE was a follow-up to a LOCATION_NEEDED question
+        if memory["needs_clarification"] and memory["last_question_kind"] == LOCATION_PREFIX:
+            memory["user_defined_location"] = user_input # Store the user's provided location
+            resolved_timezone = resolve_timezone(user_input)
+            if resolved_timezone:
+                print(f"🌍 User location '{user_input}' resolved to timezone {resolved_timezone}")
             else:
-                # Fallback for unexpected responses or if Gemini doesn't use a prefix (shouldn't happen with strict prompting)
-                print("⚠️ Unexpected response from Gemini (no recognized prefix). Speaking raw response.")
-                speak_response(gemini_response)
-                print(f"Raw Gemini response: {gemini_response}")
-                # Reset memory for a new turn in case of unexpected response
-                _current_memory_state = reset_memory_for_new_turn(_current_memory_state)
-                memory_changed = True
-
-            # Save memory only if a change occurred during this turn
-            if memory_changed:
-                save_memory(_current_memory_state)
-        time.sleep(0.5)
+                print(f"⚠️ No timezone known for '{user_input}'; keeping {session.ip_timezone}")
+            # No need to set memory_changed=True here, as the reset below will trigger a save anyway.
+
+        # Reset memory for a new turn after providing a final spoken response
+        reset_memory_for_new_turn(memory)
+        memory_changed = True
+
+    else:
+        # Fallback for unexpected responses or if Gemini doesn't use a prefix (shouldn't happen with strict prompting)
+        print("⚠️ Unexpected response from Gemini (no recognized prefix). Speaking raw response.")
+        emit(ACTION_SPEAK, gemini_response)
+        print(f"Raw Gemini response: {gemini_response}")
+        # Reset memory for a new turn in case of unexpected response
+        reset_memory_for_new_turn(memory)
+        memory_changed = True
+
+    if not memory["needs_clarification"]:
+        session.gemini_chat = None # Command finished; the next one starts a new session
+    elif session.gemini_chat is not None:
+        # The chat continues: keep this turn's words in its history, but not its time/location
+        # context, which the next message brings up to date anyway.
+        session.gemini_chat = get_model().start_chat(
+            history=words_only_history(session.gemini_chat.history, processed_user_input))
+
+    # Save memory only if a change occurred during this turn
+    if memory_changed:
+        session.save()
+    return True
+
+def main():
+    start_session()
+    while True:
+        utterance = next_utterance()
+        if utterance is None:
+            continue
+        # A turn is traced from the end of the utterance to the end of handle_user_input().
+        with tracer.turn():
+            user_input = recognize_utterance(utterance)
+            if not user_input:
+                continue
+            # (Barge-in already happened when the capture thread heard the speech start.)
+            keep_going = handle_user_input(user_input)
+        if not keep_going:
+            end_session()
+            break
+
+def traced_turn(user_input, emit=perform_action):
+    """handle_user_input() inside a trace record, for the asyncio pipeline's turn stage."""
+    # A turn the pipeline timed out on may still be running in its thread; wait for it
+    # rather than let two turns change the same memory at once.
+    with local_session.lock:
+        with tracer.turn(mode="pipeline"):
+            return handle_user_input(user_input, emit)
+
+def main_async():
+    """
+    Same assistant, run as an asyncio pipeline: the next command is captured and
+    recognized while the previous one is still being answered, spoken or typed.
+    """
+    start_session()
+    pipeline = Pipeline(capture=next_utterance,
+                        recognize=recognize_utterance,
+                        process=traced_turn,
+                        perform=perform_action)
+    started = time.monotonic()
+    try:
+        asyncio.run(pipeline.run())
+    except KeyboardInterrupt:
+        pass
+    print(f"⏱️ Pipeline: {summarize(pipeline.records, time.monotonic() - started)}")
+    if any(pipeline.errors.values()) or any(pipeline.timeouts.values()):
+        print(f"⚠️ Pipeline items skipped: timeouts {pipeline.timeouts}, errors {pipeline.errors}")
+    if pipeline.exit_requested:
+        end_session()
+
+# --- Startup Profiling ---
+
+def _timed(label, action, results):
+    started = time.perf_counter()
+    try:
+        action()
+        results.append((label, time.perf_counter() - started, ""))
+    except Exception as e:
+        results.append((label, time.perf_counter() - started, f"failed: {e}"))
+
+def print_startup_profile():
+    """Prints how long module import took and what each deferred import/initialization costs."""
+    print("⏱️ Startup profile")
+    previous = _startup_marks[0][1]
+    for label, at in _startup_marks[1:]:
+        print(f"  {label:<32} {(at - previous) * 1000:8.1f} ms")
+        previous = at
+    print(f"  {'ready to listen':<32} {(previous - _startup_marks[0][1]) * 1000:8.1f} ms total")
+
+    print("Deferred (paid on first use, off the startup path):")
+    results = []
+    for module in ("google.generativeai", "pyautogui", "speech_recognition", "requests"):
+        _timed(f"import {module}", lambda module=module: importlib.import_module(module), results)
+    _timed("create Gemini model", get_model, results)
+    _timed("create recognizer backend", get_recognizer_backend, results)
+    def wait_for_tts():
+        if not speech_queue.ready.wait(timeout=10):
+            raise TimeoutError("TTS engine did not start within 10s")
+        if speech_queue.error is not None:
+            raise speech_queue.error
+    _timed("TTS engine ready", wait_for_tts, results)
+    def look_up_location():
+        service = LocationService(LOCATION_CACHE_FILE, ttl=LOCATION_CACHE_TTL).start()
+        service.wait(timeout=10)
+        print(f"  (location: {service.location}, {service.timezone}"
+              f"{', from cache' if service.from_cache else ''})")
+    _timed("IP location lookup", look_up_location, results)
+    for label, seconds, note in results:
+        print(f"  {label:<32} {seconds * 1000:8.1f} ms {note}")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Gemini voice assistant")
+    parser.add_argument("--async-pipeline", action="store_true",
+                        help="overlap listening, recognition, Gemini and speaking/typing in an asyncio pipeline")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="print an import/initialization time breakdown and exit")
+    parser.add_argument("--prerender-speech", action="store_true",
+                        help="render the fixed phrases into the speech cache and exit")
+    args = parser.parse_args()
+    if args.prerender_speech:
+        if tts_cache is None:
+            sys.exit("The speech cache is turned off (TTS_CACHE=0).")
+        if not speech_queue.ready.wait(timeout=30) or speech_queue.error is not None:
+            sys.exit(f"The TTS engine did not start: {speech_queue.error or 'timed out'}")
+        speech_queue.wait_for_renders()
+        speech_queue.shutdown(timeout=2)
+        tts_cache.save()
+        print(f"🔊 Speech cache: {tts_cache.summary()}")
+        sys.exit(0)
+    if args.profile_startup:
+        print_startup_profile()
+        speech_queue.shutdown(timeout=2)
+        sys.exit(0)
+    if args.async_pipeline:
+        main_async()
+    else:
+        main()
@@ -0,0 +1,239 @@
+# memory_store.py
+import copy
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def initial_memory():
+    """A fresh conversation memory with every expected key."""
+    return {
+        "accumulated_user_input": [],
+        "last_gemini_question": None,
+        "last_question_kind": None, # prefix of that question: LOCATION_NEEDED: or CLARIFICATION_NEEDED:
+        "needs_clarification": False,
+        "user_defined_location": None,
+        "last_retrieved_ip_location": None
+    }
+
+
+def write_json_atomically(path, data, indent=4):
+    """Writes JSON via a temp file + fsync + rename, so readers see either the old or the new file."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=indent)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class MemoryStore:
+    """
+    Write-behind persistence for conversation memory.
+
+    save() only snapshots the state and returns; a background thread coalesces
+    saves that arrive within `flush_delay` seconds into one write. Snapshots are
+    written atomically (temp file + rename), so a crash mid-write can no longer
+    corrupt the file.
+
+    With `journal=True`, each write appends a compact delta (only the keys that
+    changed) to `<path>.journal` instead of rewriting the file, and the journal is
+    folded back into the snapshot every `compact_every` deltas.
+
+    Pass a `writer` (MemoryWriter) to share one background thread between many stores;
+    otherwise the store starts its own.
+    """
+
+    def __init__(self, path, journal=False, flush_delay=0.2, compact_every=50, writer=None):
+        self.path = path
+        self.journal_path = f"{path}.journal"
+        self.journal = journal
+        self.flush_delay = flush_delay
+        self.compact_every = compact_every
+        self._pending = None          # newest unsaved snapshot
+        self._written = None          # state as it is on disk (snapshot + journal)
+        self._journal_entries = 0
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock() # one write at a time, whichever thread does it
+        self._wake = threading.Condition(self._lock)
+        self._idle = threading.Event()
+        self._idle.set()
+        self._closed = False
+        self.stats = {"saves": 0, "writes": 0, "journal_appends": 0, "compactions": 0, "bytes": 0}
+        self._writer = writer
+        self._thread = None
+        if writer is None:
+            self._thread = threading.Thread(target=self._run, name="memory-writer", daemon=True)
+            self._thread.start()
+
+    # --- Loading ---
+
+    def load(self):
+        """
+        Loads the memory (snapshot plus any journal deltas), adding missing keys with
+        their defaults. A corrupted snapshot is reset; a torn last journal line is ignored.
+        """
+        memory = initial_memory()
+        if not os.path.exists(self.path):
+            write_json_atomically(self.path, memory)
+        else:
+            try:
+                with open(self.path, 'r') as f:
+                    memory.update(json.load(f))
+            except json.JSONDecodeError:
+                print(f"Warning: Corrupted {self.path}. Resetting memory.")
+                memory = initial_memory()
+                write_json_atomically(self.path, memory)
+                self._discard_journal()
+
+        self._journal_entries = 0
+        if os.path.exists(self.journal_path):
+            valid_bytes = 0
+            with open(self.journal_path, 'rb') as f:
+                for line in f:
+                    try:
+                        memory.update(json.loads(line)["set"])
+                    except (json.JSONDecodeError, UnicodeDecodeError, KeyError, TypeError):
+                        break # A crash mid-append leaves at most one partial line at the end
+                    valid_bytes += len(line)
+                    self._journal_entries += 1
+            if valid_bytes < os.path.getsize(self.journal_path):
+                # Cut off the torn tail so new deltas are not appended after it
+                with open(self.journal_path, 'r+b') as f:
+                    f.truncate(valid_bytes)
+
+        with self._lock:
+            self._written = copy.deepcopy(memory)
+        return memory
+
+    # --- Saving ---
+
+    def save(self, data):
+        """Schedules `data` to be written. Returns immediately."""
+        snapshot = copy.deepcopy(data)
+        with self._lock:
+            self._pending = snapshot
+            self.stats["saves"] += 1
+            self._idle.clear()
+            self._wake.notify()
+        if self._writer is not None:
+            self._writer.schedule(self)
+
+    def flush(self, timeout=None):
+        """Blocks until every save so far is on disk."""
+        return self._idle.wait(timeout)
+
+    def close(self, timeout=5.0):
+        """Writes anything pending and stops the writer thread (a shared writer keeps running)."""
+        with self._lock:
+            self._closed = True
+            self._wake.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        else:
+            self._write_pending()
+
+    def _discard_journal(self):
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self._journal_entries = 0
+
+    def _write_snapshot(self, state):
+        write_json_atomically(self.path, state)
+        self._discard_journal()
+        self.stats["writes"] += 1
+        self.stats["bytes"] += os.path.getsize(self.path)
+
+    def _append_delta(self, state, previous):
+        changed = {key: value for key, value in state.items() if previous.get(key, object()) != value}
+        if not changed:
+            return
+        line = json.dumps({"t": round(time.time(), 3), "set": changed}, separators=(",", ":")) + "\n"
+        with open(self.journal_path, 'a') as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        self._journal_entries += 1
+        self.stats["journal_appends"] += 1
+        self.stats["bytes"] += len(line)
+        if self._journal_entries >= self.compact_every:
+            self._write_snapshot(state)
+            self.stats["compactions"] += 1
+
+    def _write_pending(self):
+        """Writes the newest unsaved snapshot, if there is one."""
+        with self._write_lock:
+            with self._lock:
+                state, self._pending = self._pending, None
+                previous = self._written
+            if state is not None:
+                try:
+                    if self.journal and previous is not None:
+                        self._append_delta(state, previous)
+                    else:
+                        self._write_snapshot(state)
+                    with self._lock:
+                        self._written = state
+                except OSError as e:
+                    print(f"❌ Could not save conversation memory: {e}")
+            with self._lock:
+                if self._pending is None:
+                    self._idle.set()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while self._pending is None and not self._closed:
+                    self._wake.wait()
+                if self._pending is None and self._closed:
+                    break
+            if not self._closed:
+                time.sleep(self.flush_delay) # let saves from the same turn pile up into one write
+            self._write_pending()
+        self._idle.set()
+
+
+class MemoryWriter:
+    """
+    One write-behind thread for many MemoryStores (e.g. one per server session), instead of
+    a thread per store. Stores saved within `flush_delay` seconds of each other are written
+    in one pass, each with only its newest snapshot.
+    """
+
+    def __init__(self, flush_delay=0.2):
+        self.flush_delay = flush_delay
+        self._dirty = OrderedDict()   # store -> None, in the order they were first saved
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="memory-writer", daemon=True)
+        self._thread.start()
+
+    def schedule(self, store):
+        with self._lock:
+            self._dirty[store] = None
+            self._wake.notify()
+
+    def close(self, timeout=5.0):
+        """Writes everything scheduled so far and stops the thread."""
+        with self._lock:
+            self._closed = True
+            self._wake.notify()
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._dirty and not self._closed:
+                    self._wake.wait()
+                if not self._dirty and self._closed:
+                    break
+            if not self._closed:
+                time.sleep(self.flush_delay)
+            with self._lock:
+                stores = list(self._dirty)
+                self._dirty.clear()
+            for store in stores:
+                store._write_pending()
@@ -0,0 +1,203 @@
+# pipeline.py
+import asyncio
+import concurrent.futures
+import functools
+import statistics
+import time
+
+# --- Asyncio Turn Pipeline ---
+# capture -> [utterances] -> asr -> [texts] -> turn -> [actions] -> output
+#
+# Each stage is a coroutine connected to the next by a bounded asyncio.Queue, so the
+# assistant can listen for the next command while it is still recognizing, thinking
+# about or typing the previous one, and a full queue pushes back on the stage before it.
+# The blocking libraries (speech_recognition, the Gemini client, pyttsx3, pyautogui)
+# run in a thread pool; each call is bounded by its stage timeout.
+
+END_OF_INPUT = object()   # returned by a capture function when there is nothing left to hear
+_END = object()           # passed down the queues to shut the stages down in order
+_TURN_DONE = "turn_done"  # output-queue marker: every action of this turn has been queued
+
+
+class TurnRecord:
+    """Timestamps (time.monotonic) of one utterance as it moves through the stages."""
+
+    def __init__(self, captured_at):
+        self.captured_at = captured_at
+        self.text = None
+        self.recognized_at = None
+        self.processed_at = None
+        self.first_output_at = None
+        self.finished_at = None
+
+    @property
+    def latency(self):
+        """Seconds from the end of the utterance to the end of the last output."""
+        return self.finished_at - self.captured_at
+
+
+class Pipeline:
+    """
+    Runs the assistant's turn loop as overlapping asyncio stages.
+
+    - capture(): blocks until the next utterance; returns None if nothing was heard
+      (keep listening) or END_OF_INPUT to stop.
+    - recognize(utterance): returns text, or None if it was not understood.
+    - process(text, emit): runs a turn, calling emit(kind, text, **options) for each
+      output; returns False when the user asked to exit.
+    - perform(kind, text, **options): speaks or types one output.
+    - on_speech(text): optional, called as soon as new speech is recognized (barge-in).
+
+    A stage call that exceeds its timeout is abandoned (the worker thread cannot be
+    killed, but its result is ignored) and the pipeline moves on to the next item; so
+    does a call that raises. process() must itself wait for an abandoned turn that is
+    still running if they share state. If a stage itself fails, the stages after it
+    still shut down.
+    """
+
+    def __init__(self, capture, recognize, process, perform, on_speech=None, queue_size=2,
+                 asr_timeout=15.0, turn_timeout=60.0, output_timeout=120.0, max_workers=6):
+        self.capture = capture
+        self.recognize = recognize
+        self.process = process
+        self.perform = perform
+        self.on_speech = on_speech
+        self.queue_size = queue_size
+        self.asr_timeout = asr_timeout
+        self.turn_timeout = turn_timeout
+        self.output_timeout = output_timeout
+        self.max_workers = max_workers
+        self.records = []
+        self.exit_requested = False
+        self.timeouts = {"asr": 0, "turn": 0, "output": 0}
+        self.errors = {"capture": 0, "asr": 0, "turn": 0, "output": 0}
+
+    async def _blocking(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def _bounded(self, stage, timeout, func, *args, **kwargs):
+        """Runs a blocking call in the pool; returns (ok, result)."""
+        try:
+            return True, await asyncio.wait_for(self._blocking(func, *args, **kwargs), timeout)
+        except asyncio.TimeoutError:
+            self.timeouts[stage] += 1
+            print(f"⏱️ The {stage} stage took longer than {timeout:.0f}s; skipping this item.")
+            return False, None
+        except Exception as e:
+            self.errors[stage] += 1
+            print(f"❌ The {stage} stage failed: {e}; skipping this item.")
+            return False, None
+
+    def _stage_failed(self, stage, error):
+        # Cancellation (a BaseException) is not caught here: run() cancels the upstream
+        # stages once output has finished, and nothing downstream is waiting for them then.
+        self.errors[stage] += 1
+        print(f"❌ The {stage} stage stopped: {error}")
+
+    # --- Stages ---
+
+    async def _capture_stage(self, utterances):
+        try:
+            while not self.exit_requested:
+                utterance = await self._blocking(self.capture)
+                if utterance is END_OF_INPUT:
+                    break
+                if utterance is not None:
+                    # Latency counts from when the user stopped talking, which may be before capture() returned.
+                    ended_at = getattr(utterance, "ended_at", None) or time.monotonic()
+                    await utterances.put((TurnRecord(ended_at), utterance))
+        except Exception as e:
+            self._stage_failed("capture", e)
+        await utterances.put(_END)
+
+    async def _asr_stage(self, utterances, texts):
+        try:
+            while True:
+                item = await utterances.get()
+                if item is _END:
+                    break
+                turn, utterance = item
+                ok, text = await self._bounded("asr", self.asr_timeout, self.recognize, utterance)
+                if not ok or not text:
+                    continue
+                turn.text = text
+                turn.recognized_at = time.monotonic()
+                if self.on_speech:
+                    self.on_speech(text)
+                await texts.put(turn)
+        except Exception as e:
+            self._stage_failed("asr", e)
+        await texts.put(_END)
+
+    async def _turn_stage(self, texts, actions):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                turn = await texts.get()
+                if turn is _END:
+                    break
+
+                def emit(kind, text, _turn=turn, **options):
+                    # Called from the worker thread; blocks it while the output queue is full.
+                    asyncio.run_coroutine_threadsafe(actions.put((_turn, kind, text, options)), loop).result()
+
+                ok, keep_going = await self._bounded("turn", self.turn_timeout, self.process, turn.text, emit)
+                turn.processed_at = time.monotonic()
+                await actions.put((turn, _TURN_DONE, None, None))
+                if ok and keep_going is False:
+                    self.exit_requested = True
+                    break
+        except Exception as e:
+            self._stage_failed("turn", e)
+        await actions.put(_END)
+
+    async def _output_stage(self, actions):
+        while True:
+            item = await actions.get()
+            if item is _END:
+                break
+            turn, kind, text, options = item
+            if kind == _TURN_DONE:
+                turn.finished_at = time.monotonic()
+                self.records.append(turn)
+                continue
+            if turn.first_output_at is None:
+                turn.first_output_at = time.monotonic()
+            await self._bounded("output", self.output_timeout, self.perform, kind, text, **options)
+
+    # --- Running ---
+
+    async def run(self):
+        """Runs until capture reports END_OF_INPUT or a turn asks to exit. Returns the TurnRecords."""
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers,
+                                                               thread_name_prefix="pipeline")
+        utterances = asyncio.Queue(self.queue_size)
+        texts = asyncio.Queue(self.queue_size)
+        actions = asyncio.Queue(self.queue_size * 4)
+        upstream = [
+            asyncio.create_task(self._capture_stage(utterances)),
+            asyncio.create_task(self._asr_stage(utterances, texts)),
+            asyncio.create_task(self._turn_stage(texts, actions)),
+        ]
+        try:
+            await self._output_stage(actions)
+        finally:
+            for task in upstream:
+                task.cancel()
+            await asyncio.gather(*upstream, return_exceptions=True)
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        return self.records
+
+
+def summarize(records, elapsed):
+    """Turn latency percentiles, per-stage means and throughput for a finished run."""
+    if not records:
+        return "no completed turns"
+    latencies = sorted(record.latency for record in records)
+    p95 = latencies[max(0, int(round(len(latencies) * 0.95)) - 1)]
+    asr = statistics.mean(r.recognized_at - r.captured_at for r in records)
+    turn = statistics.mean(r.processed_at - r.recognized_at for r in records)
+    return (f"{len(records)} turns in {elapsed:.2f}s ({len(records) / elapsed:.2f} turns/s); "
+            f"latency p50 {statistics.median(latencies) * 1000:.0f} ms, p95 {p95 * 1000:.0f} ms; "
+            f"mean asr {asr * 1000:.0f} ms, turn {turn * 1000:.0f} ms")
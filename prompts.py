@@ -0,0 +1,142 @@
+# prompts.py
+import threading
+
+from streaming import CLARIFICATION_PREFIX
+
+# --- Static System Instruction ---
+# Built once and handed to the model as its system instruction, instead of being
+# pasted in front of every user command.
+SYSTEM_INSTRUCTION = "\n".join([
+    "Your goal is to understand and execute commands. You can perform mathematical calculations.",
+    "You DO NOT have access to real-time information such as current weather, live news updates, real-time stock prices, or specific events happening right now. If the user asks for such information, respond with 'I do not have access to real-time information for that.' or 'I can't provide live updates for that.'",
+    "You can either SPEAK a response or WRITE a response. You MUST use one of the following prefixes for your final output:",
+    "- If the user asks you to write something, generate the text and prepend it with 'WRITE_RESPONSE:' (e.g., 'WRITE_RESPONSE:This is the text I will type for you.'). After typing, the conversation turn ends.",
+    "- If the user asks you a question for which you have an answer, generate the answer and prepend it with 'SPEAK_RESPONSE:' (e.g., 'SPEAK_RESPONSE:The capital of France is Paris.').",
+    "- If the user asks for a calculation, extract ONLY the mathematical expression (e.g., '5 + 3', '10 * (2 + 3)', '8 / 4'). Do not include any text, just the expression. You MUST prepend this expression with 'CALCULATE:'. If the calculation expression is ambiguous or missing numbers/operators, use 'CLARIFICATION_NEEDED:' instead.",
+    "- If a command is incomplete or ambiguous (and not a calculation), you MUST respond by starting your reply with 'CLARIFICATION_NEEDED:' followed by the specific question you need answered to complete the command. Do not give a final answer if you need more information.",
+    "- If a question requires location information (e.g., current time, nearby places) AND the user's provided location or IP-based location is insufficient or missing for the query, you MUST ask the user for their specific location by starting your question with 'LOCATION_NEEDED:'. Once the user provides it, remember it for the current session.",
+    "Consider the following as a continuous conversation.",
+    "IMPORTANT: Always choose between SPEAK_RESPONSE, WRITE_RESPONSE, CALCULATE, CLARIFICATION_NEEDED, or LOCATION_NEEDED for your direct response based on user intent. Ensure any numerical expressions or text meant for writing uses standard symbols (e.g., *, @, +, /, #).",
+])
+
+# --- Per-Turn Messages ---
+
+
+def build_turn_context(current_time, ip_location, user_location=None):
+    """The only prompt text that changes from turn to turn: time and location, tersely."""
+    parts = [f"Time: {current_time}", f"Location (from IP): {ip_location}"]
+    if user_location:
+        parts.append(f"User's stated location: {user_location}")
+    return "\n".join(parts)
+
+
+def build_command_message(context, command):
+    """Message that starts a new command."""
+    return f"{context}\n\nUser command: {command}"
+
+
+def build_clarification_message(context, answer):
+    """Message answering Gemini's last clarifying question; earlier turns are already in the chat."""
+    return f"{context}\n\nUser (clarification): {answer}"
+
+
+def seed_clarification_history(accumulated_user_input, last_gemini_question, question_kind=CLARIFICATION_PREFIX):
+    """
+    Rebuilds a chat history from saved memory, for when a clarification chain outlives
+    its chat session (e.g. after a restart). `question_kind` is the prefix Gemini used
+    for its question (LOCATION_NEEDED: or CLARIFICATION_NEEDED:).
+    """
+    user_text = "\n".join(f"User (part {i+1}): {prev}" for i, prev in enumerate(accumulated_user_input))
+    history = [{"role": "user", "parts": [user_text]}]
+    if last_gemini_question:
+        history.append({"role": "model", "parts": [f"{question_kind or CLARIFICATION_PREFIX}{last_gemini_question}"]})
+    return history
+
+
+def history_texts(history):
+    """The text parts of a chat history: dicts as passed to start_chat(), or the SDK's Content objects."""
+    for entry in history:
+        parts = entry["parts"] if isinstance(entry, dict) else entry.parts
+        for part in parts:
+            yield part if isinstance(part, str) else getattr(part, "text", "")
+
+
+def words_only_history(history, words):
+    """
+    `history` as plain dicts (as start_chat() takes them) with its last user message
+    replaced by `words`, the user's words alone. Only the newest message needs the
+    time/location context, so earlier turns are kept without it.
+    """
+    entries = [{"role": entry["role"] if isinstance(entry, dict) else entry.role,
+                "parts": list(history_texts([entry]))} for entry in history]
+    for entry in reversed(entries):
+        if entry["role"] == "user":
+            entry["parts"] = [words]
+            break
+    return entries
+
+
+def request_text(message, history=(), system_instruction=SYSTEM_INSTRUCTION):
+    """
+    The text one chat request carries. The Gemini API is stateless, so the SDK sends the
+    system instruction and the whole chat history along with every new message.
+    """
+    return "\n".join([system_instruction, *history_texts(history), message])
+
+
+def build_flat_prompt(current_time, ip_location, user_location, command, accumulated_user_input=(),
+                      last_gemini_question=None):
+    """
+    The single message the assistant sent before it used a system instruction and chat
+    sessions: instructions, context and the stitched clarification chain. PromptMeter's baseline.
+    """
+    parts = [f"Current time is {current_time}.", f"Current approximate location (from IP) is {ip_location}."]
+    if user_location:
+        parts.append(f"User has explicitly set their location as: {user_location}. Use this if relevant.")
+    parts.append(SYSTEM_INSTRUCTION)
+    if not accumulated_user_input:
+        return "\n".join(parts) + f"\n\nUser command: {command}"
+    chain = [f"User (part {i+1}): {prev}" for i, prev in enumerate(accumulated_user_input)]
+    if last_gemini_question:
+        chain.append(f"Assistant: {last_gemini_question}")
+    chain.append(f"User (clarification): {command}")
+    return "\n".join(parts) + "\n\n" + "\n".join(chain)
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token for English)."""
+    return (len(text) + 3) // 4
+
+
+class PromptMeter:
+    """
+    Counts the text sent per Gemini request (request_text(): system instruction, chat
+    history and the new message), next to what the old flat prompt (build_flat_prompt())
+    would have been. Thread-safe.
+    """
+
+    def __init__(self):
+        self.turns = 0
+        self.bytes_sent = 0
+        self.message_bytes = 0
+        self.baseline_bytes = 0
+        self._lock = threading.Lock()
+
+    def record(self, message, history=(), baseline=""):
+        size = len(request_text(message, history).encode("utf-8"))
+        with self._lock:
+            self.turns += 1
+            self.bytes_sent += size
+            self.message_bytes += len(message.encode("utf-8"))
+            self.baseline_bytes += len(baseline.encode("utf-8"))
+        return size
+
+    def summary(self):
+        if not self.turns:
+            return "no Gemini requests"
+        per_turn = self.bytes_sent / self.turns
+        baseline_per_turn = self.baseline_bytes / self.turns
+        change = per_turn / baseline_per_turn - 1 if baseline_per_turn else 0.0
+        return (f"{per_turn:.0f} bytes (~{per_turn / 4:.0f} tokens) sent per request, of which "
+                f"{self.message_bytes / self.turns:.0f} are the new message; the flat prompt was "
+                f"{baseline_per_turn:.0f} bytes ({abs(change):.0%} {'more' if change > 0 else 'less'})")
@@ -0,0 +1,207 @@
+# recognizers.py
+import json
+import os
+import time
+import wave
+
+from audio_capture import Utterance, SAMPLE_WIDTH
+
+# --- Errors ---
+
+
+class RecognitionError(Exception):
+    """Base class for speech recognition failures."""
+
+
+class SpeechNotUnderstood(RecognitionError):
+    """The audio was received but no words could be made out."""
+
+
+class RecognizerUnavailable(RecognitionError):
+    """The backend could not be reached or is not installed/configured."""
+
+
+# --- Backend Interface ---
+
+
+class RecognizerBackend:
+    """
+    Turns captured audio into text.
+
+    Every backend implements recognize() for a finished Utterance. Backends with
+    `supports_partials = True` also return a live stream from open_stream() that accepts
+    audio while the user is still talking and reports partial hypotheses as it goes.
+    """
+
+    name = "base"
+    supports_partials = False
+
+    def recognize(self, utterance):
+        """Returns the transcript of a finished Utterance or raises a RecognitionError."""
+        raise NotImplementedError
+
+    def open_stream(self, sample_rate, on_partial=None):
+        """Starts recognizing an utterance that is still being spoken."""
+        return _BufferedStream(self, sample_rate)
+
+
+class _BufferedStream:
+    """Fallback stream for batch-only backends: collects audio, recognizes it at the end."""
+
+    def __init__(self, backend, sample_rate):
+        self._backend = backend
+        self._sample_rate = sample_rate
+        self._chunks = []
+
+    def feed(self, pcm):
+        self._chunks.append(pcm)
+
+    def result(self):
+        now = time.monotonic()
+        return self._backend.recognize(Utterance(b"".join(self._chunks), self._sample_rate, now, now))
+
+
+class GoogleBackend(RecognizerBackend):
+    """Google Web Speech API via speech_recognition (needs a network round trip per utterance)."""
+
+    name = "google"
+
+    def __init__(self, language="en-US"):
+        try:
+            import speech_recognition as sr
+        except ImportError:
+            raise RecognizerUnavailable("The Google recognizer needs the 'SpeechRecognition' package.")
+        self._sr = sr
+        self._recognizer = sr.Recognizer()
+        self.language = language
+
+    def recognize(self, utterance):
+        try:
+            return self._recognizer.recognize_google(utterance.to_audio_data(), language=self.language)
+        except self._sr.UnknownValueError:
+            raise SpeechNotUnderstood("Google could not understand the audio.")
+        except self._sr.RequestError as e:
+            raise RecognizerUnavailable(str(e))
+
+
+class VoskBackend(RecognizerBackend):
+    """
+    Offline CPU recognition with Vosk (https://alphacephei.com/vosk/models).
+    Runs fully locally and emits partial hypotheses while the user is still talking.
+    """
+
+    name = "vosk"
+    supports_partials = True
+
+    def __init__(self, model_path):
+        try:
+            import vosk
+        except ImportError:
+            raise RecognizerUnavailable("The offline recognizer needs the 'vosk' package (pip install vosk).")
+        if not os.path.isdir(model_path):
+            raise RecognizerUnavailable(f"Vosk model not found at {model_path}. Set VOSK_MODEL_PATH.")
+        vosk.SetLogLevel(-1)
+        self._vosk = vosk
+        self._model = vosk.Model(model_path)
+
+    def open_stream(self, sample_rate, on_partial=None):
+        return _VoskStream(self._vosk.KaldiRecognizer(self._model, sample_rate), on_partial)
+
+    def recognize(self, utterance):
+        stream = self.open_stream(utterance.sample_rate)
+        stream.feed(utterance.pcm)
+        return stream.result()
+
+
+class _VoskStream:
+    def __init__(self, kaldi_recognizer, on_partial):
+        self._recognizer = kaldi_recognizer
+        self._on_partial = on_partial
+        self._segments = []   # text of segments Vosk has already finalized
+        self._last_partial = ""
+
+    def feed(self, pcm):
+        if self._recognizer.AcceptWaveform(pcm):
+            segment = json.loads(self._recognizer.Result()).get("text", "")
+            if segment:
+                self._segments.append(segment)
+            partial = ""
+        else:
+            partial = json.loads(self._recognizer.PartialResult()).get("partial", "")
+        hypothesis = " ".join(self._segments + [partial]).strip()
+        if self._on_partial and hypothesis and hypothesis != self._last_partial:
+            self._last_partial = hypothesis
+            self._on_partial(hypothesis)
+
+    def result(self):
+        final = json.loads(self._recognizer.FinalResult()).get("text", "")
+        text = " ".join(self._segments + [final]).strip()
+        if not text:
+            raise SpeechNotUnderstood("No words recognized.")
+        return text
+
+
+def create_backend(name=None):
+    """Builds the backend named by `name` (or the RECOGNIZER env var): 'google' or 'vosk'."""
+    name = (name or os.getenv("RECOGNIZER", "google")).lower()
+    if name == "google":
+        return GoogleBackend()
+    if name == "vosk":
+        return VoskBackend(os.getenv("VOSK_MODEL_PATH", "models/vosk-model-small-en-us"))
+    raise ValueError(f"Unknown recognizer backend: {name}")
+
+
+# --- Wiring Into Audio Capture ---
+
+
+class LiveTranscriber:
+    """
+    Connects AudioCapture callbacks to a streaming backend: a stream is opened when
+    speech starts, fed every frame, and finalized as the utterance ends, so the
+    transcript is usually ready the moment the utterance is queued.
+    """
+
+    def __init__(self, backend, sample_rate, on_partial=None):
+        self.backend = backend
+        self.sample_rate = sample_rate
+        self.on_partial = on_partial
+        self._stream = None
+
+    def on_speech_start(self):
+        self._stream = self.backend.open_stream(self.sample_rate, self.on_partial)
+
+    def on_frame(self, frame):
+        if self._stream is not None:
+            self._stream.feed(frame)
+
+    def on_speech_end(self, utterance):
+        stream, self._stream = self._stream, None
+        if stream is None:
+            return
+        try:
+            utterance.transcript = stream.result()
+        except RecognitionError as e:
+            utterance.recognition_error = e
+
+
+def transcribe(backend, utterance):
+    """Returns the utterance's text, reusing a transcript produced while it was being spoken."""
+    if utterance.recognition_error is not None:
+        raise utterance.recognition_error
+    if utterance.transcript is not None:
+        return utterance.transcript
+    return backend.recognize(utterance)
+
+
+def load_wav_utterance(path):
+    """Loads a 16-bit mono WAV file (a path or a binary file object, e.g. an upload) as an Utterance."""
+    with wave.open(path, 'rb') as wav:
+        if wav.getsampwidth() != SAMPLE_WIDTH or wav.getnchannels() != 1:
+            raise ValueError(f"{path if isinstance(path, str) else 'The audio'} must be 16-bit mono PCM.")
+        pcm = wav.readframes(wav.getnframes())
+        return Utterance(pcm, wav.getframerate(), 0.0, 0.0)
+
+
+def recognize_wav_file(backend, path):
+    """Runs a WAV fixture through a backend exactly as live audio would be."""
+    return backend.recognize(load_wav_utterance(path))
@@ -0,0 +1,163 @@
+# response_cache.py
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from streaming import CLARIFICATION_PREFIX, LOCATION_PREFIX, CALCULATE_PREFIX, SPEAK_PREFIX, WRITE_PREFIX
+
+# --- Gemini Response Cache ---
+
+# Seconds a response stays valid, by prefix. 0 means never cache. Replies without a
+# recognised prefix (including the "Error: ..." strings) are never cached either.
+DEFAULT_TTLS = {
+    CALCULATE_PREFIX: 30 * 24 * 3600,  # an expression extracted from a command does not change
+    WRITE_PREFIX: 7 * 24 * 3600,       # signatures, stock phrases
+    SPEAK_PREFIX: 3600,                # factual answers; short enough to pick up model updates
+    CLARIFICATION_PREFIX: 0,           # part of a live conversation
+    LOCATION_PREFIX: 0,
+}
+
+# Commands whose answer depends on when they are asked are never cached.
+_TIME_SENSITIVE = re.compile(
+    r"\b(?:time|date|today|tonight|tomorrow|yesterday|now|current(?:ly)?|latest|recent|news|weather|"
+    r"this (?:week|month|year)|day is it|clock|o'clock)\b"
+)
+
+
+def normalize_command(command):
+    """Case- and whitespace-insensitive form of a (preprocessed) user command."""
+    return " ".join(command.lower().split()).rstrip(" ?.!")
+
+
+def is_time_sensitive(command):
+    return bool(_TIME_SENSITIVE.search(command.lower()))
+
+
+class ResponseCache:
+    """
+    LRU cache of Gemini replies keyed on the normalized command plus the context that
+    changes what Gemini would answer (location, clarification chain) - but not the
+    current time, which would make every key unique.
+
+    Thread-safe. Pass `path` to keep the cache across restarts.
+    """
+
+    def __init__(self, max_entries=256, ttls=None, path=None, save_every=10):
+        self.max_entries = max_entries
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.path = path
+        self.save_every = save_every
+        self._entries = OrderedDict()   # key -> (expires_at wall-clock seconds, response)
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock() # one writer of the temp file at a time
+        self._unsaved = 0
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "skipped": 0, "evictions": 0, "expired": 0}
+        if path:
+            self._load()
+
+    @staticmethod
+    def make_key(command, location=None, user_location=None, clarification=None):
+        """
+        Builds the cache key. `clarification` is the (previous inputs, last question)
+        chain while Gemini is waiting for an answer, otherwise None.
+        """
+        return json.dumps([normalize_command(command), location, user_location, clarification],
+                          separators=(",", ":"))
+
+    def ttl_for(self, response):
+        for prefix, ttl in self.ttls.items():
+            if response.startswith(prefix):
+                return ttl
+        return 0
+
+    def get(self, key):
+        """Returns the cached response or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            expires_at, response = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return response
+
+    def put(self, key, response, command=""):
+        """
+        Stores a response unless its prefix or the command make it unsafe to reuse. Pass
+        every input of a clarification chain as `command`, not just the last answer.
+        """
+        ttl = self.ttl_for(response)
+        if ttl <= 0 or is_time_sensitive(command):
+            with self._lock:
+                self.stats["skipped"] += 1
+            return False
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+            self.stats["stores"] += 1
+            self._unsaved += 1
+            should_save = self.path and self._unsaved >= self.save_every
+        if should_save:
+            self.save()
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._unsaved += 1
+
+    def hit_rate(self):
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def summary(self):
+        return (f"{self.stats['hits']} hits / {self.stats['misses']} misses ({self.hit_rate():.0%}), "
+                f"{len(self._entries)} entries, {self.stats['evictions']} evicted")
+
+    # --- Persistence ---
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r') as f:
+                stored = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Warning: Could not read response cache {self.path}: {e}. Starting empty.")
+            return
+        now = time.time()
+        for key, expires_at, response in stored.get("entries", []):
+            if expires_at > now:
+                self._entries[key] = (expires_at, response)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def save(self):
+        """Writes the cache to `path` (temp file + rename, so a crash never leaves it half-written)."""
+        if not self.path:
+            return
+        # put() calls this from whichever session's turn filled the batch (server.py), so
+        # saves are serialized: the snapshot taken last is also the one written last.
+        with self._save_lock:
+            with self._lock:
+                entries = [[key, expires_at, response] for key, (expires_at, response) in self._entries.items()]
+                self._unsaved = 0
+            tmp_path = self.path + ".tmp"
+            try:
+                with open(tmp_path, 'w') as f:
+                    json.dump({"entries": entries}, f)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                print(f"Warning: Could not save response cache {self.path}: {e}")
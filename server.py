@@ -0,0 +1,299 @@
+# server.py
+import argparse
+import io
+import json
+import os
+import sys
+import threading
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytz
+
+import main as assistant
+from gazetteer import resolve_timezone
+from location import DEFAULT_LOCATION
+from recognizers import load_wav_utterance, transcribe, SpeechNotUnderstood, RecognizerUnavailable
+from sessions import SessionManager
+
+# --- Multi-Session HTTP Server ---
+# Serves the assistant's turn logic (main.handle_user_input) to many users at once over HTTP.
+# Every session has its own memory - clarification chain, stated and IP-based location - and
+# its own Gemini chat. The Gemini model and client (thread pool, rate limiter, circuit
+# breaker), the response cache and the tracer are shared by all sessions. Turns of one
+# session run one at a time; different sessions run in parallel.
+#
+#   POST   /sessions                 {"location": "Pune, MH, IN", "timezone": "Asia/Kolkata"} (both optional)
+#   POST   /sessions/<id>/text       {"text": "what is twelve times seven"}
+#   POST   /sessions/<id>/audio      16-bit mono WAV body
+#   GET    /sessions/<id>            the session's memory
+#   DELETE /sessions/<id>
+#   GET    /health                   session and Gemini client counters
+#   GET    /metrics                  stage latencies in the Prometheus format
+#
+# A turn answers {"session", "heard", "actions": [{"action": "speak"|"write", "text"}],
+# "needs_clarification", "ended"}; speaking and typing are up to the client.
+# There is no authentication: bind to localhost (the default) or put it behind a proxy.
+
+MAX_BODY_BYTES = 10 * 1024 * 1024
+
+
+class RequestError(Exception):
+    """Ends a request with an HTTP error status and a JSON {"error": message} body."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256 # the default backlog of 5 resets connections when many clients connect at once
+
+
+class AssistantServer:
+    """
+    Runs turns for the sessions in `sessions` (a SessionManager) behind a ThreadingHTTPServer.
+    Call serve_forever() or start() (background thread), then close().
+    """
+
+    def __init__(self, sessions, host="127.0.0.1", port=8765, log_requests=False):
+        self.sessions = sessions
+        self.log_requests = log_requests
+        self.httpd = _HTTPServer((host, port), _make_handler(self))
+        self._thread = None
+
+    @property
+    def address(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    # --- Sessions ---
+
+    def open_session(self, payload):
+        location, timezone = payload.get("location"), payload.get("timezone")
+        if timezone:
+            try:
+                assistant.get_tzinfo(timezone)
+            except pytz.exceptions.UnknownTimeZoneError:
+                raise RequestError(400, f"Unknown timezone: {timezone}")
+        try:
+            session = self.sessions.create(payload.get("id"))
+        except ValueError as e:
+            raise RequestError(400, str(e))
+        if session is None:
+            raise RequestError(503, "Too many active sessions; try again later.")
+        if location or timezone:
+            session.set_location(location or DEFAULT_LOCATION[0],
+                                 timezone or resolve_timezone(location) or DEFAULT_LOCATION[1])
+        elif session.memory["last_retrieved_ip_location"] is None:
+            session.set_location(*DEFAULT_LOCATION)
+        return session
+
+    def find_session(self, session_id):
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise RequestError(404, f"No active session {session_id!r} (it may have been evicted after being idle).")
+        return session
+
+    def describe_session(self, session):
+        return {"session": session.id, "timezone": session.ip_timezone, "turns": session.turns,
+                "memory": session.memory}
+
+    # --- Turns ---
+
+    def _recognize(self, audio):
+        try:
+            utterance = load_wav_utterance(io.BytesIO(audio))
+        except (wave.Error, EOFError, ValueError) as e:
+            raise RequestError(400, f"Expected a 16-bit mono WAV body: {e}")
+        backend = assistant.get_recognizer_backend()
+        try:
+            with assistant.tracer.span("asr", backend=backend.name):
+                return transcribe(backend, utterance)
+        except SpeechNotUnderstood:
+            raise RequestError(422, "Could not understand the audio.")
+        except RecognizerUnavailable as e:
+            raise RequestError(503, f"The {backend.name} speech recognizer is unavailable: {e}")
+
+    def run_turn(self, session_id, text=None, audio=None):
+        """Runs one turn (recognizing `audio` first, if given) and returns the response document."""
+        actions = []
+
+        def collect(kind, text, priority=None):
+            actions.append({"action": kind, "text": text})
+
+        # hold() keeps the idle sweeper from closing the session between the lookup and the turn.
+        with self.sessions.hold(session_id) as session:
+            if session is None:
+                raise RequestError(404, f"No active session {session_id!r} (it may have been evicted after being idle).")
+            with assistant.tracer.turn(mode="server", session=session.id):
+                if audio is not None:
+                    text = self._recognize(audio)
+                keep_going = assistant.handle_user_input(text, emit=collect, session=session)
+            session.turns += 1
+            session.touch()
+        if not keep_going:
+            collect(assistant.ACTION_SPEAK, assistant.GOODBYE)
+            self.sessions.end(session.id)
+        return {"session": session.id, "heard": text, "actions": actions,
+                "needs_clarification": session.memory["needs_clarification"], "ended": not keep_going}
+
+    def health(self):
+        return {"sessions": len(self.sessions), "session_stats": self.sessions.stats,
+                "gemini": dict(assistant.gemini_client.stats, circuit=assistant.gemini_client.breaker.state),
+                "response_cache": assistant.response_cache.summary()}
+
+    # --- Lifecycle ---
+
+    def serve_forever(self):
+        self.httpd.serve_forever()
+
+    def start(self):
+        """Serves from a daemon thread and returns self."""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="assistant-http", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.sessions.close()
+
+
+def _make_handler(server):
+    class AssistantHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1" # keep-alive, so clients can reuse one connection per session
+
+        def _send_json(self, status, document=None):
+            body = b"" if document is None else json.dumps(document).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            if status >= 400:
+                # The request body may not have been read; do not reuse the connection.
+                self.send_header("Connection", "close")
+                self.close_connection = True
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _read_body(self):
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+            except ValueError:
+                raise RequestError(400, "Invalid Content-Length.")
+            if length > MAX_BODY_BYTES:
+                raise RequestError(413, f"Request body over {MAX_BODY_BYTES} bytes.")
+            return self.rfile.read(length) if length else b""
+
+        def _read_json(self):
+            body = self._read_body()
+            if not body:
+                return {}
+            try:
+                payload = json.loads(body)
+            except (json.JSONDecodeError, UnicodeDecodeError) as e:
+                raise RequestError(400, f"Invalid JSON: {e}")
+            if not isinstance(payload, dict):
+                raise RequestError(400, "Expected a JSON object.")
+            return payload
+
+        def _route(self):
+            parts = [part for part in self.path.split("?")[0].split("/") if part]
+            return parts[0] if parts else "", parts[1:]
+
+        def _handle(self, method):
+            try:
+                resource, rest = self._route()
+                if method == "GET" and resource == "health" and not rest:
+                    self._send_json(200, server.health())
+                elif method == "GET" and resource == "metrics" and not rest:
+                    body = assistant.tracer.render_prometheus().encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                elif resource != "sessions":
+                    raise RequestError(404, f"Unknown path {self.path}")
+                elif method == "POST" and not rest:
+                    self._send_json(201, server.describe_session(server.open_session(self._read_json())))
+                elif method == "GET" and len(rest) == 1:
+                    self._send_json(200, server.describe_session(server.find_session(rest[0])))
+                elif method == "DELETE" and len(rest) == 1:
+                    if not server.sessions.end(rest[0]):
+                        raise RequestError(404, f"No active session {rest[0]!r}.")
+                    self._send_json(204)
+                elif method == "POST" and len(rest) == 2 and rest[1] == "text":
+                    text = self._read_json().get("text")
+                    if not isinstance(text, str) or not text.strip():
+                        raise RequestError(400, 'Expected {"text": "..."}.')
+                    self._send_json(200, server.run_turn(rest[0], text=text.strip()))
+                elif method == "POST" and len(rest) == 2 and rest[1] == "audio":
+                    audio = self._read_body()
+                    self._send_json(200, server.run_turn(rest[0], audio=audio))
+                else:
+                    raise RequestError(404, f"{method} {self.path} is not supported.")
+            except RequestError as e:
+                self._send_json(e.status, {"error": str(e)})
+            except Exception as e:
+                print(f"❌ Error handling {method} {self.path}: {e}")
+                self._send_json(500, {"error": "Internal error."})
+
+        def do_GET(self):
+            self._handle("GET")
+
+        def do_POST(self):
+            self._handle("POST")
+
+        def do_DELETE(self):
+            self._handle("DELETE")
+
+        def log_message(self, format, *args):
+            if server.log_requests:
+                super().log_message(format, *args)
+
+    return AssistantHandler
+
+
+def prepare_assistant():
+    """Adapts main.py's module-level setup from one local user to a server."""
+    # Nothing is spoken on the server; replies go back to the client.
+    assistant.speech_queue.shutdown(drain=False, timeout=1)
+    # A reply is sent as one HTTP response, so there is nothing to gain from streaming, and
+    # blocking requests run in the GeminiClient's bounded thread pool.
+    assistant.STREAM_RESPONSES = False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Multi-session HTTP server for the Gemini assistant")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--idle-timeout", type=float, default=float(os.getenv("SESSION_IDLE_TIMEOUT", "900")),
+                        help="seconds after which an idle session is evicted")
+    parser.add_argument("--max-sessions", type=int, default=int(os.getenv("MAX_SESSIONS", "1000")))
+    parser.add_argument("--memory-dir", default=os.getenv("SESSION_MEMORY_DIR") or None,
+                        help="persist each session's memory here (default: in memory only)")
+    parser.add_argument("--log-requests", action="store_true")
+    parser.add_argument("--quiet", action="store_true", help="hide the per-turn console output")
+    args = parser.parse_args()
+
+    prepare_assistant()
+    sessions = SessionManager(idle_timeout=args.idle_timeout, max_sessions=args.max_sessions,
+                              memory_dir=args.memory_dir).start_sweeper(min(30.0, args.idle_timeout / 2))
+    server = AssistantServer(sessions, args.host, args.port, log_requests=args.log_requests)
+    print(f"🌐 Serving the assistant at {server.address} "
+          f"(idle sessions evicted after {args.idle_timeout:.0f}s, at most {args.max_sessions})")
+    if args.quiet:
+        sys.stdout = open(os.devnull, "w")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sys.stdout = sys.__stdout__
+        server.close()
+        assistant.gemini_client.close()
+        assistant.response_cache.save()
+        assistant.tracer.close()
+        print(f"👋 Server stopped. Sessions: {sessions.stats}")
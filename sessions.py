@@ -0,0 +1,214 @@
+# sessions.py
+import contextlib
+import os
+import re
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from memory_store import MemoryStore, MemoryWriter, initial_memory
+
+# --- Conversation Sessions ---
+# Everything that belongs to one user's conversation lives in a Session, so one process
+# can hold many of them (server.py). The local voice assistant in main.py uses just one.
+
+_SESSION_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class Session:
+    """
+    One user's conversation state: `memory` (the clarification chain and the stated and
+    IP-based locations, see memory_store.initial_memory), the Gemini chat kept open while
+    Gemini waits for a clarification, and the timezone of the IP-based location.
+
+    With a `store` (MemoryStore) the memory is persisted by save(); without one it only
+    lives as long as the session. `lock` serializes the turns of one session; `busy` counts
+    the turns running or waiting for it (see SessionManager.hold()).
+    """
+
+    def __init__(self, session_id="local", store=None, memory=None, ip_timezone="UTC", clock=time.monotonic):
+        self.id = session_id
+        self.store = store
+        self.memory = memory if memory is not None else initial_memory()
+        self.gemini_chat = None
+        self.ip_timezone = ip_timezone
+        self.lock = threading.Lock()
+        self.busy = 0
+        self.turns = 0
+        self._clock = clock
+        self.created = self.last_used = clock()
+
+    def load(self):
+        """Replaces the memory with what the store has on disk (fresh memory without a store)."""
+        self.memory = self.store.load() if self.store is not None else initial_memory()
+        return self.memory
+
+    def save(self):
+        """Schedules a write of the memory (no-op without a store)."""
+        if self.store is not None:
+            self.store.save(self.memory)
+
+    def set_location(self, location, timezone):
+        """Sets the IP-based (or client-reported) location and its timezone."""
+        self.ip_timezone = timezone
+        self.memory["last_retrieved_ip_location"] = location
+        self.save()
+
+    def touch(self):
+        self.last_used = self._clock()
+
+    def idle_for(self):
+        return self._clock() - self.last_used
+
+    def close(self):
+        if self.store is not None:
+            self.store.close()
+
+
+class SessionManager:
+    """
+    Creates, finds and ends sessions for a multi-user process.
+
+    Sessions idle for more than `idle_timeout` seconds are evicted by evict_idle() (run it
+    periodically, e.g. with start_sweeper()); beyond `max_sessions` the least recently used
+    idle session makes room for a new one. With `memory_dir`, each session's memory is
+    persisted to `<memory_dir>/<session id>.json` (by one writer thread shared by all
+    sessions); otherwise it is kept in RAM only.
+    """
+
+    def __init__(self, idle_timeout=900.0, max_sessions=1000, memory_dir=None, clock=time.monotonic):
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.memory_dir = memory_dir
+        self._clock = clock
+        self._sessions = OrderedDict()   # id -> Session, least recently used first
+        self._lock = threading.Lock()
+        self._sweeper = None
+        self._stopped = threading.Event()
+        self.stats = {"created": 0, "ended": 0, "evicted_idle": 0, "evicted_full": 0, "rejected": 0}
+        self._writer = None
+        if memory_dir:
+            os.makedirs(memory_dir, exist_ok=True)
+            self._writer = MemoryWriter()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+    def _new_store(self, session_id):
+        if not self.memory_dir:
+            return None
+        return MemoryStore(os.path.join(self.memory_dir, f"{session_id}.json"), writer=self._writer)
+
+    def create(self, session_id=None):
+        """
+        Starts a new session (or resumes `session_id` from memory_dir). Returns None when
+        max_sessions are open and every one of them is in the middle of a turn.
+        """
+        if session_id is not None and (not isinstance(session_id, str) or not _SESSION_ID.match(session_id)):
+            raise ValueError("Session ids may only contain letters, digits, '-' and '_'.")
+        self.evict_idle()
+        with self._lock:
+            existing = self._sessions.get(session_id) if session_id else None
+            if existing is not None:
+                existing.touch()
+                self._sessions.move_to_end(session_id)
+                return existing
+            if len(self._sessions) >= self.max_sessions and not self._evict_oldest_locked():
+                self.stats["rejected"] += 1
+                return None
+            session_id = session_id or secrets.token_urlsafe(12)
+            session = Session(session_id, store=self._new_store(session_id), clock=self._clock)
+            self._sessions[session_id] = session
+            self.stats["created"] += 1
+        if session.store is not None:
+            session.load()
+        return session
+
+    def get(self, session_id):
+        """The open session with this id (marked as just used), or None."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.touch()
+                self._sessions.move_to_end(session_id)
+            return session
+
+    @contextlib.contextmanager
+    def hold(self, session_id):
+        """
+        For running a turn: yields the open session with this id with its lock held, or None.
+        The session counts as busy from the lookup on, so it cannot be evicted while the turn
+        waits for the lock or runs.
+        """
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.busy += 1
+                session.touch()
+                self._sessions.move_to_end(session_id)
+        if session is None:
+            yield None
+            return
+        try:
+            with session.lock:
+                yield session
+        finally:
+            with self._lock:
+                session.busy -= 1
+
+    def end(self, session_id):
+        """Closes a session; returns False if it was not open."""
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is None:
+                return False
+            self.stats["ended"] += 1
+        session.close()
+        return True
+
+    def _evict_oldest_locked(self):
+        for session_id, session in self._sessions.items():
+            if not session.busy:
+                del self._sessions[session_id]
+                self.stats["evicted_full"] += 1
+                session.close()
+                return True
+        return False
+
+    def evict_idle(self):
+        """Closes sessions idle for longer than idle_timeout. Returns how many were evicted."""
+        evicted = []
+        with self._lock:
+            for session_id, session in list(self._sessions.items()):
+                if session.idle_for() < self.idle_timeout:
+                    break # ordered by last use, so the rest are more recent
+                if session.busy:
+                    continue
+                del self._sessions[session_id]
+                evicted.append(session)
+            self.stats["evicted_idle"] += len(evicted)
+        for session in evicted:
+            session.close()
+        return len(evicted)
+
+    def start_sweeper(self, interval=30.0):
+        """Runs evict_idle() every `interval` seconds on a daemon thread."""
+        def sweep():
+            while not self._stopped.wait(interval):
+                self.evict_idle()
+        self._sweeper = threading.Thread(target=sweep, name="session-sweeper", daemon=True)
+        self._sweeper.start()
+        return self
+
+    def close(self):
+        """Stops the sweeper and closes every session (flushing persisted memory)."""
+        self._stopped.set()
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
+        if self._writer is not None:
+            self._writer.close()
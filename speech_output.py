@@ -0,0 +1,273 @@
+# speech_output.py
+import collections
+import itertools
+import queue
+import threading
+import time
+
+from tts_cache import PlaybackUnavailable
+
+# Lower numbers are spoken first; equal priorities keep their order.
+PRIORITY_URGENT = 0   # errors and goodbyes
+PRIORITY_NORMAL = 10  # answers and notices
+
+_STOP = object()
+
+
+class SpeechQueue:
+    """
+    Speaks text on a dedicated worker thread so the main loop never blocks on TTS.
+
+    The TTS engine is created by `engine_factory` on the worker thread itself, since
+    pyttsx3 engines must be driven from the thread that created them. If that fails
+    (no pyttsx3, no audio driver), `error` is set and queued text is printed instead.
+    Use cancel() to cut off the utterance that is playing, flush() to drop everything
+    still waiting, or barge_in() for both when the user starts talking.
+    `on_spoken(waited, spoke)`, if given, is called on the worker thread after each
+    utterance with its seconds in the queue and seconds speaking.
+
+    With a `cache` (tts_cache.TTSCache) and a `player_factory` (e.g. tts_cache.WavPlayer),
+    phrases rendered earlier are played from disk instead of being synthesized again.
+    Phrases the cache asks for are rendered with the same engine while the queue is idle.
+    `on_audio(seconds, cached)` is called when an utterance's first audio starts, with the
+    time since it was taken off the queue.
+
+    `speaking` is set while an utterance is coming out of the speakers, so audio capture
+    can tell the assistant's own voice from the user's (see AudioCapture's is_playing).
+    """
+
+    RENDER_IDLE = 0.5 # seconds the queue must be empty before a phrase is rendered
+
+    def __init__(self, engine_factory, rate=180, on_spoken=None, cache=None, player_factory=None, on_audio=None):
+        self._engine_factory = engine_factory
+        self._rate = rate
+        self._on_spoken = on_spoken
+        self._cache = cache
+        self._player_factory = player_factory
+        self._on_audio = on_audio
+        self._player = None
+        self._voice = None
+        self._renders = collections.deque() # phrases to render into the cache when idle
+        self._rendered = threading.Event()
+        self._rendered.set()
+        self._audio_pending_since = None    # set while a live utterance waits for its first word
+        self._engine = None
+        self._queue = queue.PriorityQueue()
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._pending = 0           # queued + currently speaking
+        self._current_id = None     # order number of the utterance being spoken
+        self._cancelled_id = None
+        self._stats = {"spoken": 0, "cancelled": 0, "flushed": 0, "total_wait": 0.0, "max_wait": 0.0}
+        self.ready = threading.Event() # set once the worker has started (check `error` for failure)
+        self.error = None              # why the engine could not be created, if it could not
+        self.speaking = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="tts-worker", daemon=True)
+        self._thread.start()
+
+    # --- Producer side ---
+
+    def say(self, text, priority=PRIORITY_NORMAL):
+        """Queues text to be spoken and returns immediately."""
+        with self._lock:
+            self._pending += 1
+            self._idle.clear()
+        self._queue.put((priority, next(self._order), time.monotonic(), text))
+
+    def cancel(self):
+        """Stops the utterance that is currently playing (queued ones still play)."""
+        with self._lock:
+            if self._current_id is not None:
+                self._cancelled_id = self._current_id
+        engine = self._engine
+        if engine is not None and self._cancelled_id is not None:
+            try:
+                engine.stop()
+            except Exception:
+                pass # Some drivers only honour stop() from the word callback below
+
+    def flush(self):
+        """Drops every queued utterance that has not started playing yet."""
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item[3] is _STOP:
+                self._queue.put(item) # never swallow a shutdown request
+                break
+            with self._lock:
+                self._stats["flushed"] += 1
+            self._finish_one()
+
+    def barge_in(self):
+        """The user started speaking: silence the assistant and forget what it was about to say."""
+        self.flush()
+        self.cancel()
+
+    def wait_until_idle(self, timeout=None):
+        """Blocks until everything queued so far has been spoken, flushed or cancelled."""
+        return self._idle.wait(timeout)
+
+    def prerender(self, texts):
+        """Schedules phrases to be rendered into the cache (no-op without one)."""
+        if self._cache is None:
+            return
+        with self._lock:
+            self._renders.extend(texts)
+            if self._renders:
+                self._rendered.clear()
+
+    def wait_for_renders(self, timeout=None):
+        """Blocks until every scheduled rendering has been done."""
+        return self._rendered.wait(timeout)
+
+    def shutdown(self, drain=True, timeout=None):
+        """Stops the worker, optionally letting queued speech finish first."""
+        if not drain:
+            self.barge_in()
+        self._queue.put((float("inf"), next(self._order), time.monotonic(), _STOP))
+        self._thread.join(timeout)
+
+    # --- Stats ---
+
+    def depth(self):
+        """Number of utterances waiting to be spoken (excluding the one playing)."""
+        return self._queue.qsize()
+
+    def stats(self):
+        """Queue depth plus time-in-queue figures (seconds) for everything spoken so far."""
+        with self._lock:
+            stats = dict(self._stats)
+        started = stats["spoken"] + stats["cancelled"]
+        stats["depth"] = self.depth()
+        stats["avg_wait"] = stats["total_wait"] / started if started else 0.0
+        return stats
+
+    # --- Worker side ---
+
+    def _finish_one(self):
+        with self._lock:
+            self._pending -= 1
+            if self._pending <= 0:
+                self._pending = 0
+                self._idle.set()
+
+    def _on_word(self, name, location, length):
+        # pyttsx3 calls this before every word; it is the documented place to stop() speech.
+        if self._audio_pending_since is not None:
+            started, self._audio_pending_since = self._audio_pending_since, None
+            if self._on_audio:
+                self._on_audio(time.monotonic() - started, False)
+        if self._cancelled_id is not None and self._cancelled_id == self._current_id:
+            self._engine.stop()
+
+    def _play_cached(self, text, order, started):
+        """Plays a cached rendering of `text`. Returns False if there is none (or no way to play it)."""
+        if self._cache is None or self._player_factory is None:
+            return False
+        path = self._cache.lookup(text, self._voice, self._rate)
+        if path is None:
+            return False
+        try:
+            if self._player is None:
+                self._player = self._player_factory()
+            on_start = (lambda: self._on_audio(time.monotonic() - started, True)) if self._on_audio else None
+            self._player.play(path, on_start=on_start, should_stop=lambda: self._cancelled_id == order)
+        except PlaybackUnavailable as e:
+            print(f"⚠️ Cannot play cached speech, synthesizing instead: {e}")
+            self._player_factory = None
+            return False
+        return True
+
+    def _speak_live(self, text, started):
+        self._audio_pending_since = started
+        try:
+            self._engine.say(text)
+            self._engine.runAndWait()
+        finally:
+            self._audio_pending_since = None
+        if self._cache is not None and self._player_factory is not None \
+                and self._cache.note(text, self._voice, self._rate):
+            with self._lock:
+                self._renders.append(text)
+                self._rendered.clear()
+
+    def _render_next(self):
+        with self._lock:
+            text = self._renders.popleft()
+        try:
+            self._engine.save_to_file(text, self._cache.render_target(text, self._voice, self._rate))
+            self._engine.runAndWait()
+            self._cache.store(text, self._voice, self._rate)
+        except Exception as e:
+            print(f"⚠️ Could not render '{text[:40]}' for the speech cache: {e}")
+            self._cache.discard(text, self._voice, self._rate)
+        with self._lock:
+            done = not self._renders
+            if done:
+                self._rendered.set()
+        if done:
+            self._cache.save()
+
+    def _print_only(self):
+        # Without an engine, keep draining the queue so wait_until_idle() still returns.
+        while True:
+            priority, order, enqueued_at, text = self._queue.get()
+            if text is _STOP:
+                break
+            print(f"🔈 {text}")
+            self._finish_one()
+
+    def _run(self):
+        try:
+            self._engine = self._engine_factory()
+            self._engine.setProperty('rate', self._rate)
+            self._engine.connect('started-word', self._on_word)
+        except Exception as e:
+            self.error = e
+            print(f"❌ Text-to-speech is unavailable, so replies are only printed: {e}")
+            self.ready.set()
+            self._print_only()
+            return
+        if self._cache is not None:
+            try:
+                self._voice = self._engine.getProperty('voice')
+            except Exception:
+                self._voice = None
+            self.prerender(self._cache.missing_pinned(self._voice, self._rate))
+        self.ready.set()
+        while True:
+            try:
+                priority, order, enqueued_at, text = self._queue.get(
+                    timeout=self.RENDER_IDLE if self._renders else None)
+            except queue.Empty:
+                self._render_next()
+                continue
+            if text is _STOP:
+                break
+            waited = time.monotonic() - enqueued_at
+            with self._lock:
+                self._current_id = order
+                self._stats["total_wait"] += waited
+                self._stats["max_wait"] = max(self._stats["max_wait"], waited)
+            speaking_started = time.monotonic()
+            self.speaking.set()
+            try:
+                if not self._play_cached(text, order, speaking_started):
+                    self._speak_live(text, speaking_started)
+            except Exception as e:
+                print(f"❌ Error speaking response: {e}")
+            finally:
+                self.speaking.clear()
+            if self._on_spoken:
+                self._on_spoken(waited, time.monotonic() - speaking_started)
+            with self._lock:
+                if self._cancelled_id == order:
+                    self._stats["cancelled"] += 1
+                else:
+                    self._stats["spoken"] += 1
+                self._current_id = None
+            self._finish_one()
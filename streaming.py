@@ -0,0 +1,149 @@
+# streaming.py
+import queue
+import re
+import threading
+
+# --- Gemini Response Prefixes ---
+# Every Gemini reply starts with one of these; main() dispatches on them.
+CLARIFICATION_PREFIX = "CLARIFICATION_NEEDED:"
+LOCATION_PREFIX = "LOCATION_NEEDED:"
+CALCULATE_PREFIX = "CALCULATE:"
+SPEAK_PREFIX = "SPEAK_RESPONSE:"
+WRITE_PREFIX = "WRITE_RESPONSE:"
+
+RESPONSE_PREFIXES = (CLARIFICATION_PREFIX, LOCATION_PREFIX, CALCULATE_PREFIX, SPEAK_PREFIX, WRITE_PREFIX)
+_LONGEST_PREFIX = max(len(prefix) for prefix in RESPONSE_PREFIXES)
+
+# A sentence ends at . ! or ? followed by whitespace, or at a line break.
+# "3.14" and "e.g.," stay intact because there is no whitespace right after the dot.
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n+")
+
+_END_OF_STREAM = object()
+
+
+def match_prefix(text):
+    """
+    Returns the response prefix `text` starts with, None if it cannot start with one,
+    or "" if more text is needed to decide.
+    """
+    for prefix in RESPONSE_PREFIXES:
+        if text.startswith(prefix):
+            return prefix
+    if len(text) < _LONGEST_PREFIX and any(prefix.startswith(text) for prefix in RESPONSE_PREFIXES):
+        return ""
+    return None
+
+
+def split_sentences(buffer):
+    """Splits off complete sentences. Returns (sentences, unfinished_remainder)."""
+    parts = _SENTENCE_BOUNDARY.split(buffer)
+    sentences = [part.strip() for part in parts[:-1] if part.strip()]
+    return sentences, parts[-1]
+
+
+class StreamedResponse:
+    """
+    Reads a streaming Gemini reply on a background thread so the caller can act on it
+    (detect the prefix, speak the first sentence) while later chunks are still generating.
+
+    `start_stream` is called on the worker thread and must return an iterable of chunks
+    with a `.text` attribute, e.g. `lambda: model.generate_content(prompt, stream=True)`.
+    `describe_error` turns an exception into the text to use when nothing was received.
+    If no chunk arrives for `chunk_timeout` seconds, the stream is treated as failed
+    with a TimeoutError. A stream that breaks after some text has arrived is `interrupted`:
+    what was received is not the whole reply.
+    """
+
+    def __init__(self, start_stream, describe_error=str, chunk_timeout=None):
+        self._chunks = queue.Queue()
+        self._describe_error = describe_error
+        self._chunk_timeout = chunk_timeout
+        self._received = []   # every chunk text pulled off the queue so far
+        self._pending = ""    # text received but not yet handed out as a sentence
+        self._finished = False
+        self.error = None
+        self.prefix = None
+        self._prefix_known = False
+        self._thread = threading.Thread(target=self._produce, args=(start_stream,), daemon=True)
+        self._thread.start()
+
+    def _produce(self, start_stream):
+        try:
+            for chunk in start_stream():
+                text = chunk.text
+                if text:
+                    self._chunks.put(text)
+        except Exception as e:
+            self._chunks.put(e)
+        finally:
+            self._chunks.put(_END_OF_STREAM)
+
+    def _pull(self):
+        """Blocks for the next chunk. Returns False once the stream has ended."""
+        if self._finished:
+            return False
+        try:
+            item = self._chunks.get(timeout=self._chunk_timeout)
+        except queue.Empty:
+            # The producer thread may still be blocked in the network call; it is abandoned.
+            self._finished = True
+            self.error = TimeoutError(f"No data from Gemini for {self._chunk_timeout:g}s.")
+            print(f"⚠️ Gemini stream interrupted: {self.error}")
+            return False
+        if item is _END_OF_STREAM:
+            self._finished = True
+            return False
+        if isinstance(item, Exception):
+            self.error = item
+            print(f"⚠️ Gemini stream interrupted: {item}")
+            return True
+        if not self._received:
+            item = item.lstrip()
+        self._received.append(item)
+        self._pending += item
+        return True
+
+    def detect_prefix(self):
+        """Waits only for as many chunks as needed to know which prefix the reply uses."""
+        while not self._prefix_known:
+            decision = match_prefix(self._pending)
+            if decision != "" or not self._pull():
+                self._prefix_known = True
+                self.prefix = decision or None
+                if self.prefix:
+                    self._pending = self._pending[len(self.prefix):]
+        return self.prefix
+
+    def sentences(self):
+        """Yields the reply body (after the prefix) one sentence at a time as it streams in."""
+        self.detect_prefix()
+        while True:
+            ready, self._pending = split_sentences(self._pending)
+            yield from ready
+            if not self._pull():
+                break
+        tail = self._pending.strip()
+        self._pending = ""
+        if tail:
+            yield tail
+
+    def full_text(self):
+        """
+        Waits for the rest of the stream and returns the reply, prefix included (only the
+        part received so far if the stream was interrupted).
+        """
+        while self._pull():
+            pass
+        if not self._received and self.error is not None:
+            return self._describe_error(self.error)
+        return "".join(self._received)
+
+    @property
+    def failed(self):
+        """True if the stream errored before producing any text."""
+        return self.error is not None and not self._received
+
+    @property
+    def interrupted(self):
+        """True if the stream errored or stalled after producing some text."""
+        return self.error is not None and bool(self._received)
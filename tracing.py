@@ -0,0 +1,286 @@
+# tracing.py
+import contextvars
+import functools
+import json
+import threading
+import time
+from collections import deque
+
+# --- Per-Turn Latency Tracing ---
+# Spans time the stages of a turn (listening, recognition, Gemini, speaking, typing, ...).
+# Every finished span feeds a rolling per-stage window used for p50/p95/p99; spans that
+# run inside tracer.turn() are also collected into one JSON line per turn. A disabled
+# Tracer hands out a shared no-op span, so instrumented code costs one attribute check.
+
+QUANTILES = (0.5, 0.95, 0.99)
+METRIC_NAME = "talk2type_stage_seconds"
+
+_current_turn = contextvars.ContextVar("current_turn", default=None)
+
+
+class _NullSpan:
+    """What a disabled tracer returns: does nothing, as cheaply as possible."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """Times one stage. Use as a context manager; extra details go in set(key=value)."""
+
+    __slots__ = ("tracer", "name", "attrs", "started", "duration")
+
+    def __init__(self, tracer, name, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.started = None
+        self.duration = None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self.started
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self.tracer._finish_span(self)
+        return False
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+
+class TurnTrace:
+    """The spans recorded while one turn was current."""
+
+    def __init__(self, attrs):
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.attrs = attrs
+        self.spans = []
+
+    def to_record(self, turn_id, total):
+        record = {"turn": turn_id, "started_at": round(self.started_at, 3), "total_ms": round(total * 1000, 2)}
+        record.update(self.attrs)
+        record["spans"] = [
+            {"name": span.name,
+             "offset_ms": round((span.started - self.started) * 1000, 2),
+             "ms": round(span.duration * 1000, 2),
+             **span.attrs}
+            for span in self.spans
+        ]
+        return record
+
+
+class RollingWindow:
+    """The last `size` observations of one stage, plus lifetime count and sum."""
+
+    def __init__(self, size):
+        self.values = deque(maxlen=size)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self.values.append(value)
+        self.count += 1
+        self.total += value
+
+    def quantiles(self, qs=QUANTILES):
+        """Nearest-rank quantiles over the window, e.g. {0.5: 0.41, 0.95: 1.3, 0.99: 2.2}."""
+        ordered = sorted(self.values)
+        if not ordered:
+            return {q: 0.0 for q in qs}
+        last = len(ordered) - 1
+        return {q: ordered[min(last, max(0, int(q * len(ordered) + 0.5) - 1))] for q in qs}
+
+
+class Tracer:
+    """
+    Collects stage latencies.
+
+    - span(name): context manager around one stage.
+    - traced(name): the same as a decorator.
+    - record(name, seconds): for durations measured elsewhere (e.g. on the TTS thread).
+    - turn(): groups the spans of one turn into a JSONL record written to trace_path.
+    """
+
+    def __init__(self, enabled=True, trace_path=None, window=1000):
+        self.enabled = enabled
+        self.trace_path = trace_path
+        self.window = window
+        self._windows = {}
+        self._lock = threading.Lock()
+        self._turns = 0
+        self._trace_file = None
+        self._server = None
+
+    # --- Recording ---
+
+    def span(self, name, **attrs):
+        if not self.enabled:
+            return _NULL_SPAN
+        return Span(self, name, attrs)
+
+    def traced(self, name):
+        """Decorator: times every call of the wrapped function as stage `name`."""
+        def decorate(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with Span(self, name, {}):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def record(self, name, seconds):
+        if self.enabled:
+            self._observe(name, seconds)
+
+    def _observe(self, name, seconds):
+        with self._lock:
+            window = self._windows.get(name)
+            if window is None:
+                window = self._windows[name] = RollingWindow(self.window)
+            window.observe(seconds)
+
+    def _finish_span(self, span):
+        self._observe(span.name, span.duration)
+        turn = _current_turn.get()
+        if turn is not None:
+            turn.spans.append(span)
+
+    def annotate(self, **attrs):
+        """Adds details (e.g. route="local") to the current turn's trace record."""
+        turn = _current_turn.get()
+        if turn is not None:
+            turn.attrs.update(attrs)
+
+    # --- Turns ---
+
+    def turn(self, **attrs):
+        """Context manager for one turn; its spans end up in a single trace record."""
+        return _TurnScope(self, attrs)
+
+    def _end_turn(self, trace, error=None):
+        total = time.perf_counter() - trace.started
+        self._observe("turn", total)
+        if error:
+            trace.attrs["error"] = error
+        with self._lock:
+            self._turns += 1
+            turn_id = self._turns
+            if self.trace_path:
+                try:
+                    if self._trace_file is None:
+                        self._trace_file = open(self.trace_path, "a", encoding="utf-8")
+                    self._trace_file.write(json.dumps(trace.to_record(turn_id, total)) + "\n")
+                    self._trace_file.flush()
+                except OSError as e:
+                    print(f"⚠️ Could not write trace record to {self.trace_path}: {e}")
+                    self.trace_path = None
+
+    # --- Reading ---
+
+    def quantiles(self, name):
+        """Rolling p50/p95/p99 (seconds) for one stage, or None if it was never recorded."""
+        with self._lock:
+            window = self._windows.get(name)
+            return window.quantiles() if window else None
+
+    def snapshot(self):
+        """{stage: (count, sum, {quantile: seconds})} for every stage recorded so far."""
+        with self._lock:
+            return {name: (w.count, w.total, w.quantiles()) for name, w in sorted(self._windows.items())}
+
+    def summary(self):
+        """One line per stage: count and rolling p50/p95/p99 in milliseconds."""
+        if not self.enabled:
+            return "tracing disabled"
+        stages = self.snapshot()
+        if not stages:
+            return "no spans recorded"
+        width = max(len(name) for name in stages)
+        return "\n".join(
+            f"  {name:<{width}} n={count:<4} p50 {q[0.5] * 1000:7.1f} ms  "
+            f"p95 {q[0.95] * 1000:7.1f} ms  p99 {q[0.99] * 1000:7.1f} ms"
+            for name, (count, _, q) in stages.items()
+        )
+
+    def render_prometheus(self):
+        """The stage windows in the Prometheus text exposition format (as a summary metric)."""
+        lines = [f"# HELP {METRIC_NAME} Assistant stage latency over the last {self.window} observations.",
+                 f"# TYPE {METRIC_NAME} summary"]
+        for name, (count, total, q) in self.snapshot().items():
+            for quantile, value in q.items():
+                lines.append(f'{METRIC_NAME}{{stage="{name}",quantile="{quantile}"}} {value:.6f}')
+            lines.append(f'{METRIC_NAME}_sum{{stage="{name}"}} {total:.6f}')
+            lines.append(f'{METRIC_NAME}_count{{stage="{name}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def start_http_server(self, port, host="127.0.0.1"):
+        """Serves render_prometheus() at http://host:port/metrics from a daemon thread."""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        tracer = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = tracer.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass # keep scrapes out of the console
+
+        self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        print(f"📈 Metrics at http://{host}:{self._server.server_address[1]}/metrics")
+        return self._server
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        with self._lock:
+            if self._trace_file is not None:
+                self._trace_file.close()
+                self._trace_file = None
+
+
+class _TurnScope:
+    def __init__(self, tracer, attrs):
+        self.tracer = tracer
+        self.attrs = attrs
+        self.trace = None
+        self._token = None
+
+    def __enter__(self):
+        if self.tracer.enabled:
+            self.trace = TurnTrace(self.attrs)
+            self._token = _current_turn.set(self.trace)
+        return self.trace
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.trace is not None:
+            _current_turn.reset(self._token)
+            self.tracer._end_turn(self.trace, error=exc_type.__name__ if exc_type else None)
+        return False
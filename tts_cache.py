@@ -0,0 +1,262 @@
+# tts_cache.py
+import hashlib
+import json
+import os
+import threading
+import time
+import wave
+from collections import OrderedDict
+
+from memory_store import write_json_atomically
+
+# --- Rendered Speech Cache ---
+# Many things the assistant says are word-for-word the same every time (the greeting, "Okay,
+# I will type that...", goodbyes, fixed error messages). Synthesizing them live costs the
+# TTS engine's start-up latency on every turn; playing a WAV rendered earlier starts almost
+# at once. TTSCache keeps those renderings on disk, keyed by text, voice and rate.
+
+INDEX_FILE = "index.json"
+MAX_COUNTED_PHRASES = 2000 # how many distinct phrases' occurrence counts are remembered
+
+
+def normalize_phrase(text):
+    return " ".join(text.split())
+
+
+class TTSCache:
+    """
+    Disk cache of rendered phrases in `directory`, bounded to `max_bytes` (least recently
+    played files are evicted first).
+
+    A phrase is worth rendering once it has been spoken live `render_after` times, or right
+    away if it is one of the `pinned` phrases; phrases longer than `max_chars` are never
+    cached. The caller (SpeechQueue) renders with its own engine and hands the file to
+    store(), and plays what lookup() returns. Thread-safe.
+    """
+
+    def __init__(self, directory, max_bytes=50 * 1024 * 1024, render_after=3, max_chars=200, pinned=()):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.render_after = render_after
+        self.max_chars = max_chars
+        self.pinned = {normalize_phrase(text) for text in pinned}
+        self._entries = OrderedDict()   # key -> {"text", "voice", "rate", "bytes"}, least recently used first
+        self._counts = OrderedDict()    # phrase -> times spoken live
+        self._scheduled = set()         # keys handed out by note() or missing_pinned() but not stored yet
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "renders": 0, "evictions": 0, "render_failures": 0}
+        self._load()
+
+    # --- Keys ---
+
+    @staticmethod
+    def key(text, voice, rate):
+        raw = json.dumps([normalize_phrase(text), str(voice), rate], separators=(",", ":"))
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def path_for(self, key):
+        return os.path.join(self.directory, f"{key}.wav")
+
+    def cacheable(self, text):
+        phrase = normalize_phrase(text)
+        return bool(phrase) and len(phrase) <= self.max_chars
+
+    # --- Lookups ---
+
+    def lookup(self, text, voice, rate):
+        """Path of the rendered phrase, or None. A hit makes it the most recently used."""
+        key = self.key(text, voice, rate)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not os.path.exists(self.path_for(key)):
+                self._drop_locked(key) # deleted behind our back
+                entry = None
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            self._dirty = True
+            return self.path_for(key)
+
+    def note(self, text, voice, rate):
+        """
+        Counts one live rendition of `text`. Returns True when the phrase should now be
+        rendered into the cache (the caller then calls store() or discard()).
+        """
+        if not self.cacheable(text):
+            return False
+        phrase = normalize_phrase(text)
+        key = self.key(text, voice, rate)
+        with self._lock:
+            count = self._counts.pop(phrase, 0) + 1
+            self._counts[phrase] = count
+            while len(self._counts) > MAX_COUNTED_PHRASES:
+                self._counts.popitem(last=False)
+            self._dirty = True
+            wanted = count >= self.render_after or phrase in self.pinned
+            if not wanted or key in self._entries or key in self._scheduled:
+                return False
+            self._scheduled.add(key)
+            return True
+
+    def missing_pinned(self, voice, rate):
+        """Pinned phrases not rendered yet for this voice and rate (each is then scheduled)."""
+        missing = []
+        with self._lock:
+            for phrase in sorted(self.pinned):
+                key = self.key(phrase, voice, rate)
+                if key not in self._entries and key not in self._scheduled:
+                    self._scheduled.add(key)
+                    missing.append(phrase)
+        return missing
+
+    # --- Storing ---
+
+    def render_target(self, text, voice, rate):
+        """Where the caller should render `text` before calling store()."""
+        os.makedirs(self.directory, exist_ok=True)
+        return self.path_for(self.key(text, voice, rate)) + ".part"
+
+    def store(self, text, voice, rate):
+        """
+        Adopts the file rendered at render_target(). Files that are missing, empty or not
+        WAV (some engines write other formats) are discarded. Returns True if cached.
+        """
+        key = self.key(text, voice, rate)
+        rendered = self.path_for(key) + ".part"
+        try:
+            with wave.open(rendered, "rb") as wav:
+                ok = wav.getnframes() > 0
+            size = os.path.getsize(rendered)
+        except (OSError, EOFError, wave.Error):
+            ok = False
+        if not ok:
+            self.discard(text, voice, rate)
+            return False
+        os.replace(rendered, self.path_for(key))
+        with self._lock:
+            self._scheduled.discard(key)
+            if key in self._entries:
+                self.bytes -= self._entries.pop(key)["bytes"]
+            self._entries[key] = {"text": normalize_phrase(text), "voice": str(voice), "rate": rate, "bytes": size}
+            self.bytes += size
+            self.stats["renders"] += 1
+            self._evict_locked()
+            self._dirty = True
+        return True
+
+    def discard(self, text, voice, rate):
+        """Gives up on a scheduled rendering."""
+        key = self.key(text, voice, rate)
+        try:
+            os.remove(self.path_for(key) + ".part")
+        except OSError:
+            pass
+        with self._lock:
+            self._scheduled.discard(key)
+            self.stats["render_failures"] += 1
+
+    def _drop_locked(self, key):
+        entry = self._entries.pop(key)
+        self.bytes -= entry["bytes"]
+        try:
+            os.remove(self.path_for(key))
+        except OSError:
+            pass
+
+    def _evict_locked(self):
+        while self.bytes > self.max_bytes and len(self._entries) > 1:
+            self._drop_locked(next(iter(self._entries)))
+            self.stats["evictions"] += 1
+
+    # --- Persistence ---
+
+    def _load(self):
+        path = os.path.join(self.directory, INDEX_FILE)
+        try:
+            with open(path, encoding="utf-8") as f:
+                index = json.load(f)
+            entries, counts = index.get("entries", []), index.get("counts", [])
+        except FileNotFoundError:
+            return
+        except (json.JSONDecodeError, OSError, AttributeError) as e:
+            print(f"⚠️ Ignoring the unreadable TTS cache index {path}: {e}")
+            return
+        for key, entry in entries: # stored least recently used first
+            if os.path.exists(self.path_for(key)):
+                self._entries[key] = entry
+                self.bytes += entry["bytes"]
+        for phrase, count in counts[-MAX_COUNTED_PHRASES:]:
+            self._counts[phrase] = count
+        self._evict_locked()
+
+    def save(self):
+        """Writes the index (entries in LRU order and phrase counts) if anything changed."""
+        with self._lock:
+            if not self._dirty:
+                return
+            index = {"saved_at": round(time.time()), "entries": list(self._entries.items()),
+                     "counts": list(self._counts.items())}
+            self._dirty = False
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            write_json_atomically(os.path.join(self.directory, INDEX_FILE), index, indent=None)
+        except OSError as e:
+            print(f"⚠️ Could not save the TTS cache index: {e}")
+
+    def summary(self):
+        lookups = self.stats["hits"] + self.stats["misses"]
+        rate = self.stats["hits"] / lookups if lookups else 0.0
+        return (f"{self.stats['hits']} played from cache / {lookups} ({rate:.0%}), {len(self._entries)} phrases, "
+                f"{self.bytes / 1024:.0f} KiB, {self.stats['renders']} rendered, {self.stats['evictions']} evicted")
+
+
+# --- Playback ---
+
+
+class PlaybackUnavailable(Exception):
+    """No audio output library or device for playing rendered files."""
+
+
+class WavPlayer:
+    """
+    Plays WAV files through PyAudio (already needed for the microphone) in small chunks, so
+    playback can be cut off between chunks. Create and use it on one thread.
+    """
+
+    def __init__(self, chunk_frames=1024):
+        try:
+            import pyaudio
+        except ImportError:
+            raise PlaybackUnavailable("Playing cached speech needs the 'pyaudio' package.")
+        self._pyaudio = pyaudio
+        self._audio = pyaudio.PyAudio()
+        self.chunk_frames = chunk_frames
+
+    def play(self, path, on_start=None, should_stop=None):
+        """Plays `path`; calls on_start() as the first audio is written. Returns False if stopped early."""
+        with wave.open(path, "rb") as wav:
+            try:
+                stream = self._audio.open(format=self._audio.get_format_from_width(wav.getsampwidth()),
+                                          channels=wav.getnchannels(), rate=wav.getframerate(), output=True)
+            except OSError as e:
+                raise PlaybackUnavailable(f"No audio output device: {e}")
+            try:
+                data = wav.readframes(self.chunk_frames)
+                if on_start:
+                    on_start()
+                while data:
+                    if should_stop and should_stop():
+                        return False
+                    stream.write(data)
+                    data = wav.readframes(self.chunk_frames)
+            finally:
+                stream.stop_stream()
+                stream.close()
+        return True
+
+    def close(self):
+        self._audio.terminate()
@@ -0,0 +1,279 @@
+# typing_backends.py
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+# --- Errors ---
+
+
+class TypingError(Exception):
+    """Base class for failures while typing text into another application."""
+
+
+class TypingUnavailable(TypingError):
+    """The backend's tool or library is not installed or cannot reach the display."""
+
+
+# --- Focus Detection ---
+
+
+def active_window():
+    """
+    An identifier of the focused window (xdotool window id on X11, window title where
+    pyautogui/pygetwindow supports it), or None if it cannot be determined.
+    """
+    if sys.platform.startswith("linux"):
+        if not os.getenv("DISPLAY") or not shutil.which("xdotool"):
+            return None
+        try:
+            result = subprocess.run(["xdotool", "getactivewindow"], capture_output=True, text=True, timeout=1)
+        except (OSError, subprocess.TimeoutExpired):
+            return None
+        if result.returncode != 0:
+            return None
+        return result.stdout.strip() or None
+    try:
+        import pyautogui
+        window = pyautogui.getActiveWindow()
+    except Exception:
+        return None
+    return getattr(window, "title", None) if window is not None else None
+
+
+def wait_for_focus_change(backend, timeout=8.0, poll=0.1, settle=0.25, fallback_delay=2.0, before_fallback=None):
+    """
+    Waits until the user switches to another window (then `settle` seconds more, so the new
+    window is ready for keystrokes). Returns True on a switch, False on timeout. When focus
+    cannot be observed at all, calls `before_fallback()` if given (e.g. to let the spoken
+    notice finish), waits `fallback_delay` seconds and returns None.
+    """
+    started_in = backend.active_window()
+    if started_in is None:
+        if before_fallback is not None:
+            before_fallback()
+        time.sleep(fallback_delay)
+        return None
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        time.sleep(poll)
+        current = backend.active_window()
+        if current is not None and current != started_in:
+            time.sleep(settle)
+            return True
+    return False
+
+
+# --- Backend Interface ---
+
+
+class TypingBackend:
+    """
+    Types text into the focused application.
+
+    Every backend implements type_text(); active_window() is used by
+    wait_for_focus_change() to notice when the user has switched to the target window.
+    """
+
+    name = "base"
+
+    def type_text(self, text):
+        """Types `text` into the focused window or raises a TypingError."""
+        raise NotImplementedError
+
+    def active_window(self):
+        return active_window()
+
+
+class PyAutoGUIBackend(TypingBackend):
+    """One synthetic keystroke per character via pyautogui (slow: `interval` seconds per key)."""
+
+    name = "pyautogui"
+
+    def __init__(self, interval=0.01):
+        try:
+            import pyautogui
+        except ImportError:
+            raise TypingUnavailable("The pyautogui backend needs the 'pyautogui' package.")
+        self._pyautogui = pyautogui
+        self.interval = interval
+
+    def type_text(self, text):
+        self._pyautogui.write(text, interval=self.interval)
+
+
+class ClipboardBackend(TypingBackend):
+    """
+    Bulk mode: puts the whole text on the clipboard and pastes it with one Ctrl+V
+    (Cmd+V on macOS), then restores what was on the clipboard before.
+    """
+
+    name = "clipboard"
+
+    def __init__(self, restore_delay=0.3):
+        try:
+            import pyperclip
+            import pyautogui
+        except ImportError:
+            raise TypingUnavailable("The clipboard backend needs the 'pyperclip' and 'pyautogui' packages.")
+        self._pyperclip = pyperclip
+        self._pyautogui = pyautogui
+        self.restore_delay = restore_delay
+        self._paste_keys = ("command", "v") if sys.platform == "darwin" else ("ctrl", "v")
+
+    def type_text(self, text):
+        try:
+            previous = self._pyperclip.paste()
+        except self._pyperclip.PyperclipException:
+            previous = None
+        try:
+            self._pyperclip.copy(text)
+        except self._pyperclip.PyperclipException as e:
+            raise TypingUnavailable(f"No clipboard available: {e}")
+        self._pyautogui.hotkey(*self._paste_keys)
+        if previous is not None:
+            # The target application reads the clipboard asynchronously; give it a moment.
+            time.sleep(self.restore_delay)
+            self._pyperclip.copy(previous)
+
+
+class XdotoolBackend(TypingBackend):
+    """
+    Keystroke injection with xdotool (X11), `chunk_size` characters per call.
+
+    The per-key delay adapts between chunks: if a chunk took much longer than its delay
+    budget, the target application (or X server) is falling behind and the delay grows;
+    while it keeps up, the delay shrinks back toward `min_delay_ms`.
+    """
+
+    name = "xdotool"
+    executable = "xdotool"
+
+    def __init__(self, chunk_size=200, start_delay_ms=4.0, min_delay_ms=1.0, max_delay_ms=40.0):
+        if not shutil.which(self.executable):
+            raise TypingUnavailable(f"'{self.executable}' is not installed.")
+        self.chunk_size = chunk_size
+        self.delay_ms = start_delay_ms
+        self.min_delay_ms = min_delay_ms
+        self.max_delay_ms = max_delay_ms
+
+    def _command(self, delay_ms, chunk):
+        """Returns (argv, stdin bytes) for typing one chunk."""
+        argv = [self.executable, "type", "--clearmodifiers", "--delay", str(int(round(delay_ms))), "--file", "-"]
+        return argv, chunk.encode("utf-8")
+
+    def _type_chunk(self, chunk):
+        argv, stdin = self._command(self.delay_ms, chunk)
+        try:
+            result = subprocess.run(argv, input=stdin, capture_output=True,
+                                    timeout=10 + len(chunk) * self.max_delay_ms / 1000)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            raise TypingError(f"{self.executable} failed: {e}")
+        if result.returncode != 0:
+            raise TypingUnavailable(f"{self.executable} failed: {result.stderr.decode(errors='replace').strip()}")
+
+    def type_text(self, text):
+        for start in range(0, len(text), self.chunk_size):
+            chunk = text[start:start + self.chunk_size]
+            started = time.monotonic()
+            self._type_chunk(chunk)
+            elapsed = time.monotonic() - started
+            budget = len(chunk) * self.delay_ms / 1000
+            if elapsed > 2 * budget + 0.05:
+                self.delay_ms = min(self.max_delay_ms, self.delay_ms * 1.5)
+            else:
+                self.delay_ms = max(self.min_delay_ms, self.delay_ms * 0.8)
+
+
+class YdotoolBackend(XdotoolBackend):
+    """The same chunked, adaptive injection through ydotool (uinput), which also works on Wayland."""
+
+    name = "ydotool"
+    executable = "ydotool"
+
+    def _command(self, delay_ms, chunk):
+        return [self.executable, "type", "--key-delay", str(int(round(delay_ms))), "--", chunk], None
+
+
+class RecordingBackend(TypingBackend):
+    """
+    Types nothing: keeps the text in `typed`, optionally taking `seconds_per_char`.
+    `windows` is an optional list of active-window values to report in turn (for
+    exercising wait_for_focus_change()); the last one repeats.
+    """
+
+    name = "recording"
+
+    def __init__(self, seconds_per_char=0.0, windows=None):
+        self.seconds_per_char = seconds_per_char
+        self.windows = list(windows or [])
+        self.typed = []
+
+    def type_text(self, text):
+        if self.seconds_per_char:
+            time.sleep(len(text) * self.seconds_per_char)
+        self.typed.append(text)
+
+    def active_window(self):
+        if not self.windows:
+            return None
+        return self.windows.pop(0) if len(self.windows) > 1 else self.windows[0]
+
+
+BACKENDS = {
+    "pyautogui": PyAutoGUIBackend,
+    "clipboard": ClipboardBackend,
+    "xdotool": XdotoolBackend,
+    "ydotool": YdotoolBackend,
+    "recording": RecordingBackend,
+}
+
+
+def create_typing_backend(name=None):
+    """
+    Builds the backend named by `name` (or the TYPING_BACKEND env var). 'auto' (the default)
+    picks xdotool on X11, then clipboard paste, then pyautogui.
+    """
+    name = (name or os.getenv("TYPING_BACKEND", "auto")).lower()
+    if name != "auto":
+        if name not in BACKENDS:
+            raise ValueError(f"Unknown typing backend: {name}")
+        return BACKENDS[name]()
+    candidates = ["clipboard", "pyautogui"]
+    if sys.platform.startswith("linux") and os.getenv("DISPLAY"):
+        candidates.insert(0, "xdotool")
+    for candidate in candidates:
+        try:
+            return BACKENDS[candidate]()
+        except TypingUnavailable:
+            continue
+    raise TypingUnavailable("No typing backend available; install xdotool, pyperclip or pyautogui.")
+
+
+class TypingStats:
+    """Characters typed and time spent per backend, for a chars/second report. Thread-safe."""
+
+    def __init__(self):
+        self.by_backend = {}   # name -> [characters, seconds, calls]
+        self._lock = threading.Lock()
+
+    def record(self, backend_name, characters, seconds):
+        with self._lock:
+            totals = self.by_backend.setdefault(backend_name, [0, 0.0, 0])
+            totals[0] += characters
+            totals[1] += seconds
+            totals[2] += 1
+
+    def chars_per_second(self, backend_name):
+        characters, seconds, _ = self.by_backend.get(backend_name, (0, 0.0, 0))
+        return characters / seconds if seconds else 0.0
+
+    def summary(self):
+        with self._lock:
+            totals = sorted((name, list(values)) for name, values in self.by_backend.items())
+        if not totals:
+            return "nothing typed"
+        return "; ".join(f"{name}: {chars} chars in {calls} call(s), {chars / seconds if seconds else 0.0:.0f} chars/s"
+                         for name, (chars, seconds, calls) in totals)
@@ -1,84 +1,207 @@
 # utils.py
 import re
 
+# --- Spoken Text Normalization ---
+# Everything below is built once at import time. preprocess_spoken_text() then runs a single
+# compiled regex over the utterance, so a replacement can never feed into a later one
+# (e.g. "and" inside "hand" or "standard" is left alone).
+
+# Spoken phrases for symbols. Matching is longest-first and on whole words only.
+SYMBOL_PHRASES = {
+    "at the rate": "@",
+    "hash tag": "#",
+    "hashtag": "#",
+    "hash": "#",
+    "dollar sign": "$",
+    "percent sign": "%",
+    "ampersand": "&",
+    "asterisk": "*",
+    "star": "*",
+    "plus": "+",
+    "minus": "-",
+    "hyphen": "-",
+    "dash": "-",
+    "slash": "/",
+    "divided by": "/",
+    "backslash": "\\",
+    "equals": "=",
+    "colon": ":",
+    "semicolon": ";",
+    "quote": "'",
+    "double quote": '"',
+    "single quote": "'",
+    "open parenthesis": "(",
+    "close parenthesis": ")",
+    "left parenthesis": "(",
+    "right parenthesis": ")",
+    "square bracket open": "[",
+    "square bracket close": "]",
+    "curly bracket open": "{",
+    "curly bracket close": "}",
+    "less than": "<",
+    "greater than": ">",
+    "comma": ",",
+    "dot": ".",
+    "period": ".",
+    "question mark": "?",
+    "exclamation mark": "!",
+    "underscore": "_",
+    "tilde": "~",
+    "caret": "^",
+    "pipe": "|",
+    "and": "&", # context-dependent, but often for symbols
+    "number sign": "#",
+    "exclamation point": "!",
+    "full stop": ".", # Common in some English dialects
+    "new line": "\n", # For writing commands
+    "new paragraph": "\n\n", # For writing commands
+    "tab": "\t", # For writing commands
+}
+
+# Number words. Runs of these are parsed as one compound number
+# ("two hundred fifty three" -> "253"), while plain digit sequences stay separate
+# ("one two three" -> "1 2 3", useful for phone numbers and PINs).
+UNIT_WORDS = {
+    "zero": 0, "one": 1, "two": 2, "three": 3, "four": 4,
+    "five": 5, "six": 6, "seven": 7, "eight": 8, "nine": 9,
+}
+TEEN_WORDS = {
+    "ten": 10, "eleven": 11, "twelve": 12, "thirteen": 13, "fourteen": 14,
+    "fifteen": 15, "sixteen": 16, "seventeen": 17, "eighteen": 18, "nineteen": 19,
+}
+TENS_WORDS = {
+    "twenty": 20, "thirty": 30, "forty": 40, "fifty": 50,
+    "sixty": 60, "seventy": 70, "eighty": 80, "ninety": 90,
+}
+SCALE_WORDS = {"thousand": 1000, "million": 1000000, "billion": 1000000000}
+HUNDRED_WORD = "hundred"
+
+_NUMBER_WORDS = set(UNIT_WORDS) | set(TEEN_WORDS) | set(TENS_WORDS) | set(SCALE_WORDS) | {HUNDRED_WORD}
+
+
+def _phrase_regex(phrase):
+    """Turns a (possibly multi-word) phrase into a regex that tolerates any run of whitespace."""
+    return r"\s+".join(re.escape(word) for word in phrase.split())
+
+
+def _build_normalizer_pattern():
+    """Builds the single alternation used by preprocess_spoken_text()."""
+    number_word = "(?:" + "|".join(sorted(_NUMBER_WORDS, key=len, reverse=True)) + ")"
+    # A run of number words, optionally joined by hyphens or "and" ("two hundred and five").
+    number_run = number_word + r"(?:[\s-]+(?:and[\s-]+)?" + number_word + r")*"
+    symbols = "|".join(_phrase_regex(p) for p in sorted(SYMBOL_PHRASES, key=len, reverse=True))
+    return re.compile(r"\b(?:(?P<num>" + number_run + r")|(?P<sym>" + symbols + r"))\b")
+
+
+_NORMALIZER_PATTERN = _build_normalizer_pattern()
+_NUMBER_TOKEN_PATTERN = re.compile(r"[a-z]+")
+
+
+def _parse_below_hundred(tokens, i):
+    """Parses 'fifty three', 'twelve' or 'seven' starting at tokens[i]. Returns (value, next_i) or None."""
+    if i >= len(tokens):
+        return None
+    word = tokens[i]
+    if word in TENS_WORDS:
+        value = TENS_WORDS[word]
+        if i + 1 < len(tokens) and tokens[i + 1] in UNIT_WORDS and UNIT_WORDS[tokens[i + 1]] != 0:
+            return value + UNIT_WORDS[tokens[i + 1]], i + 2
+        return value, i + 1
+    if word in TEEN_WORDS:
+        return TEEN_WORDS[word], i + 1
+    if word in UNIT_WORDS:
+        return UNIT_WORDS[word], i + 1
+    return None
+
+
+def _parse_optional_and(tokens, i, parser):
+    """Runs parser at tokens[i], allowing one leading 'and'. Returns (value, next_i) or None."""
+    if i < len(tokens) and tokens[i] == "and":
+        return parser(tokens, i + 1)
+    return parser(tokens, i)
+
+
+def _parse_group(tokens, i):
+    """Parses a number below one thousand ('two hundred and five', 'hundred', 'forty two')."""
+    if i < len(tokens) and tokens[i] == HUNDRED_WORD:
+        value, i = 100, i + 1
+    else:
+        parsed = _parse_below_hundred(tokens, i)
+        if parsed is None:
+            return None
+        value, i = parsed
+        if i < len(tokens) and tokens[i] == HUNDRED_WORD:
+            value, i = value * 100, i + 1
+        else:
+            return value, i
+    rest = _parse_optional_and(tokens, i, _parse_below_hundred)
+    if rest is not None:
+        value, i = value + rest[0], rest[1]
+    return value, i
+
+
+def _parse_number(tokens, i):
+    """Parses one compound number such as 'three million twenty thousand and one'."""
+    if i < len(tokens) and tokens[i] in SCALE_WORDS:
+        group, i = 1, i  # "thousand" on its own means one thousand
+    else:
+        parsed = _parse_group(tokens, i)
+        if parsed is None:
+            return None
+        group, i = parsed
+
+    total = 0
+    last_scale = None
+    while i < len(tokens) and tokens[i] in SCALE_WORDS:
+        scale = SCALE_WORDS[tokens[i]]
+        if last_scale is not None and scale >= last_scale:
+            break # "two thousand thousand" is two numbers, not one
+        total += group * scale
+        last_scale = scale
+        i += 1
+        group = 0
+        rest = _parse_optional_and(tokens, i, _parse_group)
+        if rest is None:
+            break
+        group, i = rest
+    return total + group, i
+
+
+def _convert_number_run(run):
+    """Converts a run of number words into digits, splitting it wherever the grammar breaks."""
+    tokens = _NUMBER_TOKEN_PATTERN.findall(run)
+    parts = []
+    i = 0
+    while i < len(tokens):
+        parsed = _parse_number(tokens, i)
+        if parsed is None:
+            # Only a stray "and" can land here; treat it like any other "and".
+            parts.append(SYMBOL_PHRASES.get(tokens[i], tokens[i]))
+            i += 1
+            continue
+        value, i = parsed
+        parts.append(str(value))
+    return " ".join(parts)
+
+
+def _replace_match(match):
+    if match.lastgroup == "num":
+        return _convert_number_run(match.group("num"))
+    return SYMBOL_PHRASES[" ".join(match.group("sym").split())]
+
+
 def preprocess_spoken_text(text):
     """
     Converts common spoken phrases for symbols and numbers into their actual characters.
     This helps the assistant interpret commands more accurately for calculations and typing.
     """
-    text = text.lower() # Work with lowercase for consistency
-
-    # Order matters for some replacements (e.g., 'at the rate' before 'at')
-    # Longest phrases should come first to prevent partial matches.
-    replacements = {
-        "at the rate": "@",
-        "hash tag": "#",
-        "hash": "#",
-        "dollar sign": "$",
-        "percent sign": "%",
-        "ampersand": "&",
-        "asterisk": "*",
-        "star": "*",
-        "plus": "+",
-        "minus": "-",
-        "hyphen": "-",
-        "dash": "-",
-        "slash": "/",
-        "divided by": "/",
-        "backslash": "\\",
-        "equals": "=",
-        "colon": ":",
-        "semicolon": ";",
-        "quote": "'",
-        "double quote": '"',
-        "single quote": "'",
-        "open parenthesis": "(",
-        "close parenthesis": ")",
-        "left parenthesis": "(",
-        "right parenthesis": ")",
-        "square bracket open": "[",
-        "square bracket close": "]",
-        "curly bracket open": "{",
-        "curly bracket close": "}",
-        "less than": "<",
-        "greater than": ">",
-        "comma": ",",
-        "dot": ".",
-        "period": ".",
-        "question mark": "?",
-        "exclamation mark": "!",
-        "underscore": "_",
-        "tilde": "~",
-        "caret": "^",
-        "pipe": "|",
-        "and": "&", # context-dependent, but often for symbols
-        "number sign": "#",
-        "exclamation point": "!",
-        "full stop": ".", # Common in some English dialects
-        "new line": "\n", # For writing commands
-        "new paragraph": "\n\n", # For writing commands
-        "tab": "\t", # For writing commands
-    }
-
-    # Numerals (basic ones, to help with calculations and addresses etc.)
-    num_words = {
-        "zero": "0", "one": "1", "two": "2", "three": "3", "four": "4",
-        "five": "5", "six": "6", "seven": "7", "eight": "8", "nine": "9",
-        "ten": "10", "eleven": "11", "twelve": "12", "thirteen": "13",
-        "fourteen": "14", "fifteen": "15", "sixteen": "16", "seventeen": "17",
-        "eighteen": "18", "nineteen": "19", "twenty": "20", "thirty": "30",
-        "forty": "40", "fifty": "50", "sixty": "60", "seventy": "70",
-        "eighty": "80", "ninety": "90", "hundred": "00" # Be careful with "hundred"
-    }
-
-    # Apply symbol replacements first (longest phrases first)
-    sorted_replacements = sorted(replacements.items(), key=lambda item: len(item[0]), reverse=True)
-    for phrase, symbol in sorted_replacements:
-        text = text.replace(phrase, symbol)
-    
-    # Apply number word replacements (using regex for whole words)
-    for word, digit in num_words.items():
-        # Using word boundaries (\b) to ensure 'one' doesn't replace part of 'phone'
-        text = re.sub(r'\b' + re.escape(word) + r'\b', digit, text)
-
-    return text
+    return _NORMALIZER_PATTERN.sub(_replace_match, text.lower())
+
+
+def preprocess_batch(texts):
+    """
+    Normalizes many transcripts at once (e.g. when re-processing saved sessions).
+    Returns a list in the same order as the input iterable.
+    """
+    sub = _NORMALIZER_PATTERN.sub
+    return [sub(_replace_match, text.lower()) for text in texts]